@@ -0,0 +1,188 @@
+import os
+import json
+import zlib
+import hashlib
+import datetime
+
+# Fixed-size chunks: appends to CSVs and logs only add chunks at the end, and
+# SQLite pages (4 KiB) line up with chunk boundaries
+CHUNK_SIZE = 64 * 1024
+COMPRESSIONS = ('zlib', 'lzma')
+
+
+def _compress(data, compression):
+    """A chunk as stored: one tag byte naming the codec, then the compressed data"""
+    if compression == 'lzma':
+        import lzma
+        return b'x' + lzma.compress(data)
+    return b'z' + zlib.compress(data, 6)
+
+
+def _decompress(stored):
+    tag, data = stored[:1], stored[1:]
+    if tag == b'x':
+        import lzma
+        return lzma.decompress(data)
+    if tag == b'z':
+        return zlib.decompress(data)
+    raise ValueError(f'Unknown chunk encoding {tag!r}')
+
+
+def _write_atomic(path, data):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temp_file = path + '.tmp'
+    with open(temp_file, 'wb') as f:
+        f.write(data)
+    os.replace(temp_file, path)
+
+
+class BackupStore:
+    """Content-addressed, deduplicated and compressed snapshots of data files.
+
+    Files are split into fixed-size chunks named by their SHA-256 and stored
+    once under chunks/<first two hex digits>/, compressed. A snapshot is a
+    small JSON manifest in snapshots/ listing every file with its size,
+    mtime and chunk digests. Chunks are written before the manifest, so an
+    interrupted backup leaves no snapshot pointing at missing data; files
+    whose size and mtime match the previous snapshot are not read again.
+    """
+
+    def __init__(self, root, compression='zlib'):
+        if compression not in COMPRESSIONS:
+            raise ValueError(f'Unknown compression "{compression}"')
+        self.root = root
+        self.compression = compression
+        self.chunks_dir = os.path.join(root, 'chunks')
+        self.snapshots_dir = os.path.join(root, 'snapshots')
+
+    def _chunk_path(self, digest):
+        return os.path.join(self.chunks_dir, digest[:2], digest)
+
+    def _put_chunk(self, data):
+        """Store a chunk unless already present; returns (digest, bytes written)"""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._chunk_path(digest)
+        if os.path.exists(path):
+            return digest, 0
+        stored = _compress(data, self.compression)
+        _write_atomic(path, stored)
+        return digest, len(stored)
+
+    def _get_chunk(self, digest):
+        with open(self._chunk_path(digest), 'rb') as f:
+            data = _decompress(f.read())
+        if hashlib.sha256(data).hexdigest() != digest:
+            raise ValueError(f'Backup chunk {digest} is corrupt')
+        return data
+
+    def snapshots(self):
+        """Snapshot IDs, oldest first"""
+        if not os.path.isdir(self.snapshots_dir):
+            return []
+        return sorted(name[:-len('.json')] for name in os.listdir(self.snapshots_dir)
+                      if name.endswith('.json'))
+
+    def load(self, snapshot_id):
+        """The manifest of a snapshot; raises ValueError if there is none"""
+        path = os.path.join(self.snapshots_dir, snapshot_id + '.json')
+        if not os.path.exists(path):
+            raise ValueError(f'No backup snapshot "{snapshot_id}"')
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def latest(self):
+        snapshots = self.snapshots()
+        return self.load(snapshots[-1]) if snapshots else None
+
+    def snapshot(self, paths):
+        """Back up files and directory trees; returns (snapshot ID, stats).
+
+        The ID is None when nothing changed since the latest snapshot, in
+        which case no manifest is written. stats counts the files, their
+        bytes and the new chunks and compressed bytes actually stored.
+        """
+        previous = self.latest()
+        known = {entry['path']: entry for entry in previous['files']} if previous else {}
+        stats = {'files': 0, 'bytes': 0, 'new_chunks': 0, 'stored_bytes': 0}
+        files = []
+        directories = []
+        absent = []
+
+        for path in paths:
+            path = os.path.normpath(path)
+            if os.path.isdir(path):
+                directories.append(path)
+                files.extend(self._backup_file(os.path.join(folder, name), known, stats)
+                             for folder, _, names in sorted(os.walk(path)) for name in sorted(names))
+            elif os.path.exists(path):
+                files.append(self._backup_file(path, known, stats))
+            else:
+                absent.append(path)
+
+        if previous and (previous['files'], previous['directories'], previous.get('absent', [])) == \
+                (files, directories, absent):
+            return None, stats
+
+        created = datetime.datetime.now()
+        snapshot_id = created.strftime('%Y-%m-%dT%H-%M-%S')
+        suffix = 1
+        while os.path.exists(os.path.join(self.snapshots_dir, snapshot_id + '.json')):
+            suffix += 1
+            snapshot_id = created.strftime('%Y-%m-%dT%H-%M-%S') + f'.{suffix:03d}'
+        manifest = {'id': snapshot_id, 'created': created.isoformat(timespec='seconds'),
+                    'chunk_size': CHUNK_SIZE, 'directories': directories,
+                    'absent': absent, 'files': files}
+        _write_atomic(os.path.join(self.snapshots_dir, snapshot_id + '.json'),
+                      json.dumps(manifest, indent=1).encode('utf-8'))
+        return snapshot_id, stats
+
+    def _backup_file(self, path, known, stats):
+        stat = os.stat(path)
+        stats['files'] += 1
+        stats['bytes'] += stat.st_size
+        entry = known.get(path)
+        if entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+            return entry
+
+        chunks = []
+        with open(path, 'rb') as f:
+            while True:
+                data = f.read(CHUNK_SIZE)
+                if not data:
+                    break
+                digest, written = self._put_chunk(data)
+                chunks.append(digest)
+                if written:
+                    stats['new_chunks'] += 1
+                    stats['stored_bytes'] += written
+        return {'path': path, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'chunks': chunks}
+
+    def restore(self, snapshot_id, target='.'):
+        """Rebuild a snapshot's files under target; returns how many were written.
+
+        Every file is checked against its digests and replaced atomically.
+        Files inside the snapshot's directories that it doesn't list, and
+        backed up paths that didn't exist then (indexes or logs written
+        since), are removed so they can't describe other data.
+        """
+        manifest = self.load(snapshot_id)
+        restored = set()
+        for entry in manifest['files']:
+            path = os.path.join(target, entry['path'])
+            _write_atomic(path, b''.join(self._get_chunk(digest) for digest in entry['chunks']))
+            os.utime(path, ns=(entry['mtime_ns'], entry['mtime_ns']))
+            restored.add(os.path.normpath(path))
+
+        for directory in manifest['directories']:
+            for folder, _, names in os.walk(os.path.join(target, directory)):
+                for name in names:
+                    path = os.path.normpath(os.path.join(folder, name))
+                    if path not in restored:
+                        os.remove(path)
+        for path in manifest.get('absent', []):
+            path = os.path.join(target, path)
+            if os.path.isfile(path):
+                os.remove(path)
+        return len(restored)
@@ -0,0 +1,142 @@
+"""Summary and financial health reports for every profile, in parallel.
+
+The profiles are dealt into one share per worker process. Each worker
+opens the store itself, reads every profile of its share once, writes a
+report file per profile and returns one rollup row per profile; the
+parent writes the combined rollup.
+"""
+import os
+import csv
+import json
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+REPORT_FORMATS = ('json', 'csv')
+ROLLUP_FIELDS = ['user', 'profile_id', 'profile_name', 'currency', 'transactions',
+                 'income', 'expenses', 'net', 'top_category', 'average_score', 'status']
+
+
+def _profile_report(store, username, profile):
+    """The summary report and monthly health scores of one profile"""
+    from money import currency_exponent
+    from reports import summarize_profile
+    from financial_health import average_health, monthly_health
+
+    exponent = currency_exponent(profile['currency'])
+    transactions = store.profile_transactions(profile['profile_id'])
+    income, expenses, categories = summarize_profile(transactions, exponent)
+    months = monthly_health({month: {'income': totals['income'], 'expenses': totals['expenses']}
+                             for month, totals in store.monthly_totals(profile['profile_id']).items()},
+                            exponent)
+    average, status = average_health(months)
+    return {
+        'user': username,
+        'profile_id': profile['profile_id'],
+        'profile_name': profile['profile_name'],
+        'currency': profile['currency'],
+        'transactions': len(transactions),
+        'income': str(income),
+        'expenses': str(expenses),
+        'net': str(income - expenses),
+        'categories': {category: str(amount) for category, amount in
+                       sorted(categories.items(), key=lambda item: item[1], reverse=True)},
+        'months': [{**row, 'income': str(row['income']), 'expenses': str(row['expenses']),
+                    'net': str(row['net'])} for row in months],
+        'average_score': average,
+        'status': status,
+    }
+
+
+def _write_report(report, path, report_format):
+    if report_format == 'json':
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        return
+    # CSV: one metric per line, so totals, categories and months share a file
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['metric', 'key', 'value'])
+        for metric in ('transactions', 'income', 'expenses', 'net', 'average_score', 'status'):
+            writer.writerow([metric, '', report[metric]])
+        for category, amount in report['categories'].items():
+            writer.writerow(['category_expenses', category, amount])
+        for row in report['months']:
+            for field in ('income', 'expenses', 'net', 'ratio', 'score'):
+                writer.writerow([f'month_{field}', row['month'], row[field]])
+
+
+def _run_share(share, output_dir, report_format):
+    """Worker: report on a share of (username, profile) pairs; returns their rollup rows"""
+    from storage import get_storage
+
+    store = get_storage()
+    rollup = []
+    for username, profile in share:
+        report = _profile_report(store, username, profile)
+        _write_report(report, os.path.join(output_dir, f"{profile['profile_id']}.{report_format}"),
+                      report_format)
+        rollup.append({**{field: report.get(field) for field in ROLLUP_FIELDS},
+                       'top_category': next(iter(report['categories']), None)})
+    return rollup
+
+
+def _write_rollup(rows, output_dir, report_format):
+    """Write the per-profile rollup and income/expense totals per currency"""
+    from money import Money
+
+    totals = {}
+    for row in rows:
+        currency = totals.setdefault(row['currency'], {'profiles': 0, 'income': Money(0), 'expenses': Money(0)})
+        currency['profiles'] += 1
+        currency['income'] += Money.parse(row['income'])
+        currency['expenses'] += Money.parse(row['expenses'])
+    totals = {name: {'profiles': total['profiles'], 'income': str(total['income']),
+                     'expenses': str(total['expenses']), 'net': str(total['income'] - total['expenses'])}
+              for name, total in sorted(totals.items())}
+
+    path = os.path.join(output_dir, f'rollup.{report_format}')
+    if report_format == 'json':
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'profiles': rows, 'currencies': totals}, f, ensure_ascii=False, indent=2)
+    else:
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=ROLLUP_FIELDS)
+            writer.writeheader()
+            writer.writerows(rows)
+    return path
+
+
+def run_batch_reports(output_dir, report_format='json', workers=None):
+    """Report on every profile with a process pool; returns (profile count, rollup path).
+
+    workers defaults to the CPU count. Workers are spawned rather than
+    forked so none inherits the parent's open database connection.
+    """
+    from storage import get_storage
+
+    if report_format not in REPORT_FORMATS:
+        raise ValueError(f'Unknown report format "{report_format}" (use {", ".join(REPORT_FORMATS)})')
+    os.makedirs(output_dir, exist_ok=True)
+    store = get_storage()
+    profiles = [(user['name'], profile) for user in store.user_directory().users
+                for profile in user.get('profiles', [])]
+    # Settle shared files here (migrating a legacy layout, partition stats
+    # an older layout lacks) so workers only ever read them
+    for _, profile in profiles:
+        store.monthly_totals(profile['profile_id'])
+    workers = max(1, min(workers or os.cpu_count() or 1, len(profiles)))
+
+    rows = []
+    if workers == 1:
+        rows = _run_share(profiles, output_dir, report_format)
+    else:
+        shares = [profiles[start::workers] for start in range(workers)]
+        with ProcessPoolExecutor(max_workers=workers,
+                                 mp_context=multiprocessing.get_context('spawn')) as pool:
+            for share_rows in pool.map(_run_share, shares, [output_dir] * workers,
+                                       [report_format] * workers):
+                rows.extend(share_rows)
+        # Back to directory order, whatever share each profile was in
+        order = {profile['profile_id']: position for position, (_, profile) in enumerate(profiles)}
+        rows.sort(key=lambda row: order[row['profile_id']])
+    return len(rows), _write_rollup(rows, output_dir, report_format)
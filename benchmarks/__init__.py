@@ -0,0 +1 @@
+"""Benchmarks for the Expense Tracker's hot paths; run them with python -m benchmarks.<name>"""
@@ -0,0 +1,171 @@
+"""Deterministic synthetic data for the benchmarks.
+
+    python -m benchmarks.generate DIR [--rows 100000] [--profiles 100]
+        [--users N] [--recurring N] [--seed 0]
+
+Writes DIR/data/users.json, DIR/data/transaction.csv (the single-file
+layout, which the CSV engine moves into partitions on first use) and
+DIR/data/recurring_transactions.json. The same arguments always give the
+same users, profiles, transactions and schedules; only the bcrypt salt of
+the shared password differs between runs.
+"""
+import os
+import sys
+import csv
+import json
+import uuid
+import random
+import argparse
+import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+# Every generated user logs in with this password
+PASSWORD = 'benchmark'
+# Transactions are dated within the YEARS years up to END_DATE
+END_DATE = datetime.date(2025, 12, 31)
+YEARS = 3
+CURRENCIES = ['USD', 'EUR', 'EGP', 'JPY']
+EXPENSE_CATEGORIES = ['Food', 'Rent', 'Transport', 'Utilities', 'Health',
+                      'Shopping', 'Entertainment', 'Education', 'Travel', 'Gifts']
+INCOME_CATEGORIES = ['Salary', 'Freelance', 'Investments', 'Refund']
+PAYMENT_METHODS = ['Cash', 'Card', 'Bank Transfer', 'Wallet']
+WORDS = ['coffee', 'groceries', 'lunch', 'dinner', 'taxi', 'fuel', 'rent', 'internet',
+         'phone', 'pharmacy', 'books', 'cinema', 'gym', 'flight', 'hotel', 'market',
+         'bakery', 'electricity', 'water', 'subscription']
+FIELDS = ['transaction_id', 'user', 'profile_id', 'type', 'amount',
+          'category', 'date', 'description', 'payment_method']
+
+
+def make_users(profiles, users, rng):
+    """users user records sharing profiles profiles round-robin"""
+    from utils import hash_password
+
+    # One bcrypt hash for everyone: hashing thousands of passwords would
+    # dominate generating small data sets
+    password = hash_password(PASSWORD)
+    records = [{'user_id': str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+                'name': f'user{number:05d}', 'password': password, 'profiles': []}
+               for number in range(1, users + 1)]
+    for number in range(profiles):
+        records[number % users]['profiles'].append({
+            'profile_id': str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+            'profile_name': f'Profile {number // users + 1}',
+            'currency': CURRENCIES[number % len(CURRENCIES)],
+        })
+    return records
+
+
+def _amount(rng, currency, low, high):
+    if currency == 'JPY':
+        return str(rng.randint(low, high))
+    return f'{rng.randint(low * 100, high * 100) / 100:.2f}'
+
+
+def iter_transactions(owners, count, rng, first_id=1):
+    """count transactions spread over owners, a list of (username, profile)"""
+    first_day = END_DATE.toordinal() - 365 * YEARS + 1
+    for number in range(first_id, first_id + count):
+        username, profile = owners[rng.randrange(len(owners))]
+        if rng.random() < 0.2:
+            txn_type, category = 'income', rng.choice(INCOME_CATEGORIES)
+            amount = _amount(rng, profile['currency'], 100, 5000)
+        else:
+            txn_type, category = 'expense', rng.choice(EXPENSE_CATEGORIES)
+            amount = _amount(rng, profile['currency'], 1, 500)
+        yield {
+            'transaction_id': f'TXN{number:012d}',
+            'user': username,
+            'profile_id': profile['profile_id'],
+            'type': txn_type,
+            'amount': amount,
+            'category': category,
+            'date': datetime.date.fromordinal(rng.randint(first_day, END_DATE.toordinal())).isoformat(),
+            'description': f'{rng.choice(WORDS)} {rng.choice(WORDS)}',
+            'payment_method': rng.choice(PAYMENT_METHODS),
+        }
+
+
+def write_transactions(path, transactions):
+    """Write transactions as CSV; returns how many were written"""
+    count = 0
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDS)
+        writer.writeheader()
+        for txn in transactions:
+            writer.writerow(txn)
+            count += 1
+    return count
+
+
+def make_recurring(owners, count, rng):
+    """count active schedules, all due by END_DATE"""
+    schedules = []
+    for number in range(count):
+        username, profile = owners[number % len(owners)]
+        start = END_DATE - datetime.timedelta(days=rng.randint(0, 90))
+        txn_type = 'income' if number % 5 == 0 else 'expense'
+        schedules.append({
+            'recurring_id': str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+            'username': username,
+            'profile_id': profile['profile_id'],
+            'name': f'{rng.choice(WORDS).capitalize()} {number + 1}',
+            'type': txn_type,
+            'amount': _amount(rng, profile['currency'], 100 if txn_type == 'income' else 5, 1000),
+            'repeat_interval_days': rng.choice([1, 7, 14, 30]),
+            'start_date': start.isoformat(),
+            'next_date': start.isoformat(),
+            'end_date': None,
+            'status': 'Active',
+            'last_executed': None,
+        })
+    return schedules
+
+
+def owners_of(users):
+    """(username, profile) of every profile, in directory order"""
+    return [(user['name'], profile) for user in users for profile in user['profiles']]
+
+
+def generate(directory, rows=100000, profiles=100, users=None, recurring=None, seed=0):
+    """Write a data set under directory/data; returns its sizes.
+
+    users defaults to one per two profiles and recurring to one schedule
+    per profile.
+    """
+    if rows < 0 or profiles < 1:
+        raise ValueError('Need at least one profile and no negative row count')
+    users = max(1, min(users or (profiles + 1) // 2, profiles))
+    recurring = profiles if recurring is None else recurring
+    rng = random.Random(seed)
+
+    data_dir = os.path.join(directory, 'data')
+    os.makedirs(data_dir, exist_ok=True)
+    records = make_users(profiles, users, rng)
+    with open(os.path.join(data_dir, 'users.json'), 'w', encoding='utf-8') as f:
+        json.dump(records, f, ensure_ascii=False, indent=4)
+
+    owners = owners_of(records)
+    write_transactions(os.path.join(data_dir, 'transaction.csv'), iter_transactions(owners, rows, rng))
+    with open(os.path.join(data_dir, 'recurring_transactions.json'), 'w', encoding='utf-8') as f:
+        json.dump(make_recurring(owners, recurring, rng), f, ensure_ascii=False, indent=4)
+    return {'users': users, 'profiles': profiles, 'rows': rows, 'recurring': recurring, 'seed': seed}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('directory', help='where data/ is written')
+    parser.add_argument('--rows', type=int, default=100000, help='transactions (1k to 10M)')
+    parser.add_argument('--profiles', type=int, default=100, help='profiles (1 to 10k)')
+    parser.add_argument('--users', type=int, help='users (default: one per two profiles)')
+    parser.add_argument('--recurring', type=int, help='recurring schedules (default: one per profile)')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+    print(json.dumps(generate(args.directory, args.rows, args.profiles, args.users,
+                              args.recurring, args.seed)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,221 @@
+"""Timings of the hot paths on a synthetic data set.
+
+    python -m benchmarks.hotpaths [--rows 100000] [--profiles 100] [--engine csv]
+        [--repeat 3] [--output FILE] [--baseline FILE] [--tolerance 0.2]
+
+A data set is generated once (see benchmarks.generate) and copied afresh
+for every repetition. Each repetition then runs the cases in order, in
+one process as a user's session would, against the first profile:
+menu functions get scripted answers for input(), and their screen
+clearing and output are discarded. Results are printed (or written) as
+JSON, in seconds. With --baseline, each case's median is compared to the
+same case in an earlier results file and the run exits with status 1 if
+any got slower by more than the tolerance.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import contextlib
+from unittest import mock
+
+from benchmarks.generate import END_DATE, generate, iter_transactions, write_transactions
+from benchmarks.startup import summarize
+
+
+class ScriptExhausted(Exception):
+    """A case asked for more input than its script holds"""
+
+
+@contextlib.contextmanager
+def scripted_io(answers):
+    """Answer input() from answers, skip screen clearing and discard output"""
+    import utils
+    import reports
+    import import_export
+    import financial_health
+    import transactions
+
+    answers = list(answers)
+
+    def answer(prompt=''):
+        if not answers:
+            raise ScriptExhausted(f'No scripted answer for {prompt.strip()!r}')
+        return answers.pop(0)
+
+    with contextlib.ExitStack() as stack, open(os.devnull, 'w', encoding='utf-8') as devnull:
+        stack.enter_context(mock.patch('builtins.input', answer))
+        for module in (utils, reports, import_export, financial_health, transactions):
+            stack.enter_context(mock.patch.object(module, 'clear_screen', lambda: None))
+        stack.enter_context(contextlib.redirect_stdout(devnull))
+        yield
+
+
+def _cases(user, profile, import_file):
+    """(name, function, scripted answers) of every case, in running order.
+
+    Cases that change data come last; delete_profile_transactions removes
+    the profile the others work on.
+    """
+    from storage import delete_profile_transactions
+    from transactions import load_all_transactions, search_filter_transactions
+    from reports import show_summary_report, show_monthly_report
+    from financial_health import get_monthly_data
+    from import_export import import_transactions, export_transactions
+    from recurring_transactions import execute_due_recurring_transactions
+
+    profile_id = profile['profile_id']
+    return [
+        ('load_all_transactions', load_all_transactions, []),
+        # keyword, from, to, min, max, type, sort by, order, then quit the pager
+        ('search_filter_transactions', lambda: search_filter_transactions(profile),
+         ['coffee', f'{END_DATE.year - 1}-01-01', '', '10', '', 'expense', 'date', 'desc', 'q']),
+        ('show_summary_report', lambda: show_summary_report(profile), ['']),
+        ('show_monthly_report', lambda: show_monthly_report(profile),
+         [f'{END_DATE.month:02d}', str(END_DATE.year), '']),
+        ('get_monthly_data', lambda: get_monthly_data(profile_id), []),
+        ('export_transactions', lambda: export_transactions(user, profile), ['1', '', '', '']),
+        ('import_transactions', lambda: import_transactions(user, profile), [import_file, '1', 'yes']),
+        ('execute_due_recurring_transactions', execute_due_recurring_transactions, []),
+        ('delete_profile_transactions', lambda: delete_profile_transactions(profile_id), []),
+    ]
+
+
+def prepare(directory, engine, rows, profiles, users, recurring, import_rows, seed):
+    """Generate the pristine data set in the chosen engine; returns its sizes"""
+    import random
+    import storage
+
+    sizes = generate(directory, rows, profiles, users, recurring, seed)
+    with open(os.path.join(directory, 'data', 'users.json'), 'r', encoding='utf-8') as f:
+        first = json.load(f)[0]
+    owners = [(first['name'], first['profiles'][0])]
+    sizes['import_rows'] = write_transactions(
+        os.path.join(directory, 'import.csv'),
+        iter_transactions(owners, import_rows, random.Random(seed + 1), first_id=rows + 1))
+
+    previous = os.getcwd()
+    os.chdir(directory)
+    try:
+        with open(os.devnull, 'w', encoding='utf-8') as devnull, contextlib.redirect_stdout(devnull):
+            # Move the single-file layout into partitions now, not in a timed case
+            storage._engine = storage.create_engine('csv')
+            storage._engine.has_transactions()
+            if engine != 'csv' and not storage.migrate_storage(engine):
+                raise RuntimeError(f'Could not move the data set into the {engine} engine')
+    finally:
+        storage._engine = None
+        os.chdir(previous)
+    return sizes
+
+
+def run_once(pristine, work):
+    """Copy the data set to work and time every case there; returns {name: seconds}"""
+    import storage
+    import recurring_transactions
+
+    if os.path.exists(work):
+        shutil.rmtree(work)
+    shutil.copytree(pristine, work)
+    previous = os.getcwd()
+    os.chdir(work)
+    storage._engine = None
+    timings = {}
+    try:
+        user = storage.get_storage().load_users()[0]
+        # The schedules live next to recurring_transactions.py, not in the
+        # current directory
+        with mock.patch.object(recurring_transactions, 'RECURRING_FILE',
+                               os.path.abspath(os.path.join('data', 'recurring_transactions.json'))):
+            for name, function, answers in _cases(user['name'], user['profiles'][0],
+                                                  os.path.abspath('import.csv')):
+                with scripted_io(answers):
+                    started = time.perf_counter()
+                    function()
+                    timings[name] = time.perf_counter() - started
+    finally:
+        storage._engine = None
+        os.chdir(previous)
+    return timings
+
+
+def compare(results, baseline, tolerance):
+    """Per case: baseline and current medians, their ratio and whether it regressed"""
+    comparison = {}
+    for name, timing in results['cases'].items():
+        before = baseline.get('cases', {}).get(name)
+        if not before:
+            continue
+        ratio = timing['median'] / before['median'] if before['median'] else None
+        comparison[name] = {'baseline': before['median'], 'median': timing['median'], 'ratio': ratio,
+                            'regressed': ratio is not None and ratio > 1 + tolerance}
+    return comparison
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100000, help='transactions (1k to 10M)')
+    parser.add_argument('--profiles', type=int, default=100, help='profiles (1 to 10k)')
+    parser.add_argument('--users', type=int, help='users (default: one per two profiles)')
+    parser.add_argument('--recurring', type=int, help='recurring schedules (default: one per profile)')
+    parser.add_argument('--import-rows', type=int, help='rows in the imported file (default: rows / 10)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--engine', choices=['csv', 'sqlite'], default='csv')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--work-dir', help='where the data sets are kept (default: a temporary directory)')
+    parser.add_argument('--output', help='write the JSON results to this file')
+    parser.add_argument('--baseline', help='earlier results file to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='slowdown over the baseline median counted as a regression (default: 0.2)')
+    args = parser.parse_args(argv)
+
+    # The engine comes from the data set's storage.json, not the environment
+    os.environ.pop('EXPENSE_TRACKER_STORAGE', None)
+    import_rows = args.import_rows if args.import_rows is not None else max(1, args.rows // 10)
+
+    with contextlib.ExitStack() as stack:
+        work_dir = args.work_dir or stack.enter_context(tempfile.TemporaryDirectory(prefix='benchmarks-'))
+        pristine = os.path.join(work_dir, 'pristine')
+        if os.path.exists(pristine):
+            shutil.rmtree(pristine)
+        sizes = prepare(pristine, args.engine, args.rows, args.profiles, args.users,
+                        args.recurring, import_rows, args.seed)
+        runs = [run_once(pristine, os.path.join(work_dir, 'run')) for _ in range(args.repeat)]
+
+    results = {
+        'benchmark': 'hotpaths',
+        'engine': args.engine,
+        **sizes,
+        'repeat': args.repeat,
+        'python': sys.version.split()[0],
+        'cases': {name: summarize([timings[name] for timings in runs]) for name in runs[0]},
+    }
+    regressed = []
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        different = [key for key in ('engine', 'rows', 'profiles', 'users', 'import_rows')
+                     if baseline.get(key) != results.get(key)]
+        if different:
+            print(f'Warning: the baseline differs in {", ".join(different)}', file=sys.stderr)
+        results['comparison'] = compare(results, baseline, args.tolerance)
+        regressed = [name for name, row in results['comparison'].items() if row['regressed']]
+        for name, row in results['comparison'].items():
+            ratio = f"{row['ratio']:.2f}x" if row['ratio'] is not None else 'n/a'
+            print(f"{name:<36} {row['baseline']:>9.4f}s -> {row['median']:>9.4f}s  {ratio}"
+                  f"{'  REGRESSED' if row['regressed'] else ''}", file=sys.stderr)
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+    return 1 if regressed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
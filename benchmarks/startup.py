@@ -0,0 +1,112 @@
+"""Time-to-first-menu of main.py.
+
+    python -m benchmarks.startup [--runs 10] [--rows 10000] [--profiles 10]
+        [--engine csv] [--data-dir DIR] [--output FILE]
+
+A data set is generated in a temporary directory (see benchmarks.generate),
+or DIR's data/ is used instead, and copied afresh for every run. Each run
+starts main.py in a fresh interpreter inside the copy, waits for the main
+menu prompt on its stdout, then answers "3" (Exit) and waits for the
+process to end. The startup backup and due recurring transactions run
+against the copy too, so no data outside it is touched. Results are
+printed (or written) as JSON, in seconds.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MAIN = os.path.join(ROOT, 'main.py')
+MENU_PROMPT = b'Please select an option'
+# Runs main.py with the recurring schedules read from the current directory
+# rather than from next to recurring_transactions.py
+LAUNCHER = (
+    'import os, sys, runpy, recurring_transactions\n'
+    "recurring_transactions.RECURRING_FILE = os.path.abspath(os.path.join('data', 'recurring_transactions.json'))\n"
+    'sys.argv = sys.argv[1:]\n'
+    "runpy.run_path(sys.argv[0], run_name='__main__')\n"
+)
+
+
+def time_startup(directory):
+    """(seconds until the menu prompt, seconds until exit) of one run in directory"""
+    path = os.pathsep.join(filter(None, [ROOT, os.environ.get('PYTHONPATH')]))
+    env = dict(os.environ, PYTHONUNBUFFERED='1', PYTHONPATH=path, TERM=os.environ.get('TERM', 'dumb'))
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, '-c', LAUNCHER, MAIN], cwd=directory, env=env,
+                               stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                               stderr=subprocess.DEVNULL)
+    output = b''
+    while MENU_PROMPT not in output:
+        chunk = process.stdout.read1(4096)
+        if not chunk:
+            process.wait()
+            raise RuntimeError('main.py exited before showing the menu')
+        output += chunk
+    first_menu = time.perf_counter() - started
+    process.communicate(b'3\n')
+    return first_menu, time.perf_counter() - started
+
+
+def run_once(pristine, work):
+    """Copy the data set to work and time one startup there"""
+    if os.path.exists(work):
+        shutil.rmtree(work)
+    shutil.copytree(pristine, work)
+    return time_startup(work)
+
+
+def summarize(samples):
+    return {'min': min(samples), 'median': statistics.median(samples), 'max': max(samples)}
+
+
+def main(argv=None):
+    from benchmarks.hotpaths import prepare
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--rows', type=int, default=10000, help='transactions in the generated data set')
+    parser.add_argument('--profiles', type=int, default=10, help='profiles in the generated data set')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--engine', choices=['csv', 'sqlite'], default='csv')
+    parser.add_argument('--data-dir', help='copy DIR/data instead of generating a data set')
+    parser.add_argument('--output', help='write the JSON results to this file')
+    args = parser.parse_args(argv)
+
+    # The engine comes from the data set's storage.json, not the environment
+    os.environ.pop('EXPENSE_TRACKER_STORAGE', None)
+
+    with tempfile.TemporaryDirectory(prefix='benchmarks-') as work_dir:
+        pristine = os.path.join(work_dir, 'pristine')
+        if args.data_dir:
+            shutil.copytree(os.path.join(args.data_dir, 'data'), os.path.join(pristine, 'data'))
+            sizes = {'data_dir': os.path.abspath(args.data_dir)}
+        else:
+            sizes = prepare(pristine, args.engine, args.rows, args.profiles, None, None, 0, args.seed)
+            sizes.pop('import_rows')
+            sizes['engine'] = args.engine
+        runs = [run_once(pristine, os.path.join(work_dir, 'run')) for _ in range(args.runs)]
+
+    results = {
+        'benchmark': 'startup',
+        **sizes,
+        'runs': args.runs,
+        'time_to_first_menu': summarize([first_menu for first_menu, _ in runs]),
+        'time_to_exit': summarize([total for _, total in runs]),
+    }
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
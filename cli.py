@@ -0,0 +1,292 @@
+"""Non-interactive command line for scripts, cron jobs and pipelines.
+
+    python cli.py report summary --profile Personal --json
+    python cli.py report monthly --month 2025-01
+    python cli.py report all --output reports/2025-01 --workers 8
+    python cli.py health --months 12 --json
+    python cli.py import transactions.csv
+    python cli.py export --since 2025-01 --format csv.gz --output january.csv.gz
+    python cli.py recurring run
+
+Nothing is prompted and the screen is never cleared. Commands that work
+on a profile log in with EXPENSE_TRACKER_USERNAME and
+EXPENSE_TRACKER_PASSWORD, or with a JSON file holding "username" and
+"password" given by --credentials or EXPENSE_TRACKER_CREDENTIALS;
+"report all" and "recurring run" work on every user's data and need none.
+Modules are imported by the command that needs them, so a run only
+pays for what it uses. Only a command's result is written to stdout;
+messages printed along the way (a data migration, load warnings) go to
+stderr.
+"""
+import os
+import sys
+import json
+import argparse
+import contextlib
+
+
+class CLIError(Exception):
+    """A failure reported on stderr with exit status 1"""
+
+
+def _credentials(path):
+    """(username, password) from a credentials file or the environment"""
+    path = path or os.environ.get('EXPENSE_TRACKER_CREDENTIALS')
+    if path:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return data['username'], data['password']
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            raise CLIError(f'Cannot read credentials from "{path}": {e}') from None
+    username = os.environ.get('EXPENSE_TRACKER_USERNAME')
+    password = os.environ.get('EXPENSE_TRACKER_PASSWORD')
+    if not username or password is None:
+        raise CLIError('No credentials: set EXPENSE_TRACKER_USERNAME and EXPENSE_TRACKER_PASSWORD, '
+                       'or pass --credentials FILE')
+    return username, password
+
+
+def _login(args):
+    """(username, profile) of the authenticated user's selected profile"""
+    from storage import users_named
+    from utils import verify_password
+
+    username, password = _credentials(args.credentials)
+    user = next((u for u in users_named(username) if verify_password(password, u['password'])), None)
+    if user is None:
+        raise CLIError('Invalid username or password')
+
+    profiles = user.get('profiles', [])
+    if args.profile:
+        profile = next((p for p in profiles
+                        if args.profile in (p['profile_id'], p['profile_name'])), None)
+        if profile is None:
+            raise CLIError(f'No profile "{args.profile}"')
+    elif len(profiles) == 1:
+        profile = profiles[0]
+    else:
+        names = ', '.join(p['profile_name'] for p in profiles) or 'none'
+        raise CLIError(f'Choose a profile with --profile (profiles: {names})')
+    return username, profile
+
+
+def _emit(args, result):
+    """Print a command's result to args.stdout as JSON, or as key: value lines"""
+    out = args.stdout
+    if args.json:
+        json.dump(result, out, ensure_ascii=False, default=str)
+        out.write('\n')
+        return
+    for key, value in result.items():
+        if isinstance(value, dict):
+            print(f'{key}:', file=out)
+            for name, amount in value.items():
+                print(f'  {name}: {amount}', file=out)
+        elif isinstance(value, list):
+            print(f'{key}:', file=out)
+            for item in value:
+                print('  ' + ' '.join(f'{name}={field}' for name, field in item.items()), file=out)
+        else:
+            print(f'{key}: {value}', file=out)
+
+
+def _month(text):
+    """(year, month) of YYYY-MM, or the current month when empty"""
+    import datetime
+    if not text:
+        today = datetime.date.today()
+        return today.year, today.month
+    try:
+        parsed = datetime.datetime.strptime(text, '%Y-%m')
+    except ValueError:
+        raise CLIError(f'Invalid month "{text}" (use YYYY-MM)') from None
+    return parsed.year, parsed.month
+
+
+def report_summary(args):
+    from money import currency_exponent
+    from reports import summarize_profile, load_profile_transactions
+
+    _, profile = _login(args)
+    transactions = load_profile_transactions(profile['profile_id'])
+    total_income, total_expense, category_expense = summarize_profile(
+        transactions, currency_exponent(profile['currency']))
+    _emit(args, {
+        'profile': profile['profile_name'],
+        'currency': profile['currency'],
+        'transactions': len(transactions),
+        'income': total_income,
+        'expenses': total_expense,
+        'net': total_income - total_expense,
+        'categories': dict(sorted(category_expense.items(), key=lambda item: item[1], reverse=True)),
+    })
+
+
+def report_monthly(args):
+    from money import currency_exponent
+    from reports import month_transactions, sum_income_expense
+
+    _, profile = _login(args)
+    year, month = _month(args.month)
+    transactions = month_transactions(profile['profile_id'], year, month)
+    total_income, total_expense = sum_income_expense(transactions, currency_exponent(profile['currency']))
+    _emit(args, {
+        'profile': profile['profile_name'],
+        'currency': profile['currency'],
+        'month': f'{year:04d}-{month:02d}',
+        'transactions': len(transactions),
+        'income': total_income,
+        'expenses': total_expense,
+        'net': total_income - total_expense,
+    })
+
+
+def health(args):
+    from money import currency_exponent
+    from financial_health import average_health, get_monthly_data, monthly_health
+
+    _, profile = _login(args)
+    rows = monthly_health(get_monthly_data(profile['profile_id']),
+                          currency_exponent(profile['currency']), args.months)
+    average, status = average_health(rows)
+    _emit(args, {
+        'profile': profile['profile_name'],
+        'currency': profile['currency'],
+        'months': rows,
+        'average_score': average,
+        'status': status,
+    })
+
+
+def import_file(args):
+    from storage import get_storage
+    from import_export import check_import_file, write_import_file
+
+    username, profile = _login(args)
+    if not os.path.exists(args.file):
+        raise CLIError(f'File "{args.file}" not found')
+    store = get_storage()
+    skip_duplicates = not args.allow_duplicates
+    errors = []
+    try:
+        valid_count, skipped_count, invalid_lines = check_import_file(
+            store, args.file, username, profile['profile_id'], skip_duplicates,
+            on_error=lambda line_num, message: errors.append({'line': line_num, 'error': message}))
+        imported_count = 0
+        if valid_count > 0:
+            imported_count = write_import_file(store, args.file, username, profile['profile_id'],
+                                               invalid_lines, skip_duplicates)
+    except ValueError as e:
+        raise CLIError(str(e)) from None
+    except Exception as e:
+        # The validation pool can fail too (pickling, OS errors); report
+        # it like any other error instead of with a traceback
+        raise CLIError(f'Import failed: {e}') from None
+    _emit(args, {'profile': profile['profile_name'], 'imported': imported_count,
+                 'skipped_duplicates': skipped_count, 'errors': errors})
+
+
+def export(args):
+    from storage import get_storage
+    from query import parse_query
+    from export_formats import export_rows
+
+    _, profile = _login(args)
+    terms = [args.query or '']
+    if args.since:
+        terms.append(f'date>={args.since}')
+    if args.until:
+        terms.append(f'date<={args.until}')
+    text = ' '.join(term for term in terms if term)
+    try:
+        # Rows are streamed from the store straight into the output
+        rows = get_storage().iter_matching_transactions(profile['profile_id'], parse_query(text))
+        count = export_rows(rows, args.output, args.format, args.stdout)
+    except ValueError as e:
+        raise CLIError(str(e)) from None
+    print(f'Exported {count} transaction(s)')
+
+
+def report_all(args):
+    from batch_reports import run_batch_reports
+    try:
+        count, rollup = run_batch_reports(args.output, args.format, args.workers)
+    except ValueError as e:
+        raise CLIError(str(e)) from None
+    _emit(args, {'profiles': count, 'output': args.output, 'rollup': rollup})
+
+
+def recurring_run(args):
+    from recurring_transactions import execute_due_recurring_transactions
+    _emit(args, {'executed': execute_due_recurring_transactions()})
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='cli.py', description='Expense Tracker batch commands')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    def profile_command(subparsers, name, handler, help_text):
+        command = subparsers.add_parser(name, help=help_text)
+        command.add_argument('--profile', help='profile name or ID (optional with a single profile)')
+        command.add_argument('--credentials', help='JSON file with "username" and "password"')
+        command.set_defaults(handler=handler)
+        return command
+
+    report = commands.add_parser('report', help='income and expense reports')
+    reports = report.add_subparsers(dest='report', required=True)
+    profile_command(reports, 'summary', report_summary, 'totals and expenses by category') \
+        .add_argument('--json', action='store_true', help='print JSON')
+    monthly = profile_command(reports, 'monthly', report_monthly, 'totals of one month')
+    monthly.add_argument('--month', help='YYYY-MM (default: current month)')
+    monthly.add_argument('--json', action='store_true', help='print JSON')
+
+    every = reports.add_parser('all', help='summary and health reports of every profile, in parallel')
+    every.add_argument('--output', required=True, help='directory for the per-profile reports and rollup')
+    every.add_argument('--format', default='json', help='json (default) or csv')
+    every.add_argument('--workers', type=int, help='worker processes (default: CPU count)')
+    every.add_argument('--json', action='store_true', help='print JSON')
+    every.set_defaults(handler=report_all)
+
+    score = profile_command(commands, 'health', health, 'financial health score per month')
+    score.add_argument('--months', type=int, help='only the latest N months')
+    score.add_argument('--json', action='store_true', help='print JSON')
+
+    importer = profile_command(commands, 'import', import_file, 'import a transactions CSV')
+    importer.add_argument('file')
+    importer.add_argument('--allow-duplicates', action='store_true',
+                          help='import rows whose transaction ID is already stored')
+    importer.add_argument('--json', action='store_true', help='print JSON')
+
+    exporter = profile_command(commands, 'export', export, 'export transactions')
+    exporter.add_argument('--since', help='first date, YYYY-MM-DD or YYYY-MM')
+    exporter.add_argument('--until', help='last date, YYYY-MM-DD or YYYY-MM')
+    exporter.add_argument('--query', help='filter query, e.g. "type:expense amount>100"')
+    exporter.add_argument('--format', default='csv',
+                          help='csv (default), csv.gz, jsonl or columnar')
+    exporter.add_argument('--output', default='-', help='output file (default: stdout)')
+
+    recurring = commands.add_parser('recurring', help='recurring transactions')
+    actions = recurring.add_subparsers(dest='action', required=True)
+    run = actions.add_parser('run', help='add every due recurring transaction')
+    run.add_argument('--json', action='store_true', help='print JSON')
+    run.set_defaults(handler=recurring_run)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    # Results are written to the real stdout; anything else printed while
+    # the command runs goes to stderr so pipelines get clean output
+    args.stdout = sys.stdout
+    try:
+        with contextlib.redirect_stdout(sys.stderr):
+            args.handler(args)
+    except CLIError as e:
+        print(f'Error: {e}', file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
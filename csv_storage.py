@@ -0,0 +1,1328 @@
+import io
+import os
+import re
+import csv
+import json
+import mmap
+import bisect
+import hashlib
+from dates import date_key
+from keyword_index import KeywordIndex
+from sorted_index import SortedIndex, sort_rows
+from storage import (StorageEngine, TRANSACTION_FIELDS, ensure_data_directory,
+                     add_monthly_totals, decode_monthly_totals)
+
+# Fold a partition's change log into its base file past this many records
+LOG_COMPACTION_THRESHOLD = 1000
+# Profile IDs that can be used as partition file names as they are
+SAFE_PARTITION_NAME = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+# Rows read through the offset index per mapping of the CSV
+READ_BATCH_SIZE = 1000
+
+
+def _file_digest(path):
+    digest = hashlib.sha1()
+    try:
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+    except OSError:
+        return None
+    return digest.hexdigest()
+
+
+def _file_signature(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def _clean_row(row):
+    return {key.strip(): (value or '').strip() for key, value in row.items() if key is not None}
+
+
+def _encode_row(values):
+    """One CSV record as bytes, exactly as csv.writer writes it"""
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(values)
+    return buffer.getvalue().encode('utf-8')
+
+
+def _index_field(text):
+    """Decode a JSON string or null field of an index line"""
+    # Plain quoted strings are sliced; json only for null and escapes
+    if len(text) > 1 and text[0] == text[-1] == '"' and '\\' not in text:
+        return text[1:-1]
+    if text == 'null':
+        return None
+    return json.loads(text)
+
+
+def _decode_record(data):
+    """Parse the fields of one CSV record; [] for a blank line"""
+    return next(csv.reader(io.StringIO(data.decode('utf-8'), newline='')), [])
+
+
+def _iter_records(f, offset=0):
+    """Yield (offset, bytes) for each CSV record of a binary file from offset.
+
+    Records end at a newline outside double quotes, so quoted fields that
+    span several lines stay in one record.
+    """
+    f.seek(offset)
+    record = b''
+    in_quotes = False
+    for line in iter(f.readline, b''):
+        record += line
+        if line.count(b'"') % 2:
+            in_quotes = not in_quotes
+        if not in_quotes:
+            yield offset, record
+            offset += len(record)
+            record = b''
+    if record:
+        yield offset, record
+
+
+class OffsetIndex:
+    """Persistent byte-offset index over a partition's base CSV.
+
+    Stored next to the CSV as one line per record, header first:
+    "offset<TAB>length<TAB>date as JSON<TAB>transaction_id as JSON", with
+    null for the header and blank lines; the date is zero-padded. It maps
+    each transaction_id to its data row ordinals and each ordinal to the
+    bytes and date of that row, so lookups and date ranges can mmap the CSV
+    and read just the rows they need. Appends extend it in place. When it no
+    longer matches the CSV it catches up if the CSV only grew, and is
+    rebuilt otherwise.
+    """
+
+    def __init__(self, csv_path, path):
+        self.csv_path = csv_path
+        self.path = path
+        self._signature = None
+        self._covered = 0
+        self._rows = []          # data row ordinal -> (offset, length)
+        self._row_ids = []       # data row ordinal -> transaction_id
+        self._dates = []         # data row ordinal -> zero-padded date
+        self._ordinals = {}      # transaction_id -> data row ordinals
+        self._generation = 0     # bumped whenever the rows are read afresh
+
+    def _reset(self):
+        self._covered = 0
+        self._rows = []
+        self._row_ids = []
+        self._dates = []
+        self._ordinals = {}
+        self._generation += 1
+
+    def _add(self, entries):
+        for offset, length, date, transaction_id in entries:
+            if transaction_id is not None:
+                self._ordinals.setdefault(transaction_id, []).append(len(self._rows))
+                self._rows.append((offset, length))
+                self._row_ids.append(transaction_id)
+                self._dates.append(date or '')
+            self._covered = offset + length
+
+    def _read(self):
+        entries = []
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    # Indexes written before dates were kept fail here and are rebuilt
+                    offset, length, date, transaction_id = line.rstrip('\n').split('\t', 3)
+                    entries.append((int(offset), int(length), _index_field(date), _index_field(transaction_id)))
+        except (OSError, ValueError):
+            return None
+        return entries
+
+    def _write(self, entries, mode):
+        with open(self.path, mode, encoding='utf-8') as f:
+            for offset, length, date, transaction_id in entries:
+                f.write(f'{offset}\t{length}\t{json.dumps(date, ensure_ascii=False)}\t'
+                        f'{json.dumps(transaction_id, ensure_ascii=False)}\n')
+
+    def _scan(self, start):
+        """Index the CSV records from byte offset start to the end"""
+        entries = []
+        with open(self.csv_path, 'rb') as f:
+            header = next(_iter_records(f), None)
+            if header is None:
+                return entries
+            columns = _decode_record(header[1])
+            id_column = columns.index('transaction_id')
+            date_column = columns.index('date') if 'date' in columns else len(columns)
+            for offset, data in _iter_records(f, start):
+                fields = _decode_record(data)
+                if offset == 0 or not fields:
+                    transaction_id = date = None
+                else:
+                    transaction_id = fields[id_column].strip() if id_column < len(fields) else ''
+                    date = date_key(fields[date_column].strip()) if date_column < len(fields) else ''
+                entries.append((offset, len(data), date, transaction_id))
+        return entries
+
+    def _matches(self, entries, size):
+        """Spot-check that the last indexed record is still where it was"""
+        offset, length, _, transaction_id = entries[-1]
+        if offset + length > size:
+            return False
+        with open(self.csv_path, 'rb') as f:
+            f.seek(offset)
+            fields = _decode_record(f.read(length))
+        if transaction_id is None:
+            return offset == 0 or not fields
+        return bool(fields) and transaction_id in (field.strip() for field in fields)
+
+    def refresh(self):
+        """Bring the index in line with the CSV file"""
+        signature = _file_signature(self.csv_path)
+        if signature == self._signature:
+            return
+        self._reset()
+        if signature is not None:
+            entries = self._read()
+            if entries and self._matches(entries, signature[1]):
+                self._add(entries)
+                if self._covered < signature[1]:
+                    missing = self._scan(self._covered)
+                    self._write(missing, 'a')
+                    self._add(missing)
+            else:
+                entries = self._scan(0)
+                self._write(entries, 'w')
+                self._add(entries)
+        self._signature = signature
+
+    def appended(self, entries, previous_signature):
+        """Record rows this process just appended to the CSV"""
+        if self._signature != previous_signature:
+            return  # refresh() will catch up from the file
+        self._write(entries, 'a')
+        self._add(entries)
+        self._signature = _file_signature(self.csv_path)
+
+    def replaced(self, entries):
+        """Record a freshly rewritten CSV"""
+        self._reset()
+        self._write(entries, 'w')
+        self._add(entries)
+        self._signature = _file_signature(self.csv_path)
+
+    def remove(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self._reset()
+        self._signature = None
+
+    @property
+    def row_count(self):
+        self.refresh()
+        return len(self._rows)
+
+    @property
+    def covered(self):
+        return self._covered
+
+    def ordinals(self, transaction_id):
+        self.refresh()
+        return self._ordinals.get(transaction_id, [])
+
+    def ordinals_of(self, transaction_ids):
+        """{transaction_id: ordinals} of the given IDs that are indexed"""
+        self.refresh()
+        transaction_ids = set(transaction_ids)
+        if len(transaction_ids) > len(self._ordinals):
+            transaction_ids = transaction_ids.intersection(self._ordinals)
+        return {transaction_id: list(self._ordinals[transaction_id])
+                for transaction_id in transaction_ids if transaction_id in self._ordinals}
+
+    def ids_since(self, mark):
+        """(transaction_ids indexed since mark, new mark); every ID when mark is None or stale"""
+        self.refresh()
+        generation, count = mark or (None, 0)
+        if generation != self._generation:
+            count = 0
+        return self._row_ids[count:], (self._generation, len(self._row_ids))
+
+    def transaction_ids(self):
+        self.refresh()
+        return self._ordinals.keys()
+
+    def dated_between(self, date_from, date_to):
+        """(ordinal, transaction_id) of the rows whose base date is in the range"""
+        self.refresh()
+        return [(ordinal, self._row_ids[ordinal]) for ordinal, date in enumerate(self._dates)
+                if (not date_from or date >= date_from) and (not date_to or date <= date_to)]
+
+    def read_rows(self, ordinals):
+        """Read and parse the given data rows straight from the mapped CSV"""
+        self.refresh()
+        rows = []
+        if not ordinals:
+            return rows
+        with open(self.csv_path, 'rb') as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                header = _decode_record(next(_iter_records(f))[1])
+                for ordinal in ordinals:
+                    offset, length = self._rows[ordinal]
+                    values = _decode_record(mapped[offset:offset + length])
+                    values += [''] * (len(header) - len(values))
+                    rows.append(_clean_row(dict(zip(header, values))))
+        return rows
+
+
+class TransactionRepository:
+    """In-memory view of the transactions CSV and its append-only change log.
+
+    The base CSV is parsed once and kept until the mtime or size of the base
+    file or the log changes, so repeated menu actions don't pay for a full
+    parse each time.
+
+    Edits and deletes are not written to the base file. They are appended to
+    the log as small JSON records and merged on read:
+
+        {"op": "update", "profile_id": ..., "transaction_id": ..., "upto": N, "changes": {...}}
+        {"op": "delete", "profile_id": ..., "transaction_id": ..., "upto": N}
+        {"op": "delete_profile", "profile_id": ..., "upto": N}
+        {"op": "batch", "records": [update or delete records...], "upto": N}
+
+    A batch is a single line, so a bulk edit is applied entirely or, if
+    the write was torn, not at all. "upto" is the number of base rows
+    that existed when the record was written, so rows appended later are
+    never touched by older records.
+    compact() folds the log back into a clean base file.
+
+    A repository for a single profile's partition also keeps an OffsetIndex,
+    so that lookups, duplicate checks and edits by transaction_id work from
+    the index and the log without parsing the whole base file.
+    """
+
+    def __init__(self, path, log_path, profile_id=None):
+        self.path = path
+        self.log_path = log_path
+        self.profile_id = profile_id
+        self.index = OffsetIndex(path, os.path.splitext(path)[0] + '.idx') if profile_id else None
+        self._signature = None
+        self._log_cache = (None, [])
+        self._rows = []          # base rows in file order, None once deleted
+        self._positions = {}     # (profile_id, transaction_id) -> live row indexes
+        self._by_profile = {}    # profile_id -> live row indexes
+        self._log_records = 0
+
+    def _current_signature(self):
+        return (_file_signature(self.path), _file_signature(self.log_path))
+
+    def _index_row(self, index, row):
+        self._positions.setdefault((row.get('profile_id'), row.get('transaction_id')), []).append(index)
+        self._by_profile.setdefault(row.get('profile_id'), []).append(index)
+
+    def _unindex_row(self, index, row):
+        for indexes in (self._positions[(row.get('profile_id'), row.get('transaction_id'))],
+                        self._by_profile[row.get('profile_id')]):
+            del indexes[bisect.bisect_left(indexes, index)]
+
+    def _locate(self, profile_id, transaction_id, upto=None):
+        for index in self._positions.get((profile_id, transaction_id), []):
+            if upto is None or index < upto:
+                return index
+        return -1
+
+    def _apply(self, record):
+        """Apply one log record to the in-memory rows"""
+        op = record.get('op')
+        upto = record.get('upto', len(self._rows))
+        if op == 'delete_profile':
+            indexes = self._by_profile.get(record['profile_id'], [])
+            split = bisect.bisect_left(indexes, upto)
+            for index in indexes[:split]:
+                row = self._rows[index]
+                positions = self._positions[(row.get('profile_id'), row.get('transaction_id'))]
+                positions.remove(index)
+                self._rows[index] = None
+            del indexes[:split]
+            return
+        
+        index = self._locate(record['profile_id'], record['transaction_id'], upto)
+        if index < 0:
+            return
+        row = self._rows[index]
+        self._unindex_row(index, row)
+        if op == 'delete':
+            self._rows[index] = None
+        elif op == 'update':
+            updated = {**row, **record.get('changes', {})}
+            self._rows[index] = updated
+            # Re-insert in file order, the update may have changed the row's keys
+            bisect.insort(self._positions.setdefault(
+                (updated.get('profile_id'), updated.get('transaction_id')), []), index)
+            bisect.insort(self._by_profile.setdefault(updated.get('profile_id'), []), index)
+
+    def _read_log(self):
+        signature = self._current_signature()
+        if self._log_cache[0] != signature:
+            self._log_cache = (signature, self._parse_log())
+        return self._log_cache[1]
+
+    def _parse_log(self):
+        records = []
+        if not os.path.exists(self.log_path):
+            return records
+        with open(self.log_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # A torn last line from an interrupted write
+                    continue
+                records.extend(_expand(record))
+        
+        # A finished compaction leaves its marker as the last record; the
+        # log is obsolete once the base file has the compacted content.
+        if records and records[-1].get('op') == 'compacted':
+            if _file_digest(self.path) == records[-1].get('sha1'):
+                return []
+            records.pop()
+        return records
+
+    def _reload(self):
+        self._rows = []
+        self._positions = {}
+        self._by_profile = {}
+        if os.path.exists(self.path):
+            with open(self.path, 'r', encoding='utf-8') as csvfile:
+                for row in csv.DictReader(csvfile):
+                    row = _clean_row(row)
+                    self._index_row(len(self._rows), row)
+                    self._rows.append(row)
+        records = self._read_log()
+        for record in records:
+            self._apply(record)
+        self._log_records = len(records)
+        self._signature = self._current_signature()
+
+    def refresh(self):
+        """Reload the files if they changed since the last read"""
+        if self._current_signature() != self._signature:
+            self._reload()
+
+    def invalidate(self):
+        """Force the next read to go back to disk"""
+        self._signature = None
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def has_transactions(self):
+        self.refresh()
+        return bool(self._by_profile) and any(self._by_profile.values())
+
+    def all(self):
+        """Return every live transaction row (cached)"""
+        self.refresh()
+        return [row for row in self._rows if row is not None]
+
+    def for_profile(self, profile_id):
+        """Return the live transaction rows of a single profile (cached)"""
+        self.refresh()
+        return [self._rows[i] for i in self._by_profile.get(profile_id, [])]
+
+    def iter_profile(self, profile_id):
+        """Yield a profile's live rows in file order without loading the partition.
+
+        Rows already in memory are yielded from there. Otherwise the base
+        CSV is streamed and only the rows the log touches are looked up
+        through the index, so memory is bounded by the log, not the file.
+        """
+        view = None if self._is_fresh() else self._log_view(profile_id)
+        if view is None:
+            yield from self.for_profile(profile_id)
+            return
+        touched, overrides, dropped = view
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r', encoding='utf-8') as csvfile:
+            for ordinal, row in enumerate(csv.DictReader(csvfile)):
+                row = _clean_row(row)
+                if row.get('transaction_id') in touched:
+                    if ordinal not in overrides:
+                        continue
+                    row = {**row, **overrides[ordinal]}
+                elif ordinal < dropped:
+                    continue
+                if row.get('profile_id') == profile_id:
+                    yield row
+
+    def _log_view(self, profile_id):
+        """What the log does to the partition's base rows, found through the index.
+
+        Returns (transaction_ids the log touches, {live ordinal: changes} of
+        those, ordinals below which a delete_profile dropped the rest), or
+        None when the index can't tell and the rows have to be loaded.
+        """
+        if profile_id != self.profile_id:
+            return None
+        records = self._read_log()
+        touched = {record.get('transaction_id') for record in records if record.get('op') != 'delete_profile'}
+        live = self._indexed_rows(touched)
+        if live is None:
+            return None
+        overrides = {ordinal: changes for found in live.values() for ordinal, changes in found}
+        row_count = self.index.row_count
+        dropped = max((record.get('upto', row_count) for record in records
+                       if record.get('op') == 'delete_profile' and record.get('profile_id') == profile_id),
+                      default=0)
+        return touched, overrides, dropped
+
+    def iter_date_range(self, profile_id, date_from, date_to):
+        """A profile's rows dated in the range, read through the index, or None.
+
+        Only the rows the index dates in the range, plus the ones the log
+        changes whatever their date, are read from the mapped CSV, in file
+        order; callers still filter on the merged rows. None when the rows
+        are already in memory, the index can't tell, or the range holds so
+        much of the partition that streaming it whole is cheaper.
+        """
+        view = None if self._is_fresh() else self._log_view(profile_id)
+        if view is None:
+            return None
+        touched, overrides, dropped = view
+        ordinals = {ordinal for ordinal, transaction_id in self.index.dated_between(date_from, date_to)
+                    if ordinal >= dropped and transaction_id not in touched}
+        ordinals = sorted(ordinals.union(overrides))
+        if len(ordinals) * 4 > self.index.row_count:
+            return None
+
+        def rows():
+            for start in range(0, len(ordinals), READ_BATCH_SIZE):
+                batch = ordinals[start:start + READ_BATCH_SIZE]
+                for ordinal, row in zip(batch, self.index.read_rows(batch)):
+                    row = {**row, **overrides.get(ordinal, {})}
+                    if row.get('profile_id') == profile_id:
+                        yield row
+        return rows()
+
+    def renames(self):
+        """Whether the log gives a row another transaction_id than its base row's"""
+        return any(record.get('changes', {}).get('transaction_id', record.get('transaction_id'))
+                   != record.get('transaction_id') for record in self._read_log())
+
+    def _is_fresh(self):
+        return self._signature is not None and self._signature == self._current_signature()
+
+    def _indexed_rows(self, transaction_ids):
+        """Live rows of the given transaction_ids, found through the index.
+
+        Returns {transaction_id: [(ordinal, changes), ...]} by replaying the
+        log for just these keys instead of merging it into every row, or
+        None when the index can't answer and the rows have to be loaded:
+        outside a partition, or if the log renames transactions.
+        """
+        if self.index is None or self.renames():
+            return None
+        records = self._read_log()
+        
+        live = self.index.ordinals_of(transaction_ids)
+        overrides = {}
+        row_count = self.index.row_count
+        for record in records:
+            if record.get('profile_id') != self.profile_id:
+                continue
+            upto = record.get('upto', row_count)
+            if record['op'] == 'delete_profile':
+                for transaction_id, ordinals in live.items():
+                    live[transaction_id] = [ordinal for ordinal in ordinals if ordinal >= upto]
+                continue
+            ordinals = live.get(record.get('transaction_id'))
+            target = next((ordinal for ordinal in ordinals or () if ordinal < upto), None)
+            if target is None:
+                continue
+            if record['op'] == 'delete':
+                ordinals.remove(target)
+            elif record['op'] == 'update':
+                overrides.setdefault(target, {}).update(record.get('changes', {}))
+        return {transaction_id: [(ordinal, overrides.get(ordinal, {})) for ordinal in ordinals]
+                for transaction_id, ordinals in live.items() if ordinals}
+
+    def find(self, profile_id, transaction_id):
+        if not self._is_fresh() and profile_id == self.profile_id:
+            matches = self._indexed_rows([transaction_id])
+            if matches is not None:
+                if transaction_id not in matches:
+                    return None
+                ordinal, changes = matches[transaction_id][0]
+                return {**self.index.read_rows([ordinal])[0], **changes}
+        self.refresh()
+        index = self._locate(profile_id, transaction_id)
+        return self._rows[index] if index >= 0 else None
+
+    def existing_ids(self, transaction_ids):
+        """The subset of transaction_ids with a live row in this file"""
+        transaction_ids = set(transaction_ids)
+        if not self._is_fresh():
+            matches = self._indexed_rows(transaction_ids)
+            if matches is not None:
+                return set(matches)
+        self.refresh()
+        if self.profile_id is not None:
+            return {transaction_id for transaction_id in transaction_ids
+                    if self._positions.get((self.profile_id, transaction_id))}
+        return {transaction_id for (_, transaction_id), indexes in self._positions.items()
+                if indexes and transaction_id in transaction_ids}
+
+    def find_all(self, profile_id, transaction_ids):
+        """Every live row of a profile with one of the transaction_ids, in file order"""
+        transaction_ids = set(transaction_ids)
+        if not self._is_fresh() and profile_id == self.profile_id:
+            matches = self._indexed_rows(transaction_ids)
+            if matches is not None:
+                located = sorted(match for found in matches.values() for match in found)
+                rows = self.index.read_rows([ordinal for ordinal, _ in located])
+                return [{**row, **changes} for row, (_, changes) in zip(rows, located)]
+        self.refresh()
+        indexes = sorted(index for transaction_id in transaction_ids
+                         for index in self._positions.get((profile_id, transaction_id), []))
+        return [self._rows[index] for index in indexes]
+
+    @property
+    def signature(self):
+        """Signature of the base file and the log; every write changes it"""
+        return self._current_signature()
+
+    @property
+    def log_records(self):
+        return len(self._read_log())
+
+    def _ensure_directory(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _written(self, was_fresh):
+        """Adopt the new file signature after one of our own writes"""
+        if was_fresh:
+            self._signature = self._current_signature()
+        else:
+            self.invalidate()
+
+    def append(self, transactions):
+        """Append rows to the base CSV file"""
+        self._ensure_directory()
+        was_fresh = self._is_fresh()
+        if self.index is not None:
+            self.index.refresh()
+        previous_base = _file_signature(self.path)
+        
+        rows = [_clean_row({field: txn.get(field, '') for field in TRANSACTION_FIELDS})
+                for txn in transactions]
+        offset = previous_base[1] if previous_base else 0
+        chunks = []
+        entries = []
+        if offset == 0:
+            chunks.append(_encode_row(TRANSACTION_FIELDS))
+            entries.append((0, len(chunks[0]), None, None))
+            offset = len(chunks[0])
+        for row in rows:
+            encoded = _encode_row([row[field] for field in TRANSACTION_FIELDS])
+            chunks.append(encoded)
+            entries.append((offset, len(encoded), date_key(row['date']), row['transaction_id']))
+            offset += len(encoded)
+        try:
+            with open(self.path, 'ab') as csvfile:
+                csvfile.write(b''.join(chunks))
+        except Exception:
+            self.invalidate()
+            raise
+        
+        if self.index is not None:
+            self.index.appended(entries, previous_base)
+        if was_fresh:
+            for row in rows:
+                self._index_row(len(self._rows), row)
+                self._rows.append(row)
+        self._written(was_fresh)
+
+    def _has_row(self, profile_id, transaction_id):
+        if not self._is_fresh() and profile_id == self.profile_id:
+            matches = self._indexed_rows([transaction_id])
+            if matches is not None:
+                return transaction_id in matches
+        self.refresh()
+        return self._locate(profile_id, transaction_id) >= 0
+
+    def _log(self, record):
+        self._ensure_directory()
+        was_fresh = self._is_fresh()
+        if not was_fresh and self.index is None:
+            # Without an index the row count comes from the loaded rows
+            self.refresh()
+            was_fresh = True
+        record['upto'] = len(self._rows) if was_fresh else self.index.row_count
+        try:
+            with open(self.log_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+        except Exception:
+            self.invalidate()
+            raise
+        if was_fresh:
+            for expanded in _expand(record):
+                self._apply(expanded)
+        self._written(was_fresh)
+
+    def update(self, profile_id, transaction_id, changes):
+        """Record an update to the first matching row; False if not found"""
+        if not self._has_row(profile_id, transaction_id):
+            return False
+        changes = {field: value for field, value in changes.items() if field in TRANSACTION_FIELDS}
+        self._log({'op': 'update', 'profile_id': profile_id,
+                   'transaction_id': transaction_id, 'changes': changes})
+        return True
+
+    def delete(self, profile_id, transaction_id):
+        """Record a tombstone for the first matching row; False if not found"""
+        if not self._has_row(profile_id, transaction_id):
+            return False
+        self._log({'op': 'delete', 'profile_id': profile_id, 'transaction_id': transaction_id})
+        return True
+
+    def update_many(self, profile_id, transaction_ids, changes):
+        """Record the same update to the first row of each ID in one batch record"""
+        changes = {field: value for field, value in changes.items() if field in TRANSACTION_FIELDS}
+        self._log({'op': 'batch', 'profile_id': profile_id, 'records': [
+            {'op': 'update', 'profile_id': profile_id, 'transaction_id': transaction_id, 'changes': changes}
+            for transaction_id in transaction_ids]})
+
+    def delete_many(self, profile_id, transaction_ids):
+        """Record tombstones for the first row of each ID in one batch record"""
+        self._log({'op': 'batch', 'profile_id': profile_id, 'records': [
+            {'op': 'delete', 'profile_id': profile_id, 'transaction_id': transaction_id}
+            for transaction_id in transaction_ids]})
+
+    def remove(self):
+        """Unlink the base file, its log and its index"""
+        for path in (self.path, self.log_path):
+            if os.path.exists(path):
+                os.remove(path)
+        if self.index is not None:
+            self.index.remove()
+        self.invalidate()
+
+    def delete_profile(self, profile_id):
+        """Record a tombstone for every row of a profile"""
+        self.refresh()
+        if self._by_profile.get(profile_id):
+            self._log({'op': 'delete_profile', 'profile_id': profile_id})
+
+    def rewrite(self, transactions):
+        """Replace the base file with the given rows and drop the log"""
+        self._ensure_directory()
+        temp_file = self.path + '.tmp'
+        entries = []
+        try:
+            with open(temp_file, 'wb') as csvfile:
+                header = _encode_row(TRANSACTION_FIELDS)
+                csvfile.write(header)
+                entries.append((0, len(header), None, None))
+                offset = len(header)
+                for txn in transactions:
+                    row = _clean_row({field: txn.get(field, '') for field in TRANSACTION_FIELDS})
+                    encoded = _encode_row([row[field] for field in TRANSACTION_FIELDS])
+                    csvfile.write(encoded)
+                    entries.append((offset, len(encoded), date_key(row['date']), row['transaction_id']))
+                    offset += len(encoded)
+            
+            # Mark the log obsolete before swapping the base file, so a crash
+            # between the two steps never replays it on the compacted rows
+            if os.path.exists(self.log_path):
+                with open(self.log_path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps({'op': 'compacted', 'sha1': _file_digest(temp_file)}) + '\n')
+            os.replace(temp_file, self.path)
+            if os.path.exists(self.log_path):
+                os.remove(self.log_path)
+            if self.index is not None:
+                self.index.replaced(entries)
+        finally:
+            if os.path.exists(temp_file):
+                os.remove(temp_file)
+            self.invalidate()
+
+    def compact(self):
+        """Fold the change log into a clean base file"""
+        if not os.path.exists(self.log_path):
+            return False
+        self.refresh()
+        self.rewrite(self.all())
+        return True
+
+
+def _expand(record):
+    """The update/delete records a log record stands for (a batch holds many)"""
+    if record.get('op') != 'batch':
+        return [record]
+    return [{**inner, 'upto': record['upto']} if 'upto' in record else inner
+            for inner in record.get('records', [])]
+
+
+def _outside_span(stats, date_from, date_to):
+    """Whether a YYYY-MM-DD range misses a partition's date span"""
+    return bool((date_from and stats.get('max_date') and stats['max_date'] < date_from) or
+                (date_to and stats.get('min_date') and stats['min_date'] > date_to))
+
+
+def _in_date_range(txn, date_from, date_to):
+    date = date_key(txn.get('date', ''))
+    return (not date_from or date >= date_from) and (not date_to or date <= date_to)
+
+
+def _write_json(path, data):
+    """Replace path with data as JSON, through a temporary file"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_file = path + '.tmp'
+    with open(temp_file, 'w', encoding='utf-8') as f:
+        f.write(json.dumps(data, ensure_ascii=False))
+    os.replace(temp_file, path)
+
+
+def _stats_path(partitions_dir, entry):
+    """The stats sidecar of a manifest entry's partition"""
+    return os.path.join(partitions_dir, os.path.splitext(entry['file'])[0] + '.meta')
+
+
+class PartitionManifest:
+    """Maps each profile_id to its partition file.
+
+    Only profiles being added or removed rewrite it; what changes with every
+    write lives in each partition's PartitionStats.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._signature = None
+        self._profiles = {}
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def profiles(self):
+        """Return the cached {profile_id: entry} mapping, reloading if changed"""
+        signature = _file_signature(self.path)
+        if signature != self._signature:
+            self._profiles = {}
+            if signature is not None:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self._profiles = json.load(f).get('profiles', {})
+            self._signature = signature
+            self._split_stats()
+        return self._profiles
+
+    def _split_stats(self):
+        """Move stats kept inline by older manifests into the partitions' sidecars"""
+        inline = {profile_id: entry for profile_id, entry in self._profiles.items() if len(entry) > 1}
+        if not inline:
+            return
+        directory = os.path.dirname(self.path)
+        for profile_id, entry in inline.items():
+            stats = PartitionStats(_stats_path(directory, entry))
+            if not stats.exists():
+                stats.save({key: value for key, value in entry.items() if key != 'file'})
+            self._profiles[profile_id] = {'file': entry['file']}
+        self.save()
+
+    def save(self):
+        _write_json(self.path, {'profiles': self._profiles})
+        self._signature = _file_signature(self.path)
+
+
+class PartitionStats:
+    """A partition's row count, date span and per-month income/expense
+    totals, in a sidecar next to it so a write rewrites only its own.
+
+    The span is a bound: deletes may leave it wider than the live rows until
+    the partition is compacted.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._signature = None
+        self._stats = None
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def load(self):
+        """The cached stats, reloaded if the file changed; None if it is missing"""
+        signature = _file_signature(self.path)
+        if signature != self._signature:
+            self._stats = None
+            if signature is not None:
+                try:
+                    with open(self.path, 'r', encoding='utf-8') as f:
+                        self._stats = json.load(f)
+                except ValueError:
+                    # A torn write; the caller recounts
+                    self._stats = None
+            self._signature = signature
+        return self._stats
+
+    def save(self, stats=None):
+        if stats is not None:
+            self._stats = stats
+        _write_json(self.path, self._stats)
+        self._signature = _file_signature(self.path)
+
+    def remove(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self._stats = self._signature = None
+
+
+def _widen_span(stats, dates):
+    dates = [date_key(date) for date in dates if date]
+    if not dates:
+        return
+    low, high = min(dates), max(dates)
+    if not stats.get('min_date') or low < stats['min_date']:
+        stats['min_date'] = low
+    if not stats.get('max_date') or high > stats['max_date']:
+        stats['max_date'] = high
+
+
+class CSVStorage(StorageEngine):
+    """Users in users.json and transactions in one CSV partition per profile.
+
+    Partitions live in partitions_dir next to a manifest.json, each with its
+    own append-only change log, byte-offset index, keyword index and stats
+    sidecar, so a profile-scoped read only parses that profile's rows,
+    lookups by transaction_id and keyword searches read single rows, a
+    write rewrites only its own profile's stats, and deleting a profile
+    unlinks its files. Date and amount searches bisect an in-memory
+    SortedIndex of the partition, rebuilt after it changes. An older single
+    transaction.csv is split into partitions the first time it is found.
+    """
+
+    name = 'csv'
+
+    def __init__(self, users_file, partitions_dir, legacy_file=None, legacy_log_file=None):
+        self.users_file = users_file
+        self.users_log_file = os.path.splitext(users_file)[0] + '.log'
+        self.partitions_dir = partitions_dir
+        self.legacy_file = legacy_file
+        self.legacy_log_file = legacy_log_file
+        self.manifest = PartitionManifest(os.path.join(partitions_dir, 'manifest.json'))
+        self._partitions = {}
+        self._keyword_indexes = {}
+        self._sorted_indexes = {}
+        self._stats_files = {}
+        self._id_owners = {}     # transaction_id -> profile_id, or a tuple of them
+        self._owner_marks = {}   # profile_id -> (OffsetIndex, its ids_since() mark)
+
+    def load_users(self):
+        ensure_data_directory()
+        users = []
+        if os.path.exists(self.users_file):
+            try:
+                with open(self.users_file, 'r', encoding='utf-8') as f:
+                    users = json.load(f)
+            except (json.JSONDecodeError, IOError) as e:
+                print(f"Warning: Error loading users - {e}")
+                return []
+        
+        # Replay records written by save_user() since the last full save
+        positions = {user.get('user_id'): position for position, user in enumerate(users)}
+        for record in self._read_users_log():
+            user = record['user']
+            if user.get('user_id') in positions:
+                users[positions[user.get('user_id')]] = user
+            else:
+                positions[user.get('user_id')] = len(users)
+                users.append(user)
+        return users
+
+    def _read_users_log(self):
+        records = []
+        if not os.path.exists(self.users_log_file):
+            return records
+        with open(self.users_log_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # A torn last line from an interrupted write
+                    continue
+        return records
+
+    def _users_version(self):
+        return (_file_signature(self.users_file), _file_signature(self.users_log_file))
+
+    def save_user(self, user):
+        """Append the user record to users.log instead of rewriting users.json"""
+        ensure_data_directory()
+        with open(self.users_log_file, 'a', encoding='utf-8') as f:
+            f.write(json.dumps({'op': 'put', 'user': user}, ensure_ascii=False) + '\n')
+        if len(self._read_users_log()) >= LOG_COMPACTION_THRESHOLD:
+            self.save_users(self.load_users())
+
+    def save_users(self, users):
+        ensure_data_directory()
+        # Write to temp file first for atomicity
+        temp_file = self.users_file + '.tmp'
+        try:
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump(users, f, indent=4, ensure_ascii=False)
+            
+            # Atomic rename; users.json now holds everything the log did
+            os.replace(temp_file, self.users_file)
+            if os.path.exists(self.users_log_file):
+                os.remove(self.users_log_file)
+        except Exception:
+            if os.path.exists(temp_file):
+                try:
+                    os.remove(temp_file)
+                except OSError:
+                    pass
+            raise
+
+    def _entries(self):
+        """Manifest entries, migrating the single-file layout on first use"""
+        if (not self.manifest.exists() and self.legacy_file
+                and os.path.exists(self.legacy_file)):
+            self._migrate_legacy()
+        return self.manifest.profiles()
+
+    def _migrate_legacy(self):
+        legacy = TransactionRepository(self.legacy_file, self.legacy_log_file)
+        rows = legacy.all()
+        
+        # Without a manifest, partition files can only be left over from an
+        # interrupted migration; start again from the legacy file
+        if os.path.isdir(self.partitions_dir):
+            for name in os.listdir(self.partitions_dir):
+                if name.endswith(('.csv', '.log', '.idx', '.kw', '.kwl', '.meta')):
+                    os.remove(os.path.join(self.partitions_dir, name))
+        self._append(rows, self.manifest.profiles())
+        
+        for path in (self.legacy_file, self.legacy_log_file):
+            if path and os.path.exists(path):
+                os.replace(path, path + '.migrated')
+        print(f"Moved {len(rows)} transaction(s) into per-profile partitions "
+              f"in {self.partitions_dir}.")
+
+    def _partition_file(self, profile_id):
+        if SAFE_PARTITION_NAME.match(profile_id or ''):
+            return f'{profile_id}.csv'
+        return hashlib.sha1((profile_id or '').encode('utf-8')).hexdigest() + '.csv'
+
+    def _partition(self, profile_id, entry=None):
+        """The repository of a profile's partition, or None if it has none"""
+        entry = entry or self._entries().get(profile_id)
+        if entry is None:
+            return None
+        path = os.path.join(self.partitions_dir, entry['file'])
+        repository = self._partitions.get(profile_id)
+        if repository is None or repository.path != path:
+            repository = TransactionRepository(path, os.path.splitext(path)[0] + '.log', profile_id)
+            self._partitions[profile_id] = repository
+        return repository
+
+    def _keyword_index(self, profile_id, repository):
+        path = os.path.splitext(repository.path)[0] + '.kw'
+        index = self._keyword_indexes.get(profile_id)
+        if index is None or index.path != path:
+            index = self._keyword_indexes[profile_id] = KeywordIndex(path)
+        return index
+
+    def _sorted_index(self, profile_id, repository):
+        signature = repository.signature
+        cached = self._sorted_indexes.get(profile_id)
+        if cached is None or cached[0] != signature:
+            cached = self._sorted_indexes[profile_id] = (
+                signature, SortedIndex(repository.for_profile(profile_id)))
+        return cached[1]
+
+    def _stats_file(self, profile_id, entry):
+        path = _stats_path(self.partitions_dir, entry)
+        stats_file = self._stats_files.get(profile_id)
+        if stats_file is None or stats_file.path != path:
+            stats_file = self._stats_files[profile_id] = PartitionStats(path)
+        return stats_file
+
+    def _stats(self, profile_id, entry):
+        """A partition's stats, recounted from its rows if the sidecar is missing"""
+        stats_file = self._stats_file(profile_id, entry)
+        stats = stats_file.load()
+        if stats is None or 'months' not in stats:
+            stats = self._recount(self._partition(profile_id, entry).for_profile(profile_id))
+            stats_file.save(stats)
+        return stats
+
+    def _save_stats(self, profile_id, entry):
+        self._stats_file(profile_id, entry).save()
+
+    def has_transactions(self):
+        return any(self._stats(profile_id, entry).get('rows', 0) > 0
+                   for profile_id, entry in self._entries().items())
+
+    def all_transactions(self):
+        rows = []
+        for profile_id, entry in list(self._entries().items()):
+            rows.extend(self._partition(profile_id, entry).all())
+        return rows
+
+    def profile_transactions(self, profile_id, date_from=None, date_to=None):
+        entry = self._entries().get(profile_id)
+        if entry is None:
+            return []
+        # Skip the partition entirely when the range misses its date span
+        if _outside_span(self._stats(profile_id, entry), date_from, date_to):
+            return []
+        rows = self._partition(profile_id, entry).for_profile(profile_id)
+        if date_from or date_to:
+            rows = [txn for txn in rows if _in_date_range(txn, date_from, date_to)]
+        return rows
+
+    def matching_transactions(self, profile_id, query, order_by=None, descending=False):
+        entry = self._entries().get(profile_id)
+        if entry is None:
+            return []
+        repository = self._partition(profile_id, entry)
+        if not query.keywords and not query.prefixes:
+            return self._sorted_index(profile_id, repository).select(query, order_by, descending)
+        index = self._keyword_index(profile_id, repository)
+        if not index.describes(repository.signature):
+            index.rebuild(repository.for_profile(profile_id), repository.signature)
+        index.maybe_fold()
+        transaction_ids = index.candidates(query.keywords, query.prefixes)
+        # Reading a large share of the partition row by row is slower than
+        # the one pass that also caches it
+        if transaction_ids is None or len(transaction_ids) * 4 > self._stats(profile_id, entry).get('rows', 0):
+            return self._sorted_index(profile_id, repository).select(query, order_by, descending)
+        return sort_rows(query.filter(repository.find_all(profile_id, transaction_ids)), order_by, descending)
+
+    def iter_matching_transactions(self, profile_id, query):
+        entry = self._entries().get(profile_id)
+        if entry is None or _outside_span(self._stats(profile_id, entry), *query.date_range()):
+            return
+        repository = self._partition(profile_id, entry)
+        if repository._is_fresh():
+            # Already in memory: the cached indexes are the cheapest way
+            yield from self.matching_transactions(profile_id, query)
+            return
+        matches = query.compile()
+        rows = None
+        if any(query.date_range()):
+            # Seek to the rows dated in the range instead of parsing them all
+            rows = repository.iter_date_range(profile_id, *query.date_range())
+        for txn in rows if rows is not None else repository.iter_profile(profile_id):
+            if matches(txn):
+                yield txn
+
+    def find_transaction(self, profile_id, transaction_id):
+        repository = self._partition(profile_id)
+        return repository.find(profile_id, transaction_id) if repository else None
+
+    def _sync_owners(self, entries):
+        """Add the IDs indexed since the last call to the transaction_id -> partition map.
+
+        Only each index's new rows are read. IDs deleted since stay in the
+        map; it only names the partitions worth asking.
+        """
+        for profile_id, entry in entries.items():
+            index = self._partition(profile_id, entry).index
+            marked = self._owner_marks.get(profile_id)
+            new_ids, mark = index.ids_since(marked[1] if marked and marked[0] is index else None)
+            self._owner_marks[profile_id] = (index, mark)
+            for transaction_id in new_ids:
+                owner = self._id_owners.setdefault(transaction_id, profile_id)
+                if owner != profile_id and (isinstance(owner, str) or profile_id not in owner):
+                    self._id_owners[transaction_id] = (owner if isinstance(owner, tuple) else (owner,)) + (profile_id,)
+
+    def existing_transaction_ids(self, transaction_ids, profile_id=None):
+        wanted = set(transaction_ids)
+        if not wanted:
+            return set()
+        entries = self._entries()
+        if profile_id is not None:
+            entry = entries.get(profile_id)
+            return self._partition(profile_id, entry).existing_ids(wanted) if entry else set()
+        self._sync_owners(entries)
+        candidates = {}
+        for transaction_id in wanted:
+            owner = self._id_owners.get(transaction_id)
+            for profile_id in (owner,) if isinstance(owner, str) else owner or ():
+                candidates.setdefault(profile_id, set()).add(transaction_id)
+        found = set()
+        for profile_id, entry in entries.items():
+            repository = self._partition(profile_id, entry)
+            # A log that renames rows can hold IDs no index lists
+            ids = wanted if repository.renames() else candidates.get(profile_id)
+            if ids:
+                found |= repository.existing_ids(ids)
+        return found
+
+    def monthly_totals(self, profile_id):
+        entry = self._entries().get(profile_id)
+        if entry is None:
+            return {}
+        return decode_monthly_totals(self._stats(profile_id, entry)['months'])
+
+    def _append(self, transactions, entries):
+        by_profile = {}
+        for txn in transactions:
+            by_profile.setdefault(txn.get('profile_id', ''), []).append(txn)
+        added = False
+        for profile_id, rows in by_profile.items():
+            entry = entries.get(profile_id)
+            if entry is None:
+                entry = entries[profile_id] = {'file': self._partition_file(profile_id)}
+                stats = self._recount([])
+                added = True
+            else:
+                stats = self._stats(profile_id, entry)
+            repository = self._partition(profile_id, entry)
+            previous = repository.signature
+            repository.append(rows)
+            self._keyword_index(profile_id, repository).record(previous, repository.signature, added=rows)
+            stats['rows'] += len(rows)
+            _widen_span(stats, [txn.get('date', '') for txn in rows])
+            add_monthly_totals(stats['months'], rows)
+            self._stats_file(profile_id, entry).save(stats)
+        if added:
+            self.manifest.save()
+
+    def add_transactions(self, transactions):
+        self._append(transactions, self._entries())
+
+    def _recount(self, rows):
+        """Stats of a partition holding exactly rows"""
+        stats = {'rows': len(rows), 'min_date': None, 'max_date': None,
+                 'months': add_monthly_totals({}, rows)}
+        _widen_span(stats, [txn.get('date', '') for txn in rows])
+        return stats
+
+    def _compact_partition(self, profile_id, repository):
+        previous = repository.signature
+        if not repository.compact():
+            return False
+        self._keyword_index(profile_id, repository).record(previous, repository.signature)
+        # Compaction drops the deleted rows the span may still cover
+        entry = self._entries()[profile_id]
+        self._stats_file(profile_id, entry).save(self._recount(repository.for_profile(profile_id)))
+        return True
+
+    def _maybe_compact(self, profile_id, repository):
+        if repository.log_records >= LOG_COMPACTION_THRESHOLD:
+            self._compact_partition(profile_id, repository)
+
+    def update_transaction(self, profile_id, transaction_id, changes):
+        self._check_profile_unchanged(profile_id, changes)
+        repository = self._partition(profile_id)
+        original = repository.find(profile_id, transaction_id) if repository else None
+        if original is None:
+            return False
+        entry = self._entries()[profile_id]
+        stats = self._stats(profile_id, entry)
+        previous = repository.signature
+        repository.update(profile_id, transaction_id, changes)
+        self._keyword_index(profile_id, repository).record(
+            previous, repository.signature, added=[{**original, **changes}], removed=[original])
+        if changes.get('date'):
+            _widen_span(stats, [changes['date']])
+        add_monthly_totals(stats['months'], [original], -1)
+        add_monthly_totals(stats['months'], [{**original, **changes}])
+        self._save_stats(profile_id, entry)
+        self._maybe_compact(profile_id, repository)
+        return True
+
+    def delete_transaction(self, profile_id, transaction_id):
+        repository = self._partition(profile_id)
+        original = repository.find(profile_id, transaction_id) if repository else None
+        if original is None:
+            return False
+        entry = self._entries()[profile_id]
+        stats = self._stats(profile_id, entry)
+        previous = repository.signature
+        repository.delete(profile_id, transaction_id)
+        self._keyword_index(profile_id, repository).record(previous, repository.signature, removed=[original])
+        stats['rows'] -= 1
+        add_monthly_totals(stats['months'], [original], -1)
+        self._save_stats(profile_id, entry)
+        self._maybe_compact(profile_id, repository)
+        return True
+
+    def _first_rows(self, repository, profile_id, transaction_ids):
+        """{transaction_id: first live row} of the IDs that exist, read in one pass"""
+        rows = {}
+        for row in repository.find_all(profile_id, transaction_ids):
+            rows.setdefault(row['transaction_id'], row)
+        return rows
+
+    def update_transactions(self, profile_id, transaction_ids, changes):
+        self._check_profile_unchanged(profile_id, changes)
+        repository = self._partition(profile_id)
+        originals = self._first_rows(repository, profile_id, transaction_ids) if repository else {}
+        if not originals or not changes:
+            return 0
+        entry = self._entries()[profile_id]
+        stats = self._stats(profile_id, entry)
+        updated = [{**original, **changes} for original in originals.values()]
+        previous = repository.signature
+        repository.update_many(profile_id, list(originals), changes)
+        self._keyword_index(profile_id, repository).record(
+            previous, repository.signature, added=updated, removed=list(originals.values()))
+        if changes.get('date'):
+            _widen_span(stats, [changes['date']])
+        add_monthly_totals(stats['months'], originals.values(), -1)
+        add_monthly_totals(stats['months'], updated)
+        self._save_stats(profile_id, entry)
+        self._maybe_compact(profile_id, repository)
+        return len(originals)
+
+    def delete_transactions(self, profile_id, transaction_ids):
+        repository = self._partition(profile_id)
+        originals = self._first_rows(repository, profile_id, transaction_ids) if repository else {}
+        if not originals:
+            return 0
+        entry = self._entries()[profile_id]
+        stats = self._stats(profile_id, entry)
+        previous = repository.signature
+        repository.delete_many(profile_id, list(originals))
+        self._keyword_index(profile_id, repository).record(
+            previous, repository.signature, removed=list(originals.values()))
+        stats['rows'] -= len(originals)
+        add_monthly_totals(stats['months'], originals.values(), -1)
+        self._save_stats(profile_id, entry)
+        self._maybe_compact(profile_id, repository)
+        return len(originals)
+
+    def delete_profile_transactions(self, profile_id):
+        repository = self._partition(profile_id)
+        if repository is None:
+            return
+        entry = self._entries().pop(profile_id)
+        self.manifest.save()
+        repository.remove()
+        self._keyword_index(profile_id, repository).remove()
+        self._stats_file(profile_id, entry).remove()
+        del self._partitions[profile_id]
+        del self._keyword_indexes[profile_id]
+        del self._stats_files[profile_id]
+        self._owner_marks.pop(profile_id, None)
+        self._sorted_indexes.pop(profile_id, None)
+
+    def replace_transactions(self, transactions):
+        for profile_id in list(self._entries()):
+            self.delete_profile_transactions(profile_id)
+        self._append(transactions, self._entries())
+
+    def compact(self):
+        compacted = False
+        for profile_id, entry in list(self._entries().items()):
+            if self._compact_partition(profile_id, self._partition(profile_id, entry)):
+                compacted = True
+        return compacted
+
+    def data_files(self):
+        return [self.users_file, self.users_log_file, self.partitions_dir]
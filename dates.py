@@ -0,0 +1,51 @@
+import datetime
+import functools
+
+
+@functools.lru_cache(maxsize=65536)
+def parse_date(text):
+    """(day ordinal, year, month) of a YYYY-MM-DD date, or None if invalid.
+
+    Accepts and rejects exactly what datetime.strptime(text, '%Y-%m-%d')
+    does. Zero-padded dates take a fixed-format fast path, anything else
+    goes through strptime, and every distinct string is parsed only once.
+    """
+    if not isinstance(text, str):
+        return None
+    if (len(text) == 10 and text[4] == '-' and text[7] == '-' and text.isascii()
+            and text[:4].isdigit() and text[5:7].isdigit() and text[8:].isdigit()):
+        try:
+            date = datetime.date(int(text[:4]), int(text[5:7]), int(text[8:]))
+        except ValueError:
+            return None
+    else:
+        try:
+            date = datetime.datetime.strptime(text, '%Y-%m-%d').date()
+        except ValueError:
+            return None
+    return date.toordinal(), date.year, date.month
+
+
+def day_ordinal(text):
+    """Proleptic Gregorian ordinal of a date string, or None if invalid"""
+    parsed = parse_date(text)
+    return parsed[0] if parsed else None
+
+
+def month_key(text):
+    """YYYY-MM month of a date string, or None if invalid"""
+    parsed = parse_date(text)
+    return f'{parsed[1]:04d}-{parsed[2]:02d}' if parsed else None
+
+
+def iso_date(text):
+    """Zero-padded YYYY-MM-DD form of a date string, or None if invalid"""
+    parsed = parse_date(text)
+    return datetime.date.fromordinal(parsed[0]).isoformat() if parsed else None
+
+
+def date_key(text):
+    """Sortable form of a stored date; non-padded dates are normalized"""
+    if len(text) == 10:
+        return text
+    return iso_date(text) or text
@@ -0,0 +1,203 @@
+import io
+import os
+import sys
+import csv
+import gzip
+import json
+import zlib
+import struct
+from dates import parse_date
+from money import Money
+from storage import TRANSACTION_FIELDS
+
+# Format name -> file extension
+EXPORT_FORMATS = {'csv': '.csv', 'csv.gz': '.csv.gz', 'jsonl': '.jsonl', 'columnar': '.ptc'}
+COLUMNAR_MAGIC = b'PTCOL1\n'
+# Rows per row group of the columnar format
+ROW_GROUP_SIZE = 10000
+
+
+def write_csv(csvfile, transactions):
+    """Write transactions to an open file as CSV; returns how many were written"""
+    writer = csv.DictWriter(csvfile, fieldnames=TRANSACTION_FIELDS)
+    writer.writeheader()
+    count = 0
+    for txn in transactions:
+        writer.writerow(txn)
+        count += 1
+    return count
+
+
+def write_jsonl(jsonfile, transactions):
+    """Write one JSON object per line; returns how many were written"""
+    count = 0
+    for txn in transactions:
+        jsonfile.write(json.dumps({field: txn.get(field, '') for field in TRANSACTION_FIELDS},
+                                  ensure_ascii=False) + '\n')
+        count += 1
+    return count
+
+
+def _column_stats(name, values):
+    """(min, max) of a column chunk: dates and amounts by value, text as strings.
+
+    Dates and amounts that don't parse are left out; a chunk with none
+    has (None, None).
+    """
+    if name == 'date':
+        days = [parsed[0] for parsed in map(parse_date, values) if parsed]
+        if not days:
+            return None, None
+        return min(days), max(days)
+    if name == 'amount':
+        amounts = []
+        for value in values:
+            try:
+                amounts.append(Money.parse(value))
+            except ValueError:
+                continue
+        if not amounts:
+            return None, None
+        return str(min(amounts)), str(max(amounts))
+    return min(values), max(values)
+
+
+class ColumnarWriter:
+    """Streams rows into a column-chunked binary file.
+
+    Layout: COLUMNAR_MAGIC, then row groups of up to ROW_GROUP_SIZE rows,
+    each column of a group stored as a zlib-compressed JSON list of
+    strings. A JSON footer lists every group's row count and, per column,
+    the offset and length of its chunk and its min/max (date ordinals for
+    date, amounts as strings for amount). The file ends with the footer's
+    length as 8 bytes big-endian and the magic again, so a reader can skip
+    groups by their statistics and read only the columns it needs.
+    """
+
+    def __init__(self, f, row_group_size=ROW_GROUP_SIZE):
+        self.f = f
+        self.row_group_size = row_group_size
+        self.groups = []
+        self.count = 0
+        self._pending = []
+        self._offset = len(COLUMNAR_MAGIC)
+        f.write(COLUMNAR_MAGIC)
+
+    def write(self, txn):
+        self._pending.append(txn)
+        self.count += 1
+        if len(self._pending) >= self.row_group_size:
+            self._flush()
+
+    def _flush(self):
+        if not self._pending:
+            return
+        columns = {}
+        for name in TRANSACTION_FIELDS:
+            values = [txn.get(name, '') or '' for txn in self._pending]
+            data = zlib.compress(json.dumps(values, ensure_ascii=False).encode('utf-8'), 6)
+            low, high = _column_stats(name, values)
+            columns[name] = {'offset': self._offset, 'length': len(data), 'min': low, 'max': high}
+            self.f.write(data)
+            self._offset += len(data)
+        self.groups.append({'rows': len(self._pending), 'columns': columns})
+        self._pending = []
+
+    def close(self):
+        self._flush()
+        footer = json.dumps({'fields': TRANSACTION_FIELDS, 'groups': self.groups}).encode('utf-8')
+        self.f.write(footer)
+        self.f.write(struct.pack('>Q', len(footer)))
+        self.f.write(COLUMNAR_MAGIC)
+
+
+def write_columnar(f, transactions):
+    """Write transactions to an open binary file in the columnar format"""
+    writer = ColumnarWriter(f)
+    for txn in transactions:
+        writer.write(txn)
+    writer.close()
+    return writer.count
+
+
+def _group_may_match(group, query):
+    """Whether a row group's date/amount statistics overlap the query's bounds"""
+    if query is None:
+        return True
+    date = group['columns']['date']
+    if date['min'] is not None:
+        if query.day_from is not None and date['max'] < query.day_from:
+            return False
+        if query.day_to is not None and date['min'] > query.day_to:
+            return False
+    amount = group['columns']['amount']
+    if amount['min'] is not None:
+        if query.min_amount is not None and Money.parse(amount['max']) < query.min_amount:
+            return False
+        if query.max_amount is not None and Money.parse(amount['min']) > query.max_amount:
+            return False
+    return True
+
+
+def read_columnar(path, query=None):
+    """Yield the rows of a columnar export, optionally only those matching a query.Query.
+
+    Row groups whose statistics rule the query out are never read.
+    """
+    matches = query.compile() if query is not None else None
+    with open(path, 'rb') as f:
+        if f.read(len(COLUMNAR_MAGIC)) != COLUMNAR_MAGIC:
+            raise ValueError(f'"{path}" is not a columnar export')
+        f.seek(-(8 + len(COLUMNAR_MAGIC)), os.SEEK_END)
+        footer_length = struct.unpack('>Q', f.read(8))[0]
+        f.seek(-(8 + len(COLUMNAR_MAGIC) + footer_length), os.SEEK_END)
+        footer = json.loads(f.read(footer_length))
+        fields = footer['fields']
+        for group in footer['groups']:
+            if not _group_may_match(group, query):
+                continue
+            columns = []
+            for name in fields:
+                chunk = group['columns'][name]
+                f.seek(chunk['offset'])
+                columns.append(json.loads(zlib.decompress(f.read(chunk['length']))))
+            for values in zip(*columns):
+                txn = dict(zip(fields, values))
+                if matches is None or matches(txn):
+                    yield txn
+
+
+def export_rows(transactions, path, export_format='csv', stdout=None):
+    """Stream transactions to path ('-' for stdout) in one of EXPORT_FORMATS.
+
+    Returns how many rows were written. The rows are consumed as they come,
+    so a generator is never collected into memory. stdout is the stream
+    '-' writes to, sys.stdout by default.
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f'Unknown export format "{export_format}" '
+                         f'(use {", ".join(EXPORT_FORMATS)})')
+    if path == '-':
+        stdout = stdout or sys.stdout
+        if export_format == 'csv':
+            return write_csv(stdout, transactions)
+        if export_format == 'jsonl':
+            return write_jsonl(stdout, transactions)
+        binary = stdout.buffer
+        if export_format == 'csv.gz':
+            with gzip.GzipFile(fileobj=binary, mode='wb') as compressed, \
+                    io.TextIOWrapper(compressed, encoding='utf-8', newline='') as text:
+                return write_csv(text, transactions)
+        raise ValueError('The columnar format needs an output file')
+
+    if export_format == 'csv':
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            return write_csv(f, transactions)
+    if export_format == 'csv.gz':
+        with gzip.open(path, 'wt', newline='', encoding='utf-8') as f:
+            return write_csv(f, transactions)
+    if export_format == 'jsonl':
+        with open(path, 'w', encoding='utf-8') as f:
+            return write_jsonl(f, transactions)
+    with open(path, 'wb') as f:
+        return write_columnar(f, transactions)
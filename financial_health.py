@@ -1,10 +1,6 @@
-import csv
-import os
-import datetime
-from decimal import Decimal
-from collections import defaultdict
+from money import currency_exponent
+from storage import get_storage
 from utils import clear_screen
-TRANSACTIONS_FILE = "data/transaction.csv"
 
 
 
@@ -53,32 +49,38 @@ def get_monthly_data(profile_id):
     Get monthly income and expenses data for a profile
     Returns: dict of {month: {'income': amount, 'expenses': amount}}
     """
-    if not os.path.exists(TRANSACTIONS_FILE):
-        return {}
-    
-    monthly_data = defaultdict(lambda: {'income': Decimal('0'), 'expenses': Decimal('0')})
-    
-    with open(TRANSACTIONS_FILE, 'r', encoding='utf-8') as csvfile:
-        reader = csv.DictReader(csvfile)
-        for row in reader:
-            cleaned = {k.strip(): v.strip() for k, v in row.items()}
-            
-            if cleaned.get('profile_id') != profile_id:
-                continue
-            
-            try:
-                txn_date = datetime.datetime.strptime(cleaned['date'], '%Y-%m-%d')
-                month_key = txn_date.strftime('%Y-%m')  # Format: 2025-10
-                amount = Decimal(cleaned['amount'])
-                
-                if cleaned['type'] == 'income':
-                    monthly_data[month_key]['income'] += amount
-                elif cleaned['type'] == 'expense':
-                    monthly_data[month_key]['expenses'] += amount
-            except:
-                continue
-    
-    return dict(monthly_data)
+    # Read the per-month totals the storage engine maintains on every write
+    return {month: {'income': totals['income'], 'expenses': totals['expenses']}
+            for month, totals in get_storage().monthly_totals(profile_id).items()}
+
+
+def monthly_health(monthly_data, exponent=0, months=None):
+    """Per-month rows, oldest first: month, income, expenses, net, ratio and score.
+
+    ratio and score are None for months without income. With months set
+    only the latest that many months are returned.
+    """
+    rows = []
+    for month in sorted(monthly_data):
+        data = monthly_data[month]
+        income = data['income'].with_exponent(exponent)
+        expenses = data['expenses'].with_exponent(exponent)
+        net_balance = income - expenses
+        # Skip the ratio for months with no income to avoid division by zero
+        ratio = float(net_balance / income) if income != 0 else None
+        rows.append({'month': month, 'income': income, 'expenses': expenses, 'net': net_balance,
+                     'ratio': ratio,
+                     'score': calculate_financial_health_score(ratio) if ratio is not None else None})
+    return rows[-months:] if months else rows
+
+
+def average_health(rows):
+    """(average score, status) over monthly_health() rows with a score, or (None, None)"""
+    scores = [row['score'] for row in rows if row['score'] is not None]
+    if not scores:
+        return None, None
+    average = round(sum(scores) / len(scores), 2)
+    return average, categorize_score(average)
 
 
 def show_financial_health(profile):
@@ -93,35 +95,26 @@ def show_financial_health(profile):
         print('\n⚠️  No transaction data found. Please add some transactions first.')
         return
     
-    # Sort months chronologically
-    sorted_months = sorted(monthly_data.keys())
-    
     # Calculate scores for each month
     monthly_scores = []
     
     print(f'\n{"Month":<12} {"Income":<12} {"Expenses":<12} {"Net":<12} {"Ratio":<10} {"Score":<8} {"Status"}')
     print('-' * 80)
     
-    for month in sorted_months:
-        data = monthly_data[month]
-        income = data['income']
-        expenses = data['expenses']
-        net_balance = income - expenses
+    for row in monthly_health(monthly_data, currency_exponent(profile['currency'])):
+        month, income, expenses, net_balance = row['month'], row['income'], row['expenses'], row['net']
         
-        # Skip months with no income to avoid division by zero
-        if income == 0:
+        # Months with no income have no ratio
+        if row['score'] is None:
             print(f'{month:<12} {income:<12} {expenses:<12} {net_balance:<12} {"N/A":<10} {"N/A":<8} {"No Income"}')
             continue
         
-        savings_ratio = float(net_balance / income)
-        score = calculate_financial_health_score(savings_ratio)
-        category = categorize_score(score)
-        
+        score = row['score']
         monthly_scores.append(score)
         
         # Format output
-        ratio_str = f'{savings_ratio:.1%}'
-        print(f'{month:<12} {income:<12.2f} {expenses:<12.2f} {net_balance:<12.2f} {ratio_str:<10} {score:<8.2f} {category}')
+        ratio_str = f'{row["ratio"]:.1%}'
+        print(f'{month:<12} {income:<12.2f} {expenses:<12.2f} {net_balance:<12.2f} {ratio_str:<10} {score:<8.2f} {categorize_score(score)}')
     
     print('-' * 80)
     
@@ -1,50 +1,80 @@
 import csv
 import os
 import datetime
-from decimal import Decimal
-from storage import TRANSACTIONS_FILE
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dates import parse_date
+from money import Money
+from query import parse_query
+from export_formats import EXPORT_FORMATS, export_rows
+from storage import append_transactions, get_storage
 from utils import clear_screen
 
+# Rows validated per worker task, and rows written per storage append
+IMPORT_CHUNK_SIZE = 5000
+IMPORT_BATCH_SIZE = 20000
+
 def export_transactions(user, profile):
-    """Export all transactions for the current profile to a CSV file"""
-    # Check if transactions file exists
-    if not os.path.exists(TRANSACTIONS_FILE):
+    """Stream the current profile's transactions, optionally filtered, to a file"""
+    store = get_storage()
+    
+    # Check if there are any transactions at all
+    if not store.has_transactions():
         print('\nNo transactions found to export!')
         return
     
-    # Read and filter transactions for this profile
-    profile_transactions = []
-    with open(TRANSACTIONS_FILE, 'r', encoding='utf-8') as csvfile:
-        reader = csv.DictReader(csvfile)
-        for row in reader:
-            cleaned_row = {key.strip(): value for key, value in row.items()}
-            if cleaned_row.get('profile_id') == profile['profile_id']:
-                profile_transactions.append(cleaned_row)
-    
-    # Validate that we have transactions to export
-    if not profile_transactions:
-        print('\nNo transactions found for this profile!')
+    print('\nExport Formats:')
+    print('1. CSV')
+    print('2. Compressed CSV (.csv.gz)')
+    print('3. JSON Lines (.jsonl)')
+    print('4. Columnar (column chunks with min/max statistics)')
+    format_choice = input('Select format [1] ✎𓂃  ').strip() or '1'
+    export_format = {'1': 'csv', '2': 'csv.gz', '3': 'jsonl', '4': 'columnar'}.get(format_choice)
+    if export_format is None:
+        print('\nInvalid format!')
+        return
+    
+    # Optional filter, e.g. type:expense amount>100 "coffee", and date range
+    query_text = input('Filter query (leave empty to export all) ✎𓂃  ').strip()
+    date_from = input('From date (YYYY-MM-DD, leave empty for no limit): ').strip()
+    date_to = input('To date (YYYY-MM-DD, leave empty for no limit): ').strip()
+    try:
+        query = parse_query(query_text)
+    except ValueError as e:
+        print(f'\n{e}')
         return
+    for text, bound in ((date_from, 'first'), (date_to, 'last')):
+        if text:
+            parsed = parse_date(text)
+            if parsed is None:
+                print('\nInvalid date format. Please use YYYY-MM-DD.')
+                return
+            query.narrow_days(**{bound: parsed[0]})
+    filtered = bool(query_text or date_from or date_to)
     
     # Generate timestamped filename
     timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
-    filename = f"export_{profile['profile_name']}_{timestamp}.csv"
+    filename = f"export_{profile['profile_name']}_{timestamp}{EXPORT_FORMATS[export_format]}"
     
-    # Write transactions to CSV file
+    # Rows go from the store to the file as they are read
     try:
-        with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
-            fieldnames = ['transaction_id', 'user', 'profile_id', 'type', 'amount', 
-                         'category', 'date', 'description', 'payment_method']
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-            writer.writeheader()
-            
-            for txn in profile_transactions:
-                writer.writerow(txn)
-        
-        print(f'\n✅ Successfully exported {len(profile_transactions)} transactions to "{filename}"')
-        print(f'   Location: {os.path.abspath(filename)}')
+        count = export_rows(store.iter_matching_transactions(profile['profile_id'], query),
+                            filename, export_format)
     except Exception as e:
         print(f'\nError exporting transactions: {e}')
+        return
+    
+    if count == 0:
+        os.remove(filename)
+        print('\nNo transactions match the filter!' if filtered
+              else '\nNo transactions found for this profile!')
+        return
+    print(f'\n✅ Successfully exported {count} transactions to "{filename}"')
+    print(f'   Location: {os.path.abspath(filename)}')
+
+
+REQUIRED_IMPORT_FIELDS = ['transaction_id', 'user', 'profile_id', 'type', 'amount',
+                          'category', 'date', 'description', 'payment_method']
 
 
 def import_transactions(user, profile):
@@ -67,59 +97,30 @@ def import_transactions(user, profile):
     
     import_mode = input('Select option ✎𓂃  ').strip()
     skip_duplicates = import_mode == '1'
+    store = get_storage()
     
-    # Load existing transaction IDs if skipping duplicates
-    existing_txn_ids = set()
-    if skip_duplicates and os.path.exists(TRANSACTIONS_FILE):
-        with open(TRANSACTIONS_FILE, 'r', encoding='utf-8') as csvfile:
-            reader = csv.DictReader(csvfile)
-            for row in reader:
-                existing_txn_ids.add(row.get('transaction_id', '').strip())
-    
-    # Read and validate import file
-    imported_transactions = []
-    skipped_count = 0
-    error_count = 0
+    def show_error(line_num, validation_result):
+        # Only validation issues are reported, not user/profile mismatch
+        _clear_progress()
+        print(f'   ⚠️  Line {line_num}: {validation_result}')
     
     try:
-        with open(filename, 'r', encoding='utf-8') as csvfile:
-            reader = csv.DictReader(csvfile)
-            
-            # Validate CSV headers
-            required_fields = ['transaction_id', 'user', 'profile_id', 'type', 'amount', 
-                             'category', 'date', 'description', 'payment_method']
-            if not all(field in reader.fieldnames for field in required_fields):
-                print(f'\nInvalid CSV format! Missing required fields.')
-                print(f'   Required: {", ".join(required_fields)}')
-                return
-            
-            # Process each row
-            for line_num, row in enumerate(reader, start=2):
-                cleaned_row = {key.strip(): value.strip() for key, value in row.items()}
-                
-                # Validate transaction
-                validation_result = validate_transaction(cleaned_row, line_num)
-                if (validation_result == 'valid' and 
-                    cleaned_row.get('user') == user and 
-                    cleaned_row.get('profile_id') == profile['profile_id']):
-                    
-                    # Check for duplicates
-                    if skip_duplicates and cleaned_row['transaction_id'] in existing_txn_ids:
-                        skipped_count += 1
-                        continue
-                    
-                    imported_transactions.append(cleaned_row)
-                elif validation_result != 'valid':
-                    # Only print errors for validation issues, not user/profile mismatch
-                    print(f'   ⚠️  Line {line_num}: {validation_result}')
-                    error_count += 1
-    
+        valid_count, skipped_count, invalid_lines = check_import_file(
+            store, filename, user, profile['profile_id'], skip_duplicates,
+            on_error=show_error, on_progress=_show_progress)
+        _clear_progress()
+    except ImportFormatError as e:
+        print(f'\n{e}')
+        print(f'   Required: {", ".join(REQUIRED_IMPORT_FIELDS)}')
+        return
     except Exception as e:
+        _clear_progress()
         print(f'\nError reading file: {e}')
         return
+    error_count = len(invalid_lines)
     
     # Validate that we have transactions to import
-    if not imported_transactions:
+    if valid_count <= 0:
         print(f'\n⚠️  No valid transactions to import!')
         if skipped_count > 0:
             print(f'   Skipped {skipped_count} duplicate(s)')
@@ -129,7 +130,7 @@ def import_transactions(user, profile):
     
     # Display summary and get confirmation
     print(f'\n📊 Import Summary:')
-    print(f'   Valid transactions: {len(imported_transactions)}')
+    print(f'   Valid transactions: {valid_count}')
     if skipped_count > 0:
         print(f'   Skipped duplicates: {skipped_count}')
     if error_count > 0:
@@ -140,24 +141,179 @@ def import_transactions(user, profile):
         print('Import cancelled.')
         return
     
-    # Append transactions to file
+    progress = {'imported': 0}
+    
+    def show_imported(count):
+        progress['imported'] = count
+        _show_progress(f'Imported {count} transaction(s)...')
+    
     try:
-        file_exists = os.path.exists(TRANSACTIONS_FILE)
+        imported_count = write_import_file(store, filename, user, profile['profile_id'],
+                                           invalid_lines, skip_duplicates, on_batch=show_imported)
+        _clear_progress()
         
-        with open(TRANSACTIONS_FILE, 'a', newline='', encoding='utf-8') as csvfile:
-            fieldnames = ['transaction_id', 'user', 'profile_id', 'type', 'amount', 
-                         'category', 'date', 'description', 'payment_method']
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-            
-            if not file_exists or os.stat(TRANSACTIONS_FILE).st_size == 0:
-                writer.writeheader()
-            
-            for txn in imported_transactions:
-                writer.writerow(txn)
-        
-        print(f'\n✅ Successfully imported {len(imported_transactions)} transactions!')
+        print(f'\n✅ Successfully imported {imported_count} transactions!')
     except Exception as e:
+        _clear_progress()
         print(f'\nError writing transactions: {e}')
+        if progress['imported']:
+            print(f'   {progress["imported"]} transaction(s) were imported before the error.')
+
+
+class ImportFormatError(ValueError):
+    """The import file lacks required columns"""
+
+
+def check_import_file(store, filename, user, profile_id, skip_duplicates=True,
+                      on_error=None, on_progress=None):
+    """First import pass: validate the file chunk by chunk without writing.
+
+    Keeps only counts and the line numbers that failed validation.
+    Returns (rows to import, duplicates skipped, invalid line numbers);
+    raises ImportFormatError when required columns are missing.
+    """
+    valid_count = 0
+    skipped_count = 0
+    invalid_lines = set()
+    with open(filename, 'r', encoding='utf-8') as csvfile:
+        reader = csv.DictReader(csvfile)
+        
+        # Validate CSV headers
+        if not all(field in (reader.fieldnames or []) for field in REQUIRED_IMPORT_FIELDS):
+            raise ImportFormatError('Invalid CSV format! Missing required fields.')
+        
+        checked = 0
+        for chunk_size, valid_ids, errors in _validated_chunks(reader, user, profile_id):
+            for line_num, validation_result in errors:
+                if on_error:
+                    on_error(line_num, validation_result)
+                invalid_lines.add(line_num)
+            
+            # Count rows the second pass will skip, the same way it does
+            if skip_duplicates and valid_ids:
+                skipped_count += len(valid_ids) - len(_new_rows(store, valid_ids, set(), lambda tid: tid))
+            valid_count += len(valid_ids)
+            checked += chunk_size
+            if on_progress:
+                on_progress(f'Checked {checked} row(s)...')
+    return valid_count - skipped_count, skipped_count, invalid_lines
+
+
+def write_import_file(store, filename, user, profile_id, invalid_lines, skip_duplicates=True,
+                      on_batch=None):
+    """Second import pass: stream the file again and append the valid rows in batches.
+
+    on_batch is called with the running total after each batch; returns
+    the number of rows imported.
+    """
+    imported_count = 0
+    imported_ids = set()
+    with open(filename, 'r', encoding='utf-8') as csvfile:
+        batch = []
+        for line_num, row in enumerate(csv.DictReader(csvfile), start=2):
+            if line_num in invalid_lines:
+                continue
+            cleaned_row = {key.strip(): value.strip() for key, value in row.items()}
+            if (cleaned_row.get('user') != user or
+                    cleaned_row.get('profile_id') != profile_id):
+                continue
+            batch.append(cleaned_row)
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                imported_count += _write_import_batch(store, batch, skip_duplicates, imported_ids)
+                if on_batch:
+                    on_batch(imported_count)
+                batch = []
+        if batch:
+            imported_count += _write_import_batch(store, batch, skip_duplicates, imported_ids)
+    return imported_count
+
+
+def _read_chunks(reader):
+    """Yield the rows of a CSV reader as lists of (line number, row)"""
+    chunk = []
+    for line_num, row in enumerate(reader, start=2):
+        chunk.append((line_num, row))
+        if len(chunk) >= IMPORT_CHUNK_SIZE:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _validate_chunk(chunk, user, profile_id):
+    """Validate a chunk of rows; returns (row count, valid IDs, [(line, error)])"""
+    valid_ids = []
+    errors = []
+    for line_num, row in chunk:
+        cleaned_row = {key.strip(): value.strip() for key, value in row.items()}
+        
+        validation_result = validate_transaction(cleaned_row, line_num)
+        if validation_result != 'valid':
+            errors.append((line_num, validation_result))
+        elif cleaned_row.get('user') == user and cleaned_row.get('profile_id') == profile_id:
+            valid_ids.append(cleaned_row['transaction_id'])
+    return len(chunk), valid_ids, errors
+
+
+def _validated_chunks(reader, user, profile_id):
+    """Validate a CSV reader's rows chunk by chunk, in file order.
+
+    The first chunk is validated in this process; larger files are handed to
+    a process pool with a bounded number of chunks in flight.
+    """
+    chunks = _read_chunks(reader)
+    first = next(chunks, None)
+    if first is None:
+        return
+    yield _validate_chunk(first, user, profile_id)
+    if len(first) < IMPORT_CHUNK_SIZE:
+        return
+    
+    workers = os.cpu_count() or 1
+    if workers < 2:
+        for chunk in chunks:
+            yield _validate_chunk(chunk, user, profile_id)
+        return
+    
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(_validate_chunk, chunk, user, profile_id))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def _new_rows(store, rows, imported_ids, transaction_id):
+    """The rows whose ID was not stored before the import began.
+
+    imported_ids are the IDs this import has written so far; they don't
+    count as stored, so only IDs already in the store are skipped and an ID
+    the file repeats is imported every time, as in a single-pass import.
+    Both passes skip duplicates through this, so the summary counts what
+    the write does.
+    """
+    existing_txn_ids = store.existing_transaction_ids({transaction_id(row) for row in rows}) - imported_ids
+    return [row for row in rows if transaction_id(row) not in existing_txn_ids]
+
+
+def _write_import_batch(store, batch, skip_duplicates, imported_ids):
+    """Append a batch of imported rows, dropping IDs stored before the import"""
+    if skip_duplicates:
+        batch = _new_rows(store, batch, imported_ids, lambda txn: txn['transaction_id'])
+        imported_ids.update(txn['transaction_id'] for txn in batch)
+    if batch:
+        append_transactions(batch)
+    return len(batch)
+
+
+def _show_progress(message):
+    print(f'\r   {message}', end='', flush=True)
+
+
+def _clear_progress():
+    print('\r' + ' ' * 60 + '\r', end='', flush=True)
 
 
 def validate_transaction(txn, line_num):
@@ -176,16 +332,14 @@ def validate_transaction(txn, line_num):
     
     # Validate amount
     try:
-        amount = Decimal(txn['amount'])
+        amount = Money.parse(txn['amount'])
         if amount <= 0:
             return f'Amount must be greater than 0'
     except:
         return f'Invalid amount "{txn["amount"]}"'
     
     # Validate date format
-    try:
-        datetime.datetime.strptime(txn['date'], '%Y-%m-%d')
-    except ValueError:
+    if parse_date(txn['date']) is None:
         return f'Invalid date format "{txn["date"]}" (use YYYY-MM-DD)'
     
     return 'valid'
@@ -0,0 +1,221 @@
+import os
+import re
+import json
+import bisect
+
+WORD = re.compile(r'\w+')
+# Terms are tagged by kind so trigrams and words share one postings table
+TRIGRAM_TAG = '3'
+WORD_TAG = 'w'
+# Fold the postings log into the snapshot once it holds this many rows
+LOG_COMPACTION_ROWS = 1000
+
+
+def _texts(row):
+    return (row.get('category') or '').lower(), (row.get('description') or '').lower()
+
+
+def row_terms(row):
+    """Index terms of a row: the trigrams and words of its category and description"""
+    terms = set()
+    for text in _texts(row):
+        terms.update(TRIGRAM_TAG + text[start:start + 3] for start in range(len(text) - 2))
+        terms.update(WORD_TAG + word for word in WORD.findall(text))
+    return terms
+
+
+def keyword_terms(keyword):
+    """Trigram terms every row containing keyword has, or None below three characters"""
+    keyword = keyword.lower()
+    if len(keyword) < 3:
+        return None
+    return {TRIGRAM_TAG + keyword[start:start + 3] for start in range(len(keyword) - 2)}
+
+
+def prefix_bounds(prefix):
+    """[low, high) range of the word terms starting with prefix"""
+    low = WORD_TAG + prefix.lower()
+    return low, low + '\U0010ffff'
+
+
+def has_word_prefix(row, prefix):
+    """Whether a word of the row's category or description starts with prefix"""
+    prefix = prefix.lower()
+    return any(word.startswith(prefix) for text in _texts(row) for word in WORD.findall(text))
+
+
+class KeywordIndex:
+    """Inverted index of a CSV partition's category and description text.
+
+    Postings map each term to {transaction_id: rows having it}; rows are
+    counted because nothing stops two rows from sharing a transaction_id.
+    The index is a JSON snapshot (<partition>.kw) plus a log of changes
+    (<partition>.kwl), each tagged with the partition file signatures it
+    goes from and to. Writers only append to the log; a reader that finds
+    the chain broken, or not ending at the partition's current signature,
+    rebuilds the index from the rows.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.log_path = path + 'l'
+        self.source = None
+        self._postings = {}
+        self._words = None       # sorted word terms, built on the first prefix query
+        self._signature = None
+        self._log_rows = 0
+
+    def _files_signature(self):
+        signatures = []
+        for path in (self.path, self.log_path):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                signatures.append(None)
+            else:
+                signatures.append((stat.st_mtime_ns, stat.st_size))
+        return signatures
+
+    def _apply(self, added, removed):
+        for transaction_id, category, description in removed:
+            for term in row_terms({'category': category, 'description': description}):
+                rows = self._postings.get(term)
+                if rows is None or transaction_id not in rows:
+                    continue
+                rows[transaction_id] -= 1
+                if rows[transaction_id] <= 0:
+                    del rows[transaction_id]
+                    if not rows:
+                        del self._postings[term]
+                        self._words = None
+        for transaction_id, category, description in added:
+            for term in row_terms({'category': category, 'description': description}):
+                rows = self._postings.get(term)
+                if rows is None:
+                    rows = self._postings[term] = {}
+                    self._words = None
+                rows[transaction_id] = rows.get(transaction_id, 0) + 1
+
+    def _load(self):
+        """Read the snapshot and replay the log, unless already in memory"""
+        signature = self._files_signature()
+        if signature == self._signature:
+            return
+        self._postings = {}
+        self._words = None
+        self._log_rows = 0
+        self.source = [None, None]
+        if os.path.exists(self.path):
+            with open(self.path, 'r', encoding='utf-8') as f:
+                snapshot = json.load(f)
+            self.source = snapshot['source']
+            self._postings = snapshot['postings']
+        if os.path.exists(self.log_path):
+            with open(self.log_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Torn final write
+                        self.source = None
+                        break
+                    if record['from'] != self.source:
+                        self.source = None
+                        break
+                    self._apply(record['add'], record['remove'])
+                    self.source = record['to']
+                    self._log_rows += len(record['add']) + len(record['remove'])
+        self._signature = signature
+
+    def describes(self, source):
+        """Whether the index matches partition files with this signature"""
+        self._load()
+        return self.source is not None and self.source == json.loads(json.dumps(source))
+
+    def save(self, source):
+        """Write the in-memory postings as a fresh snapshot and drop the log"""
+        temp_file = self.path + '.tmp'
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump({'source': source, 'postings': self._postings}, f, ensure_ascii=False)
+        os.replace(temp_file, self.path)
+        if os.path.exists(self.log_path):
+            os.remove(self.log_path)
+        self.source = json.loads(json.dumps(source))
+        self._log_rows = 0
+        self._signature = self._files_signature()
+
+    def rebuild(self, rows, source):
+        self._postings = {}
+        self._words = None
+        self._apply([(row.get('transaction_id'), row.get('category'), row.get('description'))
+                     for row in rows], [])
+        self.save(source)
+
+    def maybe_fold(self):
+        """Fold a long log into the snapshot; call once the index is current"""
+        if self._log_rows >= LOG_COMPACTION_ROWS:
+            self.save(self.source)
+
+    def record(self, previous_source, source, added=(), removed=()):
+        """Log a partition write that took its files from one signature to another"""
+        added = [(row.get('transaction_id'), row.get('category'), row.get('description'))
+                 for row in added]
+        removed = [(row.get('transaction_id'), row.get('category'), row.get('description'))
+                   for row in removed]
+        was_loaded = self._signature is not None and self._signature == self._files_signature()
+        with open(self.log_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps({'from': previous_source, 'to': source,
+                                'add': added, 'remove': removed}, ensure_ascii=False) + '\n')
+        if was_loaded and self.source == json.loads(json.dumps(previous_source)):
+            self._apply(added, removed)
+            self.source = json.loads(json.dumps(source))
+            self._log_rows += len(added) + len(removed)
+            self._signature = self._files_signature()
+
+    def remove(self):
+        for path in (self.path, self.log_path):
+            if os.path.exists(path):
+                os.remove(path)
+        self._signature = None
+
+    def _prefix_ids(self, prefix):
+        if self._words is None:
+            self._words = sorted(term for term in self._postings if term.startswith(WORD_TAG))
+        low, high = prefix_bounds(prefix)
+        ids = set()
+        for position in range(bisect.bisect_left(self._words, low), bisect.bisect_left(self._words, high)):
+            ids.update(self._postings[self._words[position]])
+        return ids
+
+    def candidates(self, keywords=(), prefixes=()):
+        """Transaction IDs that may match every keyword and word prefix.
+
+        Posting lists are intersected smallest first, so the result is a
+        superset of the matches that the caller still checks row by row.
+        None means the index can't narrow the search (no usable terms).
+        """
+        postings = []
+        for keyword in keywords:
+            terms = keyword_terms(keyword)
+            if terms is None:
+                continue
+            lists = [self._postings.get(term) for term in terms]
+            if not all(lists):
+                return set()
+            postings.extend(lists)
+        postings.sort(key=len)
+        prefix_sets = sorted((self._prefix_ids(prefix) for prefix in prefixes if prefix), key=len)
+        if not postings and not prefix_sets:
+            return None
+        ids = set(postings[0]) if postings else set(prefix_sets.pop(0))
+        for rows in postings[1:]:
+            # Probe the larger list with the smaller set, never the reverse
+            ids = {transaction_id for transaction_id in ids if transaction_id in rows}
+            if not ids:
+                return ids
+        for prefix_ids in prefix_sets:
+            ids &= prefix_ids
+        return ids
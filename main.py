@@ -1,11 +1,9 @@
-from storage import monthly_backup
-from users import register, login, profile_menu
-from transactions import Transactions
-from reports import Reports
-from import_export import ImportExport
-from recurring_transactions import execute_due_recurring_transactions
+from storage import session_backup, start_housekeeping, finish_housekeeping
 from utils import clear_screen, PrintMenu, PrintMesg
 
+# Feature modules (bcrypt, NumPy, the process pool...) are imported by the
+# screens that use them, so the main menu appears without waiting for them
+
 def menu():
     PrintMenu('Expense Tracker Main Menu', ['Login', 'Register', 'Exit'])
     return input('Please select an option ✎𓂃  ')
@@ -20,12 +18,16 @@ def HomePage(user, profile):
         choice = input('Please select an option ✎𓂃  ')
         
         if choice == '1':
+            from transactions import Transactions
             Transactions(user, profile)
         elif choice == '2':
+            from reports import Reports
             Reports(user, profile)
         elif choice == '3':
+            from import_export import ImportExport
             ImportExport(user, profile)
         elif choice == '4':
+            from users import profile_menu
             new_profile = profile_menu(user)
             if new_profile:
                 profile = new_profile
@@ -37,12 +39,21 @@ def HomePage(user, profile):
         else:
             print('Invalid choice. Please try again.')
 
-if __name__ == '__main__':
-    monthly_backup()
+def run_due_recurring_transactions():
+    from recurring_transactions import execute_due_recurring_transactions
     execute_due_recurring_transactions()
+
+
+if __name__ == '__main__':
+    # The backup and the recurring run go to a worker thread; the first
+    # storage access of any screen waits for it to finish
+    start_housekeeping(session_backup, run_due_recurring_transactions)
     while True:
         clear_screen()
         choice = menu()
+        if choice in ('1', '2'):
+            from users import register, login, profile_menu
+            from sessions import end_session
         if choice == '1':
             user = login()
             if user:
@@ -53,6 +64,7 @@ if __name__ == '__main__':
                     result = HomePage(user, profile)
                     if result == 'logout':
                         break
+                end_session(user)
         elif choice == '2':
             user = register()
             if user:
@@ -63,8 +75,10 @@ if __name__ == '__main__':
                     result = HomePage(user, profile)
                     if result == 'logout':
                         break
+                end_session(user)
         elif choice == '3':
             print('Exiting the program. Goodbye!')
+            finish_housekeeping()
             break
         else:
             print('Invalid choice. Please try again.')
@@ -0,0 +1,142 @@
+import functools
+from decimal import Decimal, InvalidOperation
+
+# ISO 4217 minor units of currencies that don't use two decimal places
+CURRENCY_EXPONENTS = {
+    'BIF': 0, 'CLP': 0, 'DJF': 0, 'GNF': 0, 'ISK': 0, 'JPY': 0, 'KMF': 0,
+    'KRW': 0, 'PYG': 0, 'RWF': 0, 'UGX': 0, 'VND': 0, 'VUV': 0, 'XAF': 0,
+    'XOF': 0, 'XPF': 0,
+    'BHD': 3, 'IQD': 3, 'JOD': 3, 'KWD': 3, 'LYD': 3, 'OMR': 3, 'TND': 3,
+}
+DEFAULT_EXPONENT = 2
+# Amounts are refused beyond this many integer digits or decimal places;
+# scaling anything larger to minor units overflows or takes forever
+MAX_DIGITS = 30
+
+
+def currency_exponent(currency):
+    """Number of decimal places of a currency's minor unit"""
+    return CURRENCY_EXPONENTS.get((currency or '').strip().upper(), DEFAULT_EXPONENT)
+
+
+@functools.lru_cache(maxsize=65536)
+def _parse(text):
+    """(minor units, exponent) of an amount string, parsed once per string"""
+    try:
+        amount = Decimal(text)
+    except (InvalidOperation, TypeError):
+        raise ValueError(f'Invalid amount "{text}"') from None
+    if not amount.is_finite():
+        raise ValueError(f'Invalid amount "{text}"')
+    exponent = max(0, -amount.as_tuple().exponent)
+    if exponent > MAX_DIGITS or amount.adjusted() >= MAX_DIGITS:
+        raise ValueError(f'Invalid amount "{text}"')
+    try:
+        return int(amount.scaleb(exponent)), exponent
+    except ArithmeticError:
+        raise ValueError(f'Invalid amount "{text}"') from None
+
+
+@functools.total_ordering
+class Money:
+    """Exact fixed-point amount: an integer count of 10**-exponent units.
+
+    The exponent is at least the currency's and grows to keep every digit of
+    the amounts combined into it, so arithmetic never rounds. Amount strings
+    only come back out of str() for display and CSV output.
+    """
+
+    __slots__ = ('minor', 'exponent')
+
+    def __init__(self, minor=0, exponent=0):
+        self.minor = minor
+        self.exponent = exponent
+
+    @classmethod
+    def parse(cls, text, exponent=0):
+        """Parse an amount string; raises ValueError if it isn't a number"""
+        minor, digits = _parse(text.strip() if isinstance(text, str) else text)
+        if digits < exponent:
+            return cls(minor * 10 ** (exponent - digits), exponent)
+        return cls(minor, digits)
+
+    def with_exponent(self, exponent):
+        """The same amount with at least this many decimal places"""
+        if exponent <= self.exponent:
+            return self
+        return Money(self.minor * 10 ** (exponent - self.exponent), exponent)
+
+    def _aligned(self, other):
+        if isinstance(other, int):
+            other = Money(other)
+        elif not isinstance(other, Money):
+            return None, None
+        exponent = max(self.exponent, other.exponent)
+        return self.with_exponent(exponent), other.with_exponent(exponent)
+
+    def __add__(self, other):
+        left, right = self._aligned(other)
+        if left is None:
+            return NotImplemented
+        return Money(left.minor + right.minor, left.exponent)
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        left, right = self._aligned(other)
+        if left is None:
+            return NotImplemented
+        return Money(left.minor - right.minor, left.exponent)
+
+    def __rsub__(self, other):
+        return (-self) + other
+
+    def __neg__(self):
+        return Money(-self.minor, self.exponent)
+
+    def __mul__(self, factor):
+        if not isinstance(factor, int):
+            return NotImplemented
+        return Money(self.minor * factor, self.exponent)
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, other):
+        """Money / Money is an exact Decimal ratio"""
+        left, right = self._aligned(other)
+        if left is None:
+            return NotImplemented
+        return Decimal(left.minor) / Decimal(right.minor)
+
+    def __eq__(self, other):
+        left, right = self._aligned(other)
+        if left is None:
+            return NotImplemented
+        return left.minor == right.minor
+
+    def __lt__(self, other):
+        left, right = self._aligned(other)
+        if left is None:
+            return NotImplemented
+        return left.minor < right.minor
+
+    def __hash__(self):
+        return hash(self.to_decimal())
+
+    def __bool__(self):
+        return self.minor != 0
+
+    def to_decimal(self):
+        return Decimal(self.minor).scaleb(-self.exponent)
+
+    def __float__(self):
+        return float(self.to_decimal())
+
+    def __str__(self):
+        return str(self.to_decimal())
+
+    def __repr__(self):
+        return f"Money('{self}')"
+
+    def __format__(self, spec):
+        return format(self.to_decimal(), spec)
@@ -0,0 +1,105 @@
+from decimal import Decimal, InvalidOperation
+from money import Money
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+TYPE_CODES = {'income': 1, 'expense': 2}
+# Amounts with more decimal places than this are left to the Python reports
+MAX_SCALE = 9
+# Sums must stay exact in int64, and in float64 for bincount weights
+MAX_EXACT_TOTAL = 2 ** 53
+
+
+def available():
+    return np is not None
+
+
+class ColumnarTransactions:
+    """A profile's rows as NumPy columns.
+
+    amounts are integers in units of 10**-scale, places keep each row's
+    decimal places so results carry the same Money exponent as the Python
+    reports, and categories are codes into the categories list.
+    """
+
+    def __init__(self, transactions, exponent=0):
+        self.transactions = transactions
+        self.exponent = exponent
+        count = len(transactions)
+
+        # One pass over the rows maps every field to a code; each distinct
+        # amount and category is then parsed only once
+        amount_codes = {}
+        category_codes = {}
+        amount_column = np.empty(count, dtype=np.int32)
+        category_column = np.empty(count, dtype=np.int32)
+        type_column = np.empty(count, dtype=np.int8)
+        for position, txn in enumerate(transactions):
+            amount_column[position] = amount_codes.setdefault(txn['amount'], len(amount_codes))
+            category_column[position] = category_codes.setdefault(txn['category'], len(category_codes))
+            type_column[position] = TYPE_CODES.get(txn['type'], 0)
+
+        parsed = [Decimal(text.strip()) for text in amount_codes]
+        if not all(amount.is_finite() for amount in parsed):
+            raise InvalidOperation('non-finite amount')
+        places = [max(exponent, -amount.as_tuple().exponent) for amount in parsed]
+        self.scale = max(places, default=exponent)
+        if self.scale > MAX_SCALE:
+            raise InvalidOperation('too many decimal places')
+        scaled = np.array([int(amount.scaleb(self.scale)) for amount in parsed] or [0], dtype=np.int64)
+        self.amounts = scaled[amount_column]
+        self.places = np.array(places or [0], dtype=np.int32)[amount_column]
+        if int(np.abs(self.amounts).sum()) >= MAX_EXACT_TOTAL:
+            raise InvalidOperation('totals too large for exact integer sums')
+
+        self.categories = list(category_codes)
+        self.category_codes = category_column
+        self.types = type_column
+
+    def to_money(self, value, places):
+        """A scaled integer sum as the Money the reference loop would return"""
+        return Money(int(value) // 10 ** (self.scale - int(places)), int(places))
+
+    def total(self, mask):
+        """Sum of the masked amounts; zero when nothing matches"""
+        if not mask.any():
+            return Money(0, self.exponent)
+        return self.to_money(self.amounts[mask].sum(), self.places[mask].max())
+
+
+def load(transactions, exponent=0):
+    """Columnar form of the rows, or None when they cannot be summed exactly"""
+    if np is None:
+        return None
+    try:
+        return ColumnarTransactions(transactions, exponent)
+    except (InvalidOperation, KeyError, TypeError, ValueError, OverflowError):
+        return None
+
+
+def summarize(transactions, exponent=0):
+    """Vectorized summarize_transactions(); None to fall back to it"""
+    columns = load(transactions, exponent)
+    if columns is None:
+        return None
+    income = columns.types == TYPE_CODES['income']
+    expense = columns.types == TYPE_CODES['expense']
+
+    category_expense = {}
+    if expense.any():
+        codes = columns.category_codes[expense]
+        size = len(columns.categories)
+        sums = np.bincount(codes, weights=columns.amounts[expense], minlength=size)
+        places = np.full(size, exponent, dtype=np.int32)
+        np.maximum.at(places, codes, columns.places[expense])
+
+        # Keep the Python loop's insertion order: first expense per category
+        used, first = np.unique(codes, return_index=True)
+        for code in used[np.argsort(first)]:
+            category_expense[columns.categories[code]] = columns.to_money(
+                round(sums[code]), places[code])
+
+    return columns.total(income), columns.total(expense), category_expense
@@ -0,0 +1,124 @@
+import sys
+from dates import parse_date
+
+PAGE_SIZE = 20
+NAVIGATION = '[n]ext  [p]revious  [j]ump to date  [q]uit'
+
+
+class Pager:
+    """Pages over an iterator of rows, pulling rows only as pages need them.
+
+    The cursor is the position of the current page's first row. Rows already
+    pulled are kept, so going back never re-reads the store and going
+    forward only reads the next page.
+    """
+
+    def __init__(self, rows, page_size=PAGE_SIZE):
+        self._source = iter(rows)
+        self._rows = []
+        self.exhausted = False
+        self.page_size = page_size
+        self.cursor = 0
+
+    def _pull(self, count):
+        """Pull rows until count are held or the source runs out"""
+        while not self.exhausted and len(self._rows) < count:
+            try:
+                self._rows.append(next(self._source))
+            except StopIteration:
+                self.exhausted = True
+
+    def page(self):
+        """The rows of the current page"""
+        self._pull(self.cursor + self.page_size)
+        return self._rows[self.cursor:self.cursor + self.page_size]
+
+    @property
+    def total(self):
+        """Number of rows, or None while the source isn't exhausted"""
+        return len(self._rows) if self.exhausted else None
+
+    def has_next(self):
+        self._pull(self.cursor + self.page_size + 1)
+        return len(self._rows) > self.cursor + self.page_size
+
+    def next(self):
+        if not self.has_next():
+            return False
+        self.cursor += self.page_size
+        return True
+
+    def previous(self):
+        if self.cursor == 0:
+            return False
+        self.cursor = max(0, self.cursor - self.page_size)
+        return True
+
+    def jump(self, matches):
+        """Move to the page holding the first row for which matches(row) is true"""
+        position = 0
+        while True:
+            self._pull(position + 1)
+            if position >= len(self._rows):
+                return False
+            if matches(self._rows[position]):
+                self.cursor = position - position % self.page_size
+                return True
+            position += 1
+
+
+def _reached_date(day, descending):
+    """Whether a row is dated on or after day (on or before it when descending)"""
+    def reached(row):
+        parsed = parse_date(row['date'])
+        return parsed is not None and (parsed[0] <= day if descending else parsed[0] >= day)
+    return reached
+
+
+def render_page(pager, format_row, header=''):
+    """One page as a single block of text"""
+    rows = pager.page()
+    lines = [header] if header else []
+    lines.extend(format_row(row) for row in rows)
+    first = pager.cursor + 1 if rows else 0
+    total = pager.total
+    lines.append(f'Showing {first}-{pager.cursor + len(rows)}' +
+                 (f' of {total}' if total is not None else ''))
+    return '\n'.join(lines)
+
+
+def browse(pager, format_row, header='', descending_dates=False, action_prompt=None):
+    """Let the user page through a Pager's rows; each page is written in one write.
+
+    Jumping to a date goes to the first row dated on or after it, or on or
+    before it when the rows are listed newest first. With action_prompt
+    set, any other input ends browsing and is returned (e.g. a transaction
+    ID), an empty one as '' so the caller can report it; None is returned
+    when the user quits.
+    """
+    prompt = f'\n{NAVIGATION}' + (f'\n{action_prompt}' if action_prompt else '') + ' ✎𓂃  '
+    while True:
+        sys.stdout.write(render_page(pager, format_row, header) + '\n')
+        sys.stdout.flush()
+        choice = input(prompt).strip()
+        command = choice.lower()
+        if command == 'n':
+            if not pager.next():
+                print('\nAlready on the last page.')
+        elif command == 'p':
+            if not pager.previous():
+                print('\nAlready on the first page.')
+        elif command == 'j':
+            parsed = parse_date(input('Jump to date (YYYY-MM-DD): ').strip())
+            if parsed is None:
+                print('\nInvalid date format. Please use YYYY-MM-DD.')
+                continue
+            if not pager.jump(_reached_date(parsed[0], descending_dates)):
+                print('\nNo transactions from that date onwards.' if not descending_dates
+                      else '\nNo transactions up to that date.')
+        elif command == 'q' or (not command and not action_prompt):
+            return None
+        elif action_prompt:
+            return choice
+        else:
+            print('\nInvalid choice. Please try again.')
@@ -0,0 +1,225 @@
+import shlex
+import datetime
+from dates import parse_date
+from keyword_index import has_word_prefix
+from money import Money
+
+TRANSACTION_TYPES = ('income', 'expense')
+COMPARISONS = ('>=', '<=', '>', '<', ':')
+
+
+def _parse_day_or_month(text):
+    """(first day, last day) ordinals of a YYYY-MM-DD day or a YYYY-MM month"""
+    parsed = parse_date(text)
+    if parsed:
+        return parsed[0], parsed[0]
+    first = parse_date(text + '-01')
+    if first is None or text.count('-') != 1:
+        return None
+    year, month = first[1], first[2]
+    following = datetime.date(year + month // 12, month % 12 + 1, 1)
+    return first[0], following.toordinal() - 1
+
+
+class Query:
+    """Transaction filter criteria, validated once and compiled into a predicate.
+
+    Every criterion is optional and a row has to match all that are set.
+    Dates are inclusive day ordinals, amounts are Money bounds, keywords
+    are lowercase substrings of the category or description and prefixes
+    are the start of one of their words.
+    """
+
+    def __init__(self, txn_type=None, category=None, day_from=None, day_to=None,
+                 min_amount=None, max_amount=None, keywords=(), prefixes=(), valid_only=False):
+        self.txn_type = txn_type
+        self.category = category
+        self.day_from = day_from
+        self.day_to = day_to
+        self.min_amount = min_amount
+        self.min_inclusive = True
+        self.max_amount = max_amount
+        self.max_inclusive = True
+        self.keywords = [keyword.lower() for keyword in keywords if keyword]
+        self.prefixes = [prefix.lower() for prefix in prefixes if prefix]
+        # Also drop rows whose date or amount can't be parsed, like the search screen
+        self.valid_only = valid_only
+
+    def narrow_days(self, first=None, last=None):
+        if first is not None and (self.day_from is None or first > self.day_from):
+            self.day_from = first
+        if last is not None and (self.day_to is None or last < self.day_to):
+            self.day_to = last
+
+    def narrow_amounts(self, low=None, high=None, low_inclusive=True, high_inclusive=True):
+        if low is not None and (self.min_amount is None or low > self.min_amount or
+                                (low == self.min_amount and not low_inclusive)):
+            self.min_amount, self.min_inclusive = low, low_inclusive
+        if high is not None and (self.max_amount is None or high < self.max_amount or
+                                 (high == self.max_amount and not high_inclusive)):
+            self.max_amount, self.max_inclusive = high, high_inclusive
+
+    def date_range(self):
+        """The date bounds as YYYY-MM-DD strings, for storage engine range reads"""
+        return tuple(datetime.date.fromordinal(day).isoformat() if day is not None else None
+                     for day in (self.day_from, self.day_to))
+
+    def predicates(self):
+        """Row checks for the set criteria, cheapest and most selective first"""
+        checks = []
+        if self.txn_type:
+            txn_type = self.txn_type
+            checks.append(lambda row: row['type'].lower() == txn_type)
+        if self.category:
+            category = self.category.lower()
+            checks.append(lambda row: row['category'].lower() == category)
+
+        if self.day_from is not None or self.day_to is not None or self.valid_only:
+            first_day = self.day_from if self.day_from is not None else float('-inf')
+            last_day = self.day_to if self.day_to is not None else float('inf')
+
+            def in_date_range(row):
+                parsed = parse_date(row['date'])
+                return parsed is not None and first_day <= parsed[0] <= last_day
+            checks.append(in_date_range)
+
+        if self.min_amount is not None or self.max_amount is not None or self.valid_only:
+            low, high = self.min_amount, self.max_amount
+            low_inclusive, high_inclusive = self.min_inclusive, self.max_inclusive
+
+            def in_amount_range(row):
+                try:
+                    amount = Money.parse(row['amount'])
+                except ValueError:
+                    return False
+                if low is not None and (amount < low if low_inclusive else amount <= low):
+                    return False
+                if high is not None and (amount > high if high_inclusive else amount >= high):
+                    return False
+                return True
+            checks.append(in_amount_range)
+
+        for keyword in self.keywords:
+            checks.append(lambda row, keyword=keyword: (keyword in row['description'].lower() or
+                                                        keyword in row['category'].lower()))
+        for prefix in self.prefixes:
+            checks.append(lambda row, prefix=prefix: has_word_prefix(row, prefix))
+        return checks
+
+    def compile(self):
+        """A function telling whether a row matches every criterion"""
+        checks = self.predicates()
+
+        def matches(row):
+            for check in checks:
+                if not check(row):
+                    return False
+            return True
+        return matches
+
+    def filter(self, rows):
+        matches = self.compile()
+        return [row for row in rows if matches(row)]
+
+
+def filters_query(keyword='', date_from='', date_to='', min_amount='', max_amount='', txn_type=''):
+    """Build a Query from the search screen's fields.
+
+    Returns (query, warnings): a field that doesn't parse is skipped with a
+    warning, once, instead of failing the whole search.
+    """
+    query = Query(txn_type=txn_type.lower() or None, keywords=[keyword], valid_only=True)
+    warnings = []
+    if date_from:
+        parsed = parse_date(date_from)
+        if parsed is None:
+            warnings.append("Invalid 'from' date format, skipping filter.")
+        else:
+            query.narrow_days(first=parsed[0])
+    if date_to:
+        parsed = parse_date(date_to)
+        if parsed is None:
+            warnings.append("Invalid 'to' date format, skipping filter.")
+        else:
+            query.narrow_days(last=parsed[0])
+    if min_amount:
+        try:
+            query.narrow_amounts(low=Money.parse(min_amount))
+        except ValueError:
+            warnings.append("Invalid minimum amount format.")
+    if max_amount:
+        try:
+            query.narrow_amounts(high=Money.parse(max_amount))
+        except ValueError:
+            warnings.append("Invalid maximum amount format.")
+    return query, warnings
+
+
+def parse_query(text):
+    """Build a Query from a query string; raises ValueError on a bad term.
+
+    Terms: type:income|expense, category:NAME, date:D, date>=D, date>D,
+    date<=D, date<D (D is YYYY-MM-DD or a whole YYYY-MM month),
+    amount:N, amount>=N, amount>N, amount<=N, amount<N. A term ending in
+    * is a word prefix (coff* matches "Coffee beans"). Anything else,
+    including "quoted phrases", is a keyword every row has to contain.
+    """
+    query = Query()
+    try:
+        terms = shlex.split(text)
+    except ValueError as e:
+        raise ValueError(f'Invalid query: {e}') from None
+
+    for term in terms:
+        field, operator, value = None, None, None
+        for candidate in ('type', 'category', 'date', 'amount'):
+            if term.lower().startswith(candidate):
+                rest = term[len(candidate):]
+                operator = next((op for op in COMPARISONS if rest.startswith(op)), None)
+                if operator:
+                    field, value = candidate, rest[len(operator):]
+                break
+        if field is None:
+            if len(term) > 1 and term.endswith('*'):
+                query.prefixes.append(term[:-1].lower())
+            elif term:
+                query.keywords.append(term.lower())
+            continue
+        if not value:
+            raise ValueError(f'Invalid query term "{term}"')
+
+        if field == 'type':
+            if operator != ':' or value.lower() not in TRANSACTION_TYPES:
+                raise ValueError(f'Invalid query term "{term}" (type must be income or expense)')
+            query.txn_type = value.lower()
+        elif field == 'category':
+            if operator != ':':
+                raise ValueError(f'Invalid query term "{term}"')
+            query.category = value
+        elif field == 'date':
+            days = _parse_day_or_month(value)
+            if days is None:
+                raise ValueError(f'Invalid date in "{term}" (use YYYY-MM-DD or YYYY-MM)')
+            first, last = days
+            if operator == ':':
+                query.narrow_days(first, last)
+            elif operator == '>=':
+                query.narrow_days(first=first)
+            elif operator == '>':
+                query.narrow_days(first=last + 1)
+            elif operator == '<=':
+                query.narrow_days(last=last)
+            else:
+                query.narrow_days(last=first - 1)
+        else:
+            try:
+                amount = Money.parse(value)
+            except ValueError:
+                raise ValueError(f'Invalid amount in "{term}"') from None
+            if operator == ':':
+                query.narrow_amounts(amount, amount)
+            elif operator in ('>=', '>'):
+                query.narrow_amounts(low=amount, low_inclusive=operator == '>=')
+            else:
+                query.narrow_amounts(high=amount, high_inclusive=operator == '<=')
+    return query
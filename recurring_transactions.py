@@ -1,12 +1,11 @@
 import os
 import json
 from datetime import datetime, timedelta
-from decimal import Decimal
+from money import Money
 import uuid
 import storage
 from utils import clear_screen , PrintMesg , PrintMenu 
 import utils
-import csv
 
 RECURRING_FILE = os.path.join(os.path.dirname(__file__), "data", "recurring_transactions.json")
 
@@ -72,66 +71,60 @@ def execute_due_recurring_transactions():
     """Execute all due recurring transactions"""
     recurring_list = load_recurring_transactions()
     today = datetime.now().strftime("%Y-%m-%d")
-    executed_count = 0
     
-    for recurring in recurring_list:
-        if recurring['status'] != 'Active' or recurring['next_date'] > today:
-            continue
+    due = [recurring for recurring in recurring_list
+           if recurring['status'] == 'Active' and recurring['next_date'] <= today]
+    if not due:
+        return 0
+    
+    try:
+        directory = storage.get_storage().user_directory()
+    except Exception as e:
+        print(f"Error executing recurring transactions: {e}")
+        return 0
+    
+    # Collect every due occurrence first, then write them in one append
+    executed = [recurring for recurring in due
+                if _owns_profile(directory, recurring['username'], recurring['profile_id'])]
+    if executed:
+        try:
+            transaction_ids = storage.new_transaction_ids(len(executed))
+            storage.append_transactions([_recurring_transaction(recurring, transaction_id)
+                                         for recurring, transaction_id in zip(executed, transaction_ids)])
+        except Exception as e:
+            print(f"Error executing recurring transactions: {e}")
+            return 0
+    
+    for recurring in executed:
+        next_dt = datetime.strptime(recurring['next_date'], "%Y-%m-%d")
+        next_dt += timedelta(days=recurring['repeat_interval_days'])
+        recurring['next_date'] = next_dt.strftime("%Y-%m-%d")
+        recurring['last_executed'] = today
         
-        if _execute_single_recurring(recurring):
-            executed_count += 1
-            next_dt = datetime.strptime(recurring['next_date'], "%Y-%m-%d")
-            next_dt += timedelta(days=recurring['repeat_interval_days'])
-            recurring['next_date'] = next_dt.strftime("%Y-%m-%d")
-            recurring['last_executed'] = today
-            
-            if recurring['end_date'] and recurring['next_date'] > recurring['end_date']:
-                recurring['status'] = 'Completed'
+        if recurring['end_date'] and recurring['next_date'] > recurring['end_date']:
+            recurring['status'] = 'Completed'
     
     save_recurring_transactions(recurring_list)
-    return executed_count
+    return len(executed)
 
-def _execute_single_recurring(recurring):
-    """Execute single recurring transaction"""
-    try:
-        users = storage.load_users()
-        user = next((u for u in users if u['name'] == recurring['username']), None)
-        if not user:
-            return False
-        
-        profile = next((p for p in user.get('profiles', []) 
-                       if p['profile_id'] == recurring['profile_id']), None)
-        if not profile:
-            return False
-        transaction_data = {
-            'transaction_id': f'TXN{int(datetime.now().timestamp())}',
-            'user': recurring['username'],
-            'profile_id': recurring['profile_id'],
-            'type': recurring['type'],
-            'amount': recurring['amount'],
-            'category': f"Recurring: {recurring['name']}",
-            'date': recurring['next_date'],
-            'description': 'Auto-generated',
-            'payment_method': 'Recurring'
-        }
-        
-        os.makedirs(os.path.dirname(storage.TRANSACTIONS_FILE), exist_ok=True) # ensure data dir
-        fieldnames = ['transaction_id', 'user', 'profile_id', 'type', 'amount', 
-                      'category', 'date', 'description', 'payment_method']
-        
-        file_exists = os.path.exists(storage.TRANSACTIONS_FILE)
-        with open(storage.TRANSACTIONS_FILE, 'a', newline='', encoding='utf-8') as csvfile:
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-            
-            if not file_exists or os.stat(storage.TRANSACTIONS_FILE).st_size == 0:
-                writer.writeheader()
-            writer.writerow(transaction_data)
-                
-      
-        return True
-    except Exception as e:
-        print(f"Error executing recurring transaction: {e}")
-        return False
+def _owns_profile(directory, username, profile_id):
+    """Whether the profile_id still exists and belongs to username"""
+    user, _ = directory.profile(profile_id)
+    return user is not None and user['name'] == username
+
+def _recurring_transaction(recurring, transaction_id):
+    """Build the transaction row for a recurring transaction's next occurrence"""
+    return {
+        'transaction_id': transaction_id,
+        'user': recurring['username'],
+        'profile_id': recurring['profile_id'],
+        'type': recurring['type'],
+        'amount': recurring['amount'],
+        'category': f"Recurring: {recurring['name']}",
+        'date': recurring['next_date'],
+        'description': 'Auto-generated',
+        'payment_method': 'Recurring'
+    }
 
 def update_recurring_status(recurring_id, new_status): 
     """Update recurring transaction status (Active/Paused/Completed)"""
@@ -186,20 +179,13 @@ def get_recurring_history(recurring_id):
     if not recurring:
         return []
     
-    if not os.path.exists(storage.TRANSACTIONS_FILE):
-        return []
-    
     history = []
         
     try:
-        with open(storage.TRANSACTIONS_FILE, 'r', encoding='utf-8') as csvfile:
-            reader = csv.DictReader(csvfile)
-            for row in reader:
-                cleaned = {k.strip(): v.strip() for k, v in row.items()}
-                if (cleaned.get('user') == recurring['username'] and 
-                    cleaned.get('profile_id') == recurring['profile_id'] and
-                    f"Recurring: {recurring['name']}" in cleaned.get('category', '')):
-                    history.append(cleaned)
+        for cleaned in storage.get_storage().profile_transactions(recurring['profile_id']):
+            if (cleaned.get('user') == recurring['username'] and 
+                f"Recurring: {recurring['name']}" in cleaned.get('category', '')):
+                history.append(cleaned)
     except Exception:
         return []
     
@@ -250,7 +236,7 @@ def _create_ui(username, profile):
     trans_type = 'income' if input("Type: ").strip() == '1' else 'expense'
     
     try:
-        amount = Decimal(input("Amount: ").strip())
+        amount = Money.parse(input("Amount: ").strip())
         if amount <= 0:
             raise ValueError
     except:
@@ -344,7 +330,7 @@ def _edit_ui(username, profile):
             if new_name:
                 updates['name'] = new_name
         elif choice == '2':
-            updates['amount'] = Decimal(input(f"New amount [{item['amount']}]: ").strip())
+            updates['amount'] = Money.parse(input(f"New amount [{item['amount']}]: ").strip())
         elif choice == '3':
             updates['repeat_interval_days'] = int(input(f"New interval [{item['repeat_interval_days']}]: ").strip())
         elif choice == '4':
@@ -1,19 +1,20 @@
-import csv
 import os
 import datetime
 from decimal import Decimal
 from collections import defaultdict
 from financial_health import show_financial_health
+import numpy_reports
+from money import Money, currency_exponent
+from query import parse_query
+from storage import get_storage
 from utils import clear_screen
 
-TRANSACTIONS_FILE = "data/transaction.csv"
-
 def Reports(user, profile):
     """
     Reports dashboard for a given user and profile.
     Shows summary of income, expenses, net savings, and top categories.
     """
-    if not os.path.exists(TRANSACTIONS_FILE):
+    if not get_storage().has_transactions():
         print("\nNo transactions file found. Please add some transactions first.")
         input("\nPress Enter to continue...")
         return
@@ -55,21 +56,8 @@ def show_summary_report(profile):
         input("\nPress Enter to continue...")
         return
 
-    total_income = Decimal("0")
-    total_expense = Decimal("0")
-    category_expense = defaultdict(Decimal)
-
-    for txn in transactions:
-        try:
-            amount = Decimal(txn["amount"])
-            if txn["type"] == "income":
-                total_income += amount
-            elif txn["type"] == "expense":
-                total_expense += amount
-                category_expense[txn["category"]] += amount
-        except (ValueError, KeyError):
-            # تجاهل المعاملات ذات البيانات التالفة
-            continue
+    total_income, total_expense, category_expense = summarize_profile(
+        transactions, currency_exponent(profile['currency']))
 
     net_savings = total_income - total_expense
     
@@ -105,8 +93,14 @@ def show_monthly_report(profile):
     """Show monthly report filtered by month and year"""
     clear_screen()
     
-    transactions = load_profile_transactions(profile["profile_id"])
-    if not transactions:
+    # The stored monthly totals tell whether the profile has any rows
+    # without loading them
+    try:
+        months = get_storage().monthly_totals(profile["profile_id"])
+    except Exception as e:
+        print(f"\nError loading transactions: {e}")
+        months = {}
+    if not any(totals['count'] for totals in months.values()):
         print("\nNo transactions found for this profile.")
         input("\nPress Enter to continue...")
         return
@@ -137,33 +131,17 @@ def show_monthly_report(profile):
         input("\nPress Enter to continue...")
         return
 
-    filtered = []
-    for txn in transactions:
-        try:
-            txn_date = datetime.datetime.strptime(txn["date"], "%Y-%m-%d")
-            if txn_date.month == month and txn_date.year == year:
-                filtered.append(txn)
-        except (ValueError, KeyError):
-            # تجاهل المعاملات ذات التواريخ التالفة
-            continue
+    try:
+        filtered = month_transactions(profile["profile_id"], year, month)
+    except Exception as e:
+        print(f"\nError loading transactions: {e}")
+        filtered = []
+    total_income, total_expense = sum_income_expense(filtered, currency_exponent(profile['currency']))
 
     if not filtered:
         print(f"\nNo transactions found for {month:02d}/{year}.")
         input("\nPress Enter to continue...")
         return
-
-    total_income = Decimal("0")
-    total_expense = Decimal("0")
-    
-    for txn in filtered:
-        try:
-            amount = Decimal(txn["amount"])
-            if txn["type"] == "income":
-                total_income += amount
-            elif txn["type"] == "expense":
-                total_expense += amount
-        except (ValueError, KeyError):
-            continue
     
     net_savings = total_income - total_expense
 
@@ -184,20 +162,71 @@ def show_monthly_report(profile):
     input("\nPress Enter to continue...")
 
 
+def use_numpy_reports():
+    """Use the NumPy report engine unless it is missing or switched off"""
+    return (numpy_reports.available() and
+            os.environ.get('EXPENSE_TRACKER_REPORT_ENGINE', 'numpy').lower() not in ('python', 'decimal'))
+
+
+def summarize_profile(transactions, exponent=0):
+    """(income, expenses, {category: expenses}), vectorized when NumPy is on"""
+    totals = numpy_reports.summarize(transactions, exponent) if use_numpy_reports() else None
+    if totals is None:
+        totals = summarize_transactions(transactions, exponent)
+    return totals
+
+
+def month_transactions(profile_id, year, month):
+    """A profile's transactions in one month"""
+    # The month is a bisected range of the engine's date index
+    return get_storage().matching_transactions(profile_id, parse_query(f"date:{year:04d}-{month:02d}"))
+
+
+def summarize_transactions(transactions, exponent=0):
+    """
+    Reference Money totals: (income, expenses, {category: expenses}).
+    The NumPy engine must match these to the cent.
+    """
+    total_income = Money(0, exponent)
+    total_expense = Money(0, exponent)
+    category_expense = defaultdict(lambda: Money(0, exponent))
+
+    for txn in transactions:
+        try:
+            amount = Money.parse(txn["amount"], exponent)
+            if txn["type"] == "income":
+                total_income += amount
+            elif txn["type"] == "expense":
+                total_expense += amount
+                category_expense[txn["category"]] += amount
+        except (ValueError, KeyError):
+            # تجاهل المعاملات ذات البيانات التالفة
+            continue
+
+    return total_income, total_expense, dict(category_expense)
+
+
+def sum_income_expense(transactions, exponent=0):
+    """Reference Money totals: (income, expenses)"""
+    total_income = Money(0, exponent)
+    total_expense = Money(0, exponent)
+    
+    for txn in transactions:
+        try:
+            amount = Money.parse(txn["amount"], exponent)
+            if txn["type"] == "income":
+                total_income += amount
+            elif txn["type"] == "expense":
+                total_expense += amount
+        except (ValueError, KeyError):
+            continue
+    return total_income, total_expense
+
+
 def load_profile_transactions(profile_id):
     """Helper function to load all transactions for a given profile_id"""
-    transactions = []
-    if not os.path.exists(TRANSACTIONS_FILE):
-        return transactions
-
     try:
-        with open(TRANSACTIONS_FILE, 'r', encoding='utf-8') as csvfile:
-            reader = csv.DictReader(csvfile)
-            for row in reader:
-                cleaned = {k.strip(): v.strip() for k, v in row.items()}
-                if cleaned.get("profile_id") == profile_id:
-                    transactions.append(cleaned)
+        return get_storage().profile_transactions(profile_id)
     except Exception as e:
         print(f"\nError loading transactions: {e}")
-    
-    return transactions
\ No newline at end of file
+        return []
@@ -0,0 +1,67 @@
+import os
+import hmac
+import time
+import getpass
+import secrets
+from storage import users_named
+from utils import verify_password
+
+# How long a login (or a password re-entry) spares further password prompts
+DEFAULT_SESSION_SECONDS = 300
+
+_sessions = {}      # username -> (token, expiry on the monotonic clock)
+_credentials = {}   # username -> token held by this process's logged-in user
+
+
+def session_lifetime():
+    """Session lifetime in seconds, from EXPENSE_TRACKER_SESSION_SECONDS if set"""
+    try:
+        return max(0, int(os.environ.get('EXPENSE_TRACKER_SESSION_SECONDS', DEFAULT_SESSION_SECONDS)))
+    except ValueError:
+        return DEFAULT_SESSION_SECONDS
+
+
+def start_session(username, lifetime=None):
+    """Issue a fresh random session token for a user who just proved their password"""
+    token = secrets.token_urlsafe(32)
+    lifetime = session_lifetime() if lifetime is None else lifetime
+    _sessions[username] = (token, time.monotonic() + lifetime)
+    _credentials[username] = token
+    return token
+
+
+def check_session(username, token):
+    """Whether token is the user's live session token, compared in constant time"""
+    session = _sessions.get(username)
+    if session is None or token is None:
+        return False
+    expected, expiry = session
+    if time.monotonic() >= expiry:
+        del _sessions[username]
+        return False
+    return hmac.compare_digest(expected.encode(), token.encode())
+
+
+def end_session(username):
+    _sessions.pop(username, None)
+    _credentials.pop(username, None)
+
+
+def authenticate(username, password):
+    """bcrypt check of a password against every user with this name"""
+    return any(verify_password(password, u["password"]) for u in users_named(username))
+
+
+def confirm_identity(username, prompt='\nEnter your password to confirm: '):
+    """Confirm a destructive action: free within a live session, else one password check.
+
+    A correct password starts a new session, so the next confirmations
+    within its lifetime don't run bcrypt again.
+    """
+    if check_session(username, _credentials.get(username)):
+        return True
+    password = getpass.getpass(prompt)
+    if authenticate(username, password):
+        start_session(username)
+        return True
+    return False
@@ -0,0 +1,144 @@
+import bisect
+from dates import day_ordinal
+from money import Money
+
+SORT_FIELDS = ('date', 'amount')
+
+
+def _amount(row):
+    try:
+        return Money.parse(row.get('amount'))
+    except ValueError:
+        return None
+
+
+def _sort_key(order_by):
+    return (lambda row: day_ordinal(row.get('date'))) if order_by == 'date' else _amount
+
+
+def sort_rows(rows, order_by=None, descending=False):
+    """Rows ordered by date or amount like the search screen; ties keep their order.
+
+    Rows without a valid value for the key are left out. Any other order_by
+    returns the rows as they are.
+    """
+    if order_by not in SORT_FIELDS:
+        return rows
+    key = _sort_key(order_by)
+    rows = [row for row in rows if key(row) is not None]
+    rows.sort(key=key, reverse=descending)
+    return rows
+
+
+def _scaled(amount, scale):
+    """(floor of amount in units of 10**-scale, whether that is exact)"""
+    if amount.exponent <= scale:
+        return amount.minor * 10 ** (scale - amount.exponent), True
+    value, remainder = divmod(amount.minor, 10 ** (amount.exponent - scale))
+    return value, remainder == 0
+
+
+class SortedIndex:
+    """A profile's rows ordered by date ordinal and by amount.
+
+    For each key there is a sorted list of keys and, in the same order, the
+    positions of the rows having them, ties in file order. Amounts are
+    integers at the largest scale any row uses, so ranges are found with
+    bisect on plain ints. Rows whose date or amount doesn't parse are only
+    missing from that key's index.
+    """
+
+    def __init__(self, rows):
+        self.rows = rows
+        days = []
+        amounts = []
+        for position, row in enumerate(rows):
+            day = day_ordinal(row.get('date'))
+            if day is not None:
+                days.append((day, position))
+            amount = _amount(row)
+            if amount is not None:
+                amounts.append((amount, position))
+
+        days.sort()
+        self.day_keys = [day for day, _ in days]
+        self.day_order = [position for _, position in days]
+
+        self.scale = max((amount.exponent for amount, _ in amounts), default=0)
+        scaled = sorted((_scaled(amount, self.scale)[0], position) for amount, position in amounts)
+        self.amount_keys = [value for value, _ in scaled]
+        self.amount_order = [position for _, position in scaled]
+
+    def _day_range(self, query):
+        start, end = 0, len(self.day_keys)
+        if query.day_from is not None:
+            start = bisect.bisect_left(self.day_keys, query.day_from)
+        if query.day_to is not None:
+            end = bisect.bisect_right(self.day_keys, query.day_to)
+        return start, max(start, end)
+
+    def _amount_range(self, query):
+        start, end = 0, len(self.amount_keys)
+        if query.min_amount is not None:
+            value, exact = _scaled(query.min_amount, self.scale)
+            if query.min_inclusive and exact:
+                start = bisect.bisect_left(self.amount_keys, value)
+            else:
+                start = bisect.bisect_right(self.amount_keys, value)
+        if query.max_amount is not None:
+            value, exact = _scaled(query.max_amount, self.scale)
+            if not query.max_inclusive and exact:
+                end = bisect.bisect_left(self.amount_keys, value)
+            else:
+                end = bisect.bisect_right(self.amount_keys, value)
+        return start, max(start, end)
+
+    def _index(self, field, query):
+        """(keys, positions, start, end) of the rows within the query's bounds on field"""
+        if field == 'date':
+            return (self.day_keys, self.day_order, *self._day_range(query))
+        return (self.amount_keys, self.amount_order, *self._amount_range(query))
+
+    def select(self, query, order_by=None, descending=False):
+        """Rows matching a query.Query, like sort_rows(query.filter(rows), order_by, descending).
+
+        The date or amount range is found by bisection and only the rows in
+        it are checked. Ordered by date or amount, the rows come straight
+        out of that key's index; otherwise they keep their file order.
+        """
+        bounded = {}
+        if query.day_from is not None or query.day_to is not None:
+            bounded['date'] = self._index('date', query)
+        if query.min_amount is not None or query.max_amount is not None:
+            bounded['amount'] = self._index('amount', query)
+        narrowest = min(bounded.values(), key=lambda found: found[3] - found[2], default=None)
+
+        if order_by in SORT_FIELDS:
+            keys, order, start, end = bounded.get(order_by) or self._index(order_by, query)
+            if narrowest is not None and (narrowest[3] - narrowest[2]) * 4 < end - start:
+                # Sorting the few rows of a much narrower range beats walking this one
+                _, narrow_order, narrow_start, narrow_end = narrowest
+                rows = self._matching(query, sorted(narrow_order[narrow_start:narrow_end]))
+                return sort_rows(rows, order_by, descending)
+            if descending:
+                # Whole groups of equal keys from the top, each in file order,
+                # the same as a stable sort with reverse=True
+                positions = []
+                while end > start:
+                    first = bisect.bisect_left(keys, keys[end - 1], start, end)
+                    positions.extend(order[first:end])
+                    end = first
+            else:
+                positions = order[start:end]
+        elif narrowest is not None:
+            # Drive from the narrower range and restore file order
+            _, order, start, end = narrowest
+            positions = sorted(order[start:end])
+        else:
+            positions = range(len(self.rows))
+        return self._matching(query, positions)
+
+    def _matching(self, query, positions):
+        matches = query.compile()
+        rows = self.rows
+        return [rows[position] for position in positions if matches(rows[position])]
@@ -0,0 +1,448 @@
+import os
+import json
+import sqlite3
+import threading
+from dates import date_key
+from keyword_index import row_terms, keyword_terms, prefix_bounds
+from sorted_index import SortedIndex, sort_rows
+from storage import StorageEngine, TRANSACTION_FIELDS, add_monthly_totals, decode_monthly_totals
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    position INTEGER PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    password TEXT NOT NULL,
+    profiles TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_users_name ON users (name);
+CREATE INDEX IF NOT EXISTS idx_users_id ON users (user_id);
+
+CREATE TABLE IF NOT EXISTS transactions (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    transaction_id TEXT NOT NULL,
+    user TEXT NOT NULL,
+    profile_id TEXT NOT NULL,
+    type TEXT NOT NULL,
+    amount TEXT NOT NULL,
+    category TEXT NOT NULL,
+    date TEXT NOT NULL,
+    description TEXT NOT NULL,
+    payment_method TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_transactions_profile_date ON transactions (profile_id, date);
+CREATE INDEX IF NOT EXISTS idx_transactions_id ON transactions (transaction_id);
+CREATE INDEX IF NOT EXISTS idx_transactions_profile_category ON transactions (profile_id, category);
+
+CREATE TABLE IF NOT EXISTS monthly_totals (
+    profile_id TEXT NOT NULL,
+    month TEXT NOT NULL,
+    income TEXT NOT NULL,
+    expenses TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (profile_id, month)
+);
+
+CREATE TABLE IF NOT EXISTS keyword_postings (
+    term TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    PRIMARY KEY (term, seq)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_keyword_postings_seq ON keyword_postings (seq);
+"""
+
+# Bumped through PRAGMA user_version once derived tables have been filled in:
+# 1 monthly_totals, 2 keyword_postings, 3 zero-padded dates
+SCHEMA_VERSION = 3
+
+COLUMNS = ', '.join(TRANSACTION_FIELDS)
+PLACEHOLDERS = ', '.join('?' for _ in TRANSACTION_FIELDS)
+
+# SQLite limits the number of bound parameters per statement
+MAX_VARIABLES = 500
+# Rows fetched per keyset query while iterating a profile
+ITER_BATCH_SIZE = 200
+
+
+class SQLiteStorage(StorageEngine):
+    """Users and transactions in an embedded, indexed SQLite database.
+
+    Date and amount searches bisect an in-memory SortedIndex of the
+    profile, rebuilt once the database has changed.
+    """
+
+    name = 'sqlite'
+
+    def __init__(self, path):
+        self.path = path
+        # One connection per thread: the startup chores may open the
+        # database on their worker thread before the screens use it
+        self._local = threading.local()
+        self._sorted_indexes = {}
+
+    @property
+    def connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = self._local.connection = sqlite3.connect(self.path)
+            connection.executescript(SCHEMA)
+            version = connection.execute('PRAGMA user_version').fetchone()[0]
+            if version < 1:
+                self._rebuild_monthly_totals()
+            if version < 2:
+                self._rebuild_keyword_postings()
+            if version < 3:
+                self._normalize_dates()
+            if version < SCHEMA_VERSION:
+                connection.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+        return connection
+
+    def _rows(self, sql, params=()):
+        cursor = self.connection.execute(sql, params)
+        return [dict(zip(TRANSACTION_FIELDS, row)) for row in cursor]
+
+    def _values(self, txn):
+        return [self._stored(field, txn.get(field, '') or '') for field in TRANSACTION_FIELDS]
+
+    def _stored(self, field, value):
+        # Dates are kept zero-padded so that date ranges compare as TEXT
+        return date_key(value) if field == 'date' else value
+
+    def _stored_changes(self, changes):
+        return [self._stored(field, value) for field, value in changes.items()]
+
+    def _stored_months(self, profile_id):
+        cursor = self.connection.execute(
+            'SELECT month, income, expenses, count FROM monthly_totals WHERE profile_id = ?',
+            (profile_id,))
+        return {month: {'income': income, 'expenses': expenses, 'count': count}
+                for month, income, expenses, count in cursor}
+
+    def _adjust_monthly_totals(self, transactions, sign=1):
+        """Fold rows into monthly_totals; call inside the write's transaction"""
+        by_profile = {}
+        for txn in transactions:
+            by_profile.setdefault(txn.get('profile_id', ''), []).append(txn)
+        for profile_id, rows in by_profile.items():
+            months = add_monthly_totals(self._stored_months(profile_id), rows, sign)
+            self.connection.execute('DELETE FROM monthly_totals WHERE profile_id = ?', (profile_id,))
+            self.connection.executemany(
+                'INSERT INTO monthly_totals (profile_id, month, income, expenses, count) '
+                'VALUES (?, ?, ?, ?, ?)',
+                [(profile_id, month, totals['income'], totals['expenses'], totals['count'])
+                 for month, totals in months.items()])
+
+    def _rebuild_monthly_totals(self):
+        with self.connection:
+            self.connection.execute('DELETE FROM monthly_totals')
+            self._adjust_monthly_totals(self.all_transactions())
+
+    def _last_seq(self):
+        return self.connection.execute('SELECT COALESCE(MAX(seq), 0) FROM transactions').fetchone()[0]
+
+    def _index_keywords(self, after_seq=0):
+        """Post the terms of rows inserted after after_seq; call inside the write's transaction"""
+        rows = self.connection.execute(
+            'SELECT seq, category, description FROM transactions WHERE seq > ?', (after_seq,)).fetchall()
+        self.connection.executemany(
+            'INSERT OR IGNORE INTO keyword_postings (term, seq) VALUES (?, ?)',
+            ((term, seq) for seq, category, description in rows
+             for term in row_terms({'category': category, 'description': description})))
+
+    def _rebuild_keyword_postings(self):
+        with self.connection:
+            self.connection.execute('DELETE FROM keyword_postings')
+            self._index_keywords()
+
+    def _normalize_dates(self):
+        """Zero-pad dates stored before writes did, e.g. 2025-1-5"""
+        rows = self.connection.execute(
+            "SELECT seq, date FROM transactions WHERE date NOT GLOB "
+            "'[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]'").fetchall()
+        with self.connection:
+            self.connection.executemany(
+                'UPDATE transactions SET date = ? WHERE seq = ?',
+                [(date_key(date), seq) for seq, date in rows if date_key(date) != date])
+
+    def load_users(self):
+        users = []
+        cursor = self.connection.execute(
+            'SELECT user_id, name, password, profiles FROM users ORDER BY position')
+        for user_id, name, password, profiles in cursor:
+            users.append({
+                "user_id": user_id,
+                "name": name,
+                "password": password,
+                "profiles": json.loads(profiles)
+            })
+        return users
+
+    def save_users(self, users):
+        with self.connection:
+            self.connection.execute('DELETE FROM users')
+            self.connection.executemany(
+                'INSERT INTO users (position, user_id, name, password, profiles) VALUES (?, ?, ?, ?, ?)',
+                [(position, u["user_id"], u["name"], u["password"],
+                  json.dumps(u.get("profiles", []), ensure_ascii=False))
+                 for position, u in enumerate(users)])
+
+    def save_user(self, user):
+        values = (user["name"], user["password"],
+                  json.dumps(user.get("profiles", []), ensure_ascii=False), user["user_id"])
+        with self.connection:
+            cursor = self.connection.execute(
+                'UPDATE users SET name = ?, password = ?, profiles = ? WHERE user_id = ?', values)
+            if cursor.rowcount == 0:
+                self.connection.execute(
+                    'INSERT INTO users (position, name, password, profiles, user_id) '
+                    'VALUES ((SELECT COALESCE(MAX(position), -1) + 1 FROM users), ?, ?, ?, ?)', values)
+
+    def _users_version(self):
+        return self._data_version()
+
+    def has_transactions(self):
+        return self.connection.execute('SELECT 1 FROM transactions LIMIT 1').fetchone() is not None
+
+    def all_transactions(self):
+        return self._rows(f'SELECT {COLUMNS} FROM transactions ORDER BY seq')
+
+    def profile_transactions(self, profile_id, date_from=None, date_to=None):
+        sql = f'SELECT {COLUMNS} FROM transactions WHERE profile_id = ?'
+        params = [profile_id]
+        if date_from:
+            sql += ' AND date >= ?'
+            params.append(date_from)
+        if date_to:
+            sql += ' AND date <= ?'
+            params.append(date_to)
+        return self._rows(sql + ' ORDER BY seq', params)
+
+    def _data_version(self):
+        # data_version moves with commits from other connections, total_changes with ours
+        return (self.connection.execute('PRAGMA data_version').fetchone()[0],
+                self.connection.total_changes)
+
+    def _sorted_index(self, profile_id):
+        version = self._data_version()
+        cached = self._sorted_indexes.get(profile_id)
+        if cached is None or cached[0] != version:
+            cached = self._sorted_indexes[profile_id] = (
+                version, SortedIndex(self.profile_transactions(profile_id)))
+        return cached[1]
+
+    def iter_profile_transactions(self, profile_id):
+        # Keyset pagination on seq: each batch resumes after the last row seen
+        last_seq = 0
+        while True:
+            batch = self.connection.execute(
+                f'SELECT seq, {COLUMNS} FROM transactions WHERE profile_id = ? AND seq > ? '
+                'ORDER BY seq LIMIT ?', (profile_id, last_seq, ITER_BATCH_SIZE)).fetchall()
+            for row in batch:
+                yield dict(zip(TRANSACTION_FIELDS, row[1:]))
+            if len(batch) < ITER_BATCH_SIZE:
+                return
+            last_seq = batch[-1][0]
+
+    def _keyword_conditions(self, query):
+        """SQL conditions and parameters for a query's keywords and prefixes"""
+        # Each keyword keeps the rows posted under all of its trigrams, each
+        # prefix the rows with a word in its range of word terms
+        conditions = []
+        params = []
+        for keyword in query.keywords:
+            terms = keyword_terms(keyword)
+            if terms:
+                conditions.append(
+                    f'seq IN (SELECT seq FROM keyword_postings WHERE term IN ({", ".join("?" for _ in terms)}) '
+                    'GROUP BY seq HAVING COUNT(*) = ?)')
+                params.extend([*terms, len(terms)])
+        for prefix in query.prefixes:
+            conditions.append('seq IN (SELECT seq FROM keyword_postings WHERE term >= ? AND term < ?)')
+            params.extend(prefix_bounds(prefix))
+        return conditions, params
+
+    def _matching_sql(self, profile_id, query, conditions, params):
+        """SELECT of a profile's rows under the conditions and the query's date range"""
+        conditions = ['profile_id = ?', *conditions]
+        params = [profile_id, *params]
+        date_from, date_to = query.date_range()
+        if date_from:
+            conditions.append('date >= ?')
+            params.append(date_from)
+        if date_to:
+            conditions.append('date <= ?')
+            params.append(date_to)
+        return f'SELECT {COLUMNS} FROM transactions WHERE ' + ' AND '.join(conditions) + ' ORDER BY seq', params
+
+    def matching_transactions(self, profile_id, query, order_by=None, descending=False):
+        conditions, params = self._keyword_conditions(query)
+        if not conditions:
+            return self._sorted_index(profile_id).select(query, order_by, descending)
+        sql, params = self._matching_sql(profile_id, query, conditions, params)
+        return sort_rows(query.filter(self._rows(sql, params)), order_by, descending)
+
+    def iter_matching_transactions(self, profile_id, query):
+        # One lazy cursor: the (profile_id, date) index narrows a date range
+        # and rows are fetched a batch at a time
+        sql, params = self._matching_sql(profile_id, query, *self._keyword_conditions(query))
+        matches = query.compile()
+        cursor = self.connection.execute(sql, params)
+        while True:
+            batch = cursor.fetchmany(ITER_BATCH_SIZE)
+            if not batch:
+                return
+            for row in batch:
+                txn = dict(zip(TRANSACTION_FIELDS, row))
+                if matches(txn):
+                    yield txn
+
+    def monthly_totals(self, profile_id):
+        return decode_monthly_totals(self._stored_months(profile_id))
+
+    def find_transaction(self, profile_id, transaction_id):
+        rows = self._rows(
+            f'SELECT {COLUMNS} FROM transactions WHERE transaction_id = ? AND profile_id = ? '
+            'ORDER BY seq LIMIT 1', (transaction_id, profile_id))
+        return rows[0] if rows else None
+
+    def existing_transaction_ids(self, transaction_ids, profile_id=None):
+        transaction_ids = list(set(transaction_ids))
+        in_profile = '' if profile_id is None else ' AND profile_id = ?'
+        found = set()
+        for start in range(0, len(transaction_ids), MAX_VARIABLES):
+            chunk = transaction_ids[start:start + MAX_VARIABLES]
+            cursor = self.connection.execute(
+                'SELECT DISTINCT transaction_id FROM transactions WHERE transaction_id IN '
+                f'({", ".join("?" for _ in chunk)}){in_profile}',
+                chunk if profile_id is None else [*chunk, profile_id])
+            found.update(row[0] for row in cursor)
+        return found
+
+    def add_transactions(self, transactions):
+        transactions = list(transactions)
+        with self.connection:
+            last_seq = self._last_seq()
+            self.connection.executemany(
+                f'INSERT INTO transactions ({COLUMNS}) VALUES ({PLACEHOLDERS})',
+                (self._values(txn) for txn in transactions))
+            self._adjust_monthly_totals(transactions)
+            self._index_keywords(last_seq)
+
+    def _seq_of(self, profile_id, transaction_id):
+        """The seq and row of a profile's first transaction with this ID"""
+        row = self.connection.execute(
+            f'SELECT seq, {COLUMNS} FROM transactions WHERE transaction_id = ? AND profile_id = ? '
+            'ORDER BY seq LIMIT 1', (transaction_id, profile_id)).fetchone()
+        if row is None:
+            return None, None
+        return row[0], dict(zip(TRANSACTION_FIELDS, row[1:]))
+
+    def update_transaction(self, profile_id, transaction_id, changes):
+        self._check_profile_unchanged(profile_id, changes)
+        changes = {field: value for field, value in changes.items() if field in TRANSACTION_FIELDS}
+        with self.connection:
+            seq, original = self._seq_of(profile_id, transaction_id)
+            if seq is None:
+                return False
+            if changes:
+                assignments = ', '.join(f'{field} = ?' for field in changes)
+                self.connection.execute(f'UPDATE transactions SET {assignments} WHERE seq = ?',
+                                        [*self._stored_changes(changes), seq])
+                self._adjust_monthly_totals([original], -1)
+                self._adjust_monthly_totals([{**original, **changes}])
+                if 'category' in changes or 'description' in changes:
+                    self.connection.execute('DELETE FROM keyword_postings WHERE seq = ?', (seq,))
+                    self.connection.executemany(
+                        'INSERT INTO keyword_postings (term, seq) VALUES (?, ?)',
+                        ((term, seq) for term in row_terms({**original, **changes})))
+        return True
+
+    def delete_transaction(self, profile_id, transaction_id):
+        with self.connection:
+            seq, original = self._seq_of(profile_id, transaction_id)
+            if seq is None:
+                return False
+            self.connection.execute('DELETE FROM transactions WHERE seq = ?', (seq,))
+            self.connection.execute('DELETE FROM keyword_postings WHERE seq = ?', (seq,))
+            self._adjust_monthly_totals([original], -1)
+        return True
+
+    def _seqs_of(self, profile_id, transaction_ids):
+        """{seq: row} of a profile's first transaction with each of the IDs"""
+        transaction_ids = list(dict.fromkeys(transaction_ids))
+        first = {}
+        for start in range(0, len(transaction_ids), MAX_VARIABLES):
+            chunk = transaction_ids[start:start + MAX_VARIABLES]
+            cursor = self.connection.execute(
+                f'SELECT seq, {COLUMNS} FROM transactions WHERE profile_id = ? AND transaction_id IN '
+                f'({", ".join("?" for _ in chunk)}) ORDER BY seq', [profile_id, *chunk])
+            for row in cursor:
+                txn = dict(zip(TRANSACTION_FIELDS, row[1:]))
+                first.setdefault(txn['transaction_id'], (row[0], txn))
+        return dict(first.values())
+
+    def _execute_by_seq(self, sql, seqs, params=()):
+        """Run sql ending in 'seq IN' for every chunk of seqs"""
+        for start in range(0, len(seqs), MAX_VARIABLES):
+            chunk = seqs[start:start + MAX_VARIABLES]
+            self.connection.execute(f'{sql} ({", ".join("?" for _ in chunk)})', [*params, *chunk])
+
+    def update_transactions(self, profile_id, transaction_ids, changes):
+        self._check_profile_unchanged(profile_id, changes)
+        changes = {field: value for field, value in changes.items() if field in TRANSACTION_FIELDS}
+        if not changes:
+            return 0
+        with self.connection:
+            originals = self._seqs_of(profile_id, transaction_ids)
+            seqs = list(originals)
+            assignments = ', '.join(f'{field} = ?' for field in changes)
+            self._execute_by_seq(f'UPDATE transactions SET {assignments} WHERE seq IN',
+                                 seqs, self._stored_changes(changes))
+            self._adjust_monthly_totals(originals.values(), -1)
+            self._adjust_monthly_totals([{**original, **changes} for original in originals.values()])
+            if 'category' in changes or 'description' in changes:
+                self._execute_by_seq('DELETE FROM keyword_postings WHERE seq IN', seqs)
+                self.connection.executemany(
+                    'INSERT INTO keyword_postings (term, seq) VALUES (?, ?)',
+                    ((term, seq) for seq, original in originals.items()
+                     for term in row_terms({**original, **changes})))
+        return len(originals)
+
+    def delete_transactions(self, profile_id, transaction_ids):
+        with self.connection:
+            originals = self._seqs_of(profile_id, transaction_ids)
+            seqs = list(originals)
+            self._execute_by_seq('DELETE FROM transactions WHERE seq IN', seqs)
+            self._execute_by_seq('DELETE FROM keyword_postings WHERE seq IN', seqs)
+            self._adjust_monthly_totals(originals.values(), -1)
+        return len(originals)
+
+    def delete_profile_transactions(self, profile_id):
+        with self.connection:
+            self.connection.execute(
+                'DELETE FROM keyword_postings WHERE seq IN '
+                '(SELECT seq FROM transactions WHERE profile_id = ?)', (profile_id,))
+            self.connection.execute('DELETE FROM transactions WHERE profile_id = ?', (profile_id,))
+            self.connection.execute('DELETE FROM monthly_totals WHERE profile_id = ?', (profile_id,))
+
+    def replace_transactions(self, transactions):
+        with self.connection:
+            self.connection.execute('DELETE FROM transactions')
+            self.connection.execute('DELETE FROM monthly_totals')
+            self.connection.execute('DELETE FROM keyword_postings')
+            last_seq = self._last_seq()
+            self.connection.executemany(
+                f'INSERT INTO transactions ({COLUMNS}) VALUES ({PLACEHOLDERS})',
+                (self._values(txn) for txn in transactions))
+            self._adjust_monthly_totals(transactions)
+            self._index_keywords(last_seq)
+
+    def compact(self):
+        self.connection.execute('VACUUM')
+        return True
+
+    def data_files(self):
+        return [self.path]
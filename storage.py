@@ -1,13 +1,26 @@
 import os
 import json
-import shutil
-import datetime
-import csv
+import time
+import threading
+from dates import month_key
+from money import Money
+from sorted_index import sort_rows
 
 USERS_FILE = "data/users.json"
+PARTITIONS_DIR = "data/transactions"
+# Single-file layout used before per-profile partitions, migrated on first use
 TRANSACTIONS_FILE = "data/transaction.csv"
+TRANSACTION_LOG_FILE = "data/transaction.log"
+DATABASE_FILE = "data/expense_tracker.db"
+STORAGE_CONFIG_FILE = "data/storage.json"
 BACKUP_DIR = "backups"
-LAST_BACKUP_FILE = "last_backup.txt"
+TRANSACTION_FIELDS = ['transaction_id', 'user', 'profile_id', 'type', 'amount',
+                      'category', 'date', 'description', 'payment_method']
+STORAGE_ENGINES = ['csv', 'sqlite']
+# Transaction ID layout: milliseconds since ID_EPOCH_MS, node bits, sequence
+ID_EPOCH_MS = 1704067200000  # 2024-01-01 UTC
+ID_NODE_BITS = 22
+ID_SEQUENCE_BITS = 12
 
 
 def ensure_data_directory():
@@ -15,121 +28,496 @@ def ensure_data_directory():
     os.makedirs("data", exist_ok=True)
 
 
-def load_users():
-    """Load users from JSON file"""
-    ensure_data_directory()
-    if not os.path.exists(USERS_FILE):        
-        return []
+class IdAllocator:
+    """Monotonic IDs built from a millisecond clock, node bits and a sequence.
+
+    The node defaults to the process ID, so processes running at the same
+    time never share one. Once a millisecond's sequence is used up the clock
+    borrows the next millisecond instead of waiting, so a block of any size
+    can be handed out at once.
+    """
+
+    def __init__(self, prefix, node=None):
+        self.prefix = prefix
+        self._fixed_node = node
+        self._pid = None
+        self._node = 0
+        self._last_ms = -1
+        self._sequence = 0
+        self._lock = threading.Lock()
+
+    def allocate(self, count):
+        """Return count new IDs in increasing order"""
+        ids = []
+        max_sequence = 1 << ID_SEQUENCE_BITS
+        with self._lock:
+            # Forked workers must not keep using their parent's node
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                node = self._pid if self._fixed_node is None else self._fixed_node
+                self._node = node & ((1 << ID_NODE_BITS) - 1)
+            
+            now = int(time.time() * 1000) - ID_EPOCH_MS
+            if now > self._last_ms:
+                self._last_ms, self._sequence = now, 0
+            while len(ids) < count:
+                if self._sequence >= max_sequence:
+                    self._last_ms, self._sequence = self._last_ms + 1, 0
+                take = min(count - len(ids), max_sequence - self._sequence)
+                base = ((self._last_ms << ID_NODE_BITS) | self._node) << ID_SEQUENCE_BITS
+                ids.extend(f'{self.prefix}{base | sequence}'
+                           for sequence in range(self._sequence, self._sequence + take))
+                self._sequence += take
+        return ids
+
+    def next_id(self):
+        return self.allocate(1)[0]
+
+
+_transaction_ids = IdAllocator('TXN')
+
+
+def new_transaction_id():
+    """Allocate a unique transaction ID"""
+    return _transaction_ids.next_id()
+
+
+def new_transaction_ids(count):
+    """Allocate a block of unique transaction IDs for a batch write"""
+    return _transaction_ids.allocate(count)
+
+
+def monthly_delta(txn):
+    """(month, 'income' or 'expenses', amount) a row counts towards, or None"""
+    if txn.get('type') not in ('income', 'expense'):
+        return None
+    month = month_key(txn.get('date') or '')
+    if month is None:
+        return None
     try:
-        with open(USERS_FILE, 'r', encoding='utf-8') as f: 
-            return json.load(f) 
-    except (json.JSONDecodeError, IOError) as e:
-        print(f"Warning: Error loading users - {e}")
-        return []
+        amount = Money.parse(txn.get('amount') or '')
+    except ValueError:
+        return None
+    return month, 'income' if txn['type'] == 'income' else 'expenses', amount
+
+
+def add_monthly_totals(months, transactions, sign=1):
+    """Add rows to (sign=-1: remove them from) a {month: totals} mapping.
+
+    Totals are kept as {'income': str, 'expenses': str, 'count': int} so
+    they can be stored as JSON without losing precision.
+    """
+    for txn in transactions:
+        delta = monthly_delta(txn)
+        if delta is None:
+            continue
+        month, field, amount = delta
+        totals = months.setdefault(month, {'income': '0', 'expenses': '0', 'count': 0})
+        totals[field] = str(Money.parse(totals[field]) + sign * amount)
+        totals['count'] += sign
+        if totals['count'] <= 0:
+            del months[month]
+    return months
+
+
+def decode_monthly_totals(months):
+    """Stored monthly totals as {month: {'income', 'expenses', 'count'}} with Money"""
+    return {month: {'income': Money.parse(totals['income']),
+                    'expenses': Money.parse(totals['expenses']),
+                    'count': totals['count']}
+            for month, totals in sorted(months.items())}
+
+
+class UserDirectory:
+    """Users indexed by name, user_id and profile_id.
+
+    Built from one load of the users and shared until they change, so its
+    user dicts must not be modified: copy one, change the copy and write it
+    back with save_user().
+    """
+
+    def __init__(self, users, version=None):
+        self.users = users
+        self.version = version
+        self._by_name = {}
+        self._by_id = {}
+        self._by_profile = {}
+        for user in users:
+            self._by_name.setdefault(user.get('name'), []).append(user)
+            self._by_id.setdefault(user.get('user_id'), user)
+            for profile in user.get('profiles', []):
+                self._by_profile.setdefault(profile.get('profile_id'), (user, profile))
+
+    def named(self, name):
+        """Every user with this name (older files may hold duplicates)"""
+        return self._by_name.get(name, [])
+
+    def find(self, name):
+        users = self.named(name)
+        return users[0] if users else None
+
+    def by_id(self, user_id):
+        return self._by_id.get(user_id)
+
+    def profile(self, profile_id):
+        """(user, profile) owning a profile_id, or (None, None)"""
+        return self._by_profile.get(profile_id, (None, None))
+
+
+class StorageEngine:
+    """Interface shared by the storage engines.
+
+    Users are handled as the same list of dicts that users.json holds, and
+    transactions as row dicts keyed by TRANSACTION_FIELDS. Rows returned by
+    the read methods may be shared caches and must not be modified.
+    """
+
+    name = None
+    _user_directory = None
+
+    def load_users(self):
+        raise NotImplementedError
+
+    def save_users(self, users):
+        """Replace every stored user (used by migrations)"""
+        raise NotImplementedError
+
+    def save_user(self, user):
+        """Insert or replace a single user record, matched by user_id"""
+        users = self.load_users()
+        for position, existing in enumerate(users):
+            if existing.get('user_id') == user.get('user_id'):
+                users[position] = user
+                break
+        else:
+            users.append(user)
+        self.save_users(users)
+
+    def _users_version(self):
+        """A value that changes whenever the stored users may have, or None"""
+        return None
+
+    def user_directory(self):
+        """The UserDirectory of the stored users, reloaded only after they change"""
+        version = self._users_version()
+        directory = self._user_directory
+        if directory is None or version is None or directory.version != version:
+            directory = self._user_directory = UserDirectory(self.load_users(), version)
+        return directory
+
+    def has_transactions(self):
+        raise NotImplementedError
+
+    def all_transactions(self):
+        raise NotImplementedError
+
+    def profile_transactions(self, profile_id, date_from=None, date_to=None):
+        """Return a profile's rows, optionally limited to a YYYY-MM-DD range"""
+        raise NotImplementedError
+
+    def iter_profile_transactions(self, profile_id):
+        """Yield a profile's rows in stored order, for listings read a page at a time"""
+        yield from self.profile_transactions(profile_id)
+
+    def matching_transactions(self, profile_id, query, order_by=None, descending=False):
+        """A profile's rows matching a query.Query, using any index the engine has.
+
+        order_by 'date' or 'amount' sorts them like sorted_index.sort_rows.
+        """
+        rows = query.filter(self.profile_transactions(profile_id, *query.date_range()))
+        return sort_rows(rows, order_by, descending)
+
+    def iter_matching_transactions(self, profile_id, query):
+        """Yield a profile's rows matching a query.Query in stored order.
+
+        For exports: the matches are never collected into one list and
+        engines read as little beyond the query's date range as they can.
+        """
+        matches = query.compile()
+        for txn in self.iter_profile_transactions(profile_id):
+            if matches(txn):
+                yield txn
+
+    def monthly_totals(self, profile_id):
+        """Income, expenses and row count of a profile per YYYY-MM month"""
+        return decode_monthly_totals(add_monthly_totals({}, self.profile_transactions(profile_id)))
+
+    def find_transaction(self, profile_id, transaction_id):
+        raise NotImplementedError
+
+    def existing_transaction_ids(self, transaction_ids, profile_id=None):
+        """Return the subset of transaction_ids already stored (in profile_id if given)"""
+        raise NotImplementedError
+
+    def add_transactions(self, transactions):
+        raise NotImplementedError
+
+    def update_transaction(self, profile_id, transaction_id, changes):
+        """Apply changes to a transaction; raises ValueError if they move it to another profile"""
+        raise NotImplementedError
+
+    def _check_profile_unchanged(self, profile_id, changes):
+        """Edits never move a transaction to another profile"""
+        if changes.get('profile_id', profile_id) != profile_id:
+            raise ValueError('Transactions cannot be moved to another profile')
+
+    def delete_transaction(self, profile_id, transaction_id):
+        raise NotImplementedError
+
+    def update_transactions(self, profile_id, transaction_ids, changes):
+        """Apply the same changes to many transactions; returns how many changed.
+
+        Engines write all of them in one atomic step; this fallback goes
+        one transaction at a time.
+        """
+        if not changes:
+            return 0
+        return sum(1 for transaction_id in dict.fromkeys(transaction_ids)
+                   if self.update_transaction(profile_id, transaction_id, changes))
+
+    def delete_transactions(self, profile_id, transaction_ids):
+        """Delete many transactions; returns how many were deleted"""
+        return sum(1 for transaction_id in dict.fromkeys(transaction_ids)
+                   if self.delete_transaction(profile_id, transaction_id))
+
+    def delete_profile_transactions(self, profile_id):
+        raise NotImplementedError
+
+    def replace_transactions(self, transactions):
+        """Replace every stored transaction (used by migrations)"""
+        raise NotImplementedError
+
+    def compact(self):
+        """Reclaim space left by edits and deletes; True if anything changed"""
+        return False
+
+    def data_files(self):
+        """Files and directories holding this engine's data, for backups"""
+        raise NotImplementedError
+
+
+_engine = None
+_housekeeping = None  # startup chores thread, see start_housekeeping()
+
+
+def configured_engine():
+    """Name of the storage engine to use: env override, then storage.json"""
+    name = os.environ.get('EXPENSE_TRACKER_STORAGE')
+    if not name and os.path.exists(STORAGE_CONFIG_FILE):
+        try:
+            with open(STORAGE_CONFIG_FILE, 'r', encoding='utf-8') as f:
+                name = json.load(f).get('engine')
+        except (json.JSONDecodeError, IOError) as e:
+            print(f"Warning: Error loading storage config - {e}")
+    name = (name or 'csv').lower()
+    if name not in STORAGE_ENGINES:
+        print(f"Warning: Unknown storage engine '{name}', using csv")
+        name = 'csv'
+    return name
+
+
+def create_engine(name):
+    """Create a storage engine by name"""
+    if name == 'sqlite':
+        from sqlite_storage import SQLiteStorage
+        return SQLiteStorage(DATABASE_FILE)
+    from csv_storage import CSVStorage
+    return CSVStorage(USERS_FILE, PARTITIONS_DIR, TRANSACTIONS_FILE, TRANSACTION_LOG_FILE)
+
+
+def start_housekeeping(*tasks):
+    """Run startup chores (backup, due recurring transactions) on a worker thread.
+
+    The worker owns the storage engine until it is done: get_storage()
+    from any other thread waits for it first, so no screen can read or
+    write data while a chore is still using it.
+    """
+    global _housekeeping
+
+    def run():
+        for task in tasks:
+            try:
+                task()
+            except Exception as e:
+                print(f"Error in background task: {e}")
+
+    _housekeeping = threading.Thread(target=run, name='housekeeping')
+    _housekeeping.start()
+    return _housekeeping
+
+
+def finish_housekeeping():
+    """Wait for the startup chores to finish, unless called from them"""
+    global _housekeeping
+    worker = _housekeeping
+    if worker is not None and worker is not threading.current_thread():
+        worker.join()
+        _housekeeping = None
+
+
+def get_storage():
+    """Return the active storage engine"""
+    global _engine
+    if _housekeeping is not None:
+        finish_housekeeping()
+    if _engine is None:
+        _engine = create_engine(configured_engine())
+    return _engine
+
+
+def load_users():
+    """Load users from storage"""
+    return get_storage().load_users()
 
     
 def save_users(users):
-    """Save users to JSON file with atomic write"""
-    ensure_data_directory()
+    """Save users to storage"""
     try:
-        # Write to temp file first for atomicity
-        temp_file = USERS_FILE + '.tmp'
-        with open(temp_file, 'w', encoding='utf-8') as f:
-            json.dump(users, f, indent=4, ensure_ascii=False)
-        
-        # Atomic rename
-        os.replace(temp_file, USERS_FILE)
+        get_storage().save_users(users)
         return True
     except Exception as e:
         print(f"Error saving users: {e}")
-        if os.path.exists(temp_file):
-            try:
-                os.remove(temp_file)
-            except:
-                pass
         return False
 
 
+def save_user(user):
+    """Write one new or changed user record to storage"""
+    try:
+        get_storage().save_user(user)
+        return True
+    except Exception as e:
+        print(f"Error saving users: {e}")
+        return False
+
+
+def find_user(name):
+    """The user with this name from the cached directory, or None (read-only)"""
+    return get_storage().user_directory().find(name)
+
+
+def users_named(name):
+    """Every user with this name from the cached directory (read-only)"""
+    return get_storage().user_directory().named(name)
+
+
+def find_profile(profile_id):
+    """(user, profile) owning a profile_id from the cached directory, or (None, None)"""
+    return get_storage().user_directory().profile(profile_id)
+
+
+def append_transactions(transactions):
+    """Add transaction rows to storage"""
+    get_storage().add_transactions(transactions)
+
+
 def delete_profile_transactions(profile_id):
     """Delete all transactions for a specific profile"""
-    if not os.path.exists(TRANSACTIONS_FILE):
-        return
-    
     try:
-        all_transactions = []
-        
-        # Read all transactions except those from the deleted profile
-        with open(TRANSACTIONS_FILE, 'r', encoding='utf-8') as csvfile:
-            reader = csv.DictReader(csvfile)
-            for row in reader:
-                cleaned_row = {key.strip(): value.strip() for key, value in row.items()}
-                if cleaned_row.get('profile_id') != profile_id:
-                    all_transactions.append(cleaned_row)
-        
-        # Write back remaining transactions
-        with open(TRANSACTIONS_FILE, 'w', newline='', encoding='utf-8') as csvfile:
-            fieldnames = ['transaction_id', 'user', 'profile_id', 'type', 'amount', 
-                         'category', 'date', 'description', 'payment_method']
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-            writer.writeheader()
-            for txn in all_transactions:
-                writer.writerow(txn)
-        
+        get_storage().delete_profile_transactions(profile_id)
         return True
     except Exception as e:
         print(f"Error deleting profile transactions: {e}")
         return False
 
 
-def should_backup():
-    """Check if we need to backup this month"""
-    if not os.path.exists(LAST_BACKUP_FILE):
-        return True
-    
+def compact_transactions():
+    """Fold pending edits and deletes into the transaction storage"""
     try:
-        with open(LAST_BACKUP_FILE, 'r', encoding='utf-8') as f:
-            last_backup = f.read().strip()
-            current_month = datetime.datetime.now().strftime('%Y-%m')
-            return last_backup != current_month
-    except Exception:
-        return True
+        return get_storage().compact()
+    except Exception as e:
+        print(f"Warning: Compaction failed - {e}")
+        return False
 
 
-def monthly_backup():
-    """Create backup once per month"""
-    if not should_backup():
-        return
+def migrate_storage(target_name):
+    """Copy users and transactions from the active engine into another one"""
+    source = get_storage()
+    if source.name == target_name:
+        print(f"Storage is already using the {target_name} engine.")
+        return False
     
-    timestamp = datetime.datetime.now().strftime('%Y-%m')  # YYYY-MM format
+    target = create_engine(target_name)
+    if target.load_users() or target.has_transactions():
+        print(f"The {target_name} storage already contains data, migration aborted.")
+        return False
     
-    # Ensure backup directory exists
-    os.makedirs(BACKUP_DIR, exist_ok=True)
+    users = source.load_users()
+    transactions = source.all_transactions()
+    target.save_users(users)
+    target.replace_transactions(transactions)
     
+    ensure_data_directory()
+    with open(STORAGE_CONFIG_FILE, 'w', encoding='utf-8') as f:
+        json.dump({'engine': target_name}, f, indent=4)
+    
+    global _engine
+    _engine = target
+    print(f"Migrated {len(users)} user(s) and {len(transactions)} transaction(s) "
+          f"from {source.name} to {target_name}.")
+    return True
+
+
+def backup_compression():
+    """Chunk compression for backups: EXPENSE_TRACKER_BACKUP_COMPRESSION (zlib or lzma)"""
+    return os.environ.get('EXPENSE_TRACKER_BACKUP_COMPRESSION', 'zlib').lower()
+
+
+def backup_store():
+    from backup_store import BackupStore
+    return BackupStore(BACKUP_DIR, backup_compression())
+
+
+def session_backup():
+    """Snapshot the active engine's data into the backup store, once per session.
+
+    Only chunks the store doesn't have yet are written, so a session that
+    changed nothing costs nothing and a small edit costs about one chunk.
+    """
     try:
-        backup_count = 0
-        
-        # Backup users file
-        if os.path.exists(USERS_FILE):
-            shutil.copy2(USERS_FILE, f"{BACKUP_DIR}/users_{timestamp}.json")
-            backup_count += 1
-        
-        # Backup transactions file
-        if os.path.exists(TRANSACTIONS_FILE):
-            shutil.copy2(TRANSACTIONS_FILE, f"{BACKUP_DIR}/transaction_{timestamp}.csv")
-            backup_count += 1
-        
-        if backup_count > 0:
-            # Update last backup date
-            with open(LAST_BACKUP_FILE, 'w', encoding='utf-8') as f:
-                f.write(datetime.datetime.now().strftime('%Y-%m'))
-            
-            print(f"\n{'='*50}")
-            print(f"Monthly backup created successfully! ({timestamp})")
-            print(f"{'='*50}\n")
-            
-       
-            
+        snapshot_id, _ = backup_store().snapshot(get_storage().data_files())
     except Exception as e:
         print(f"Warning: Backup failed - {e}")
+        return None
+    return snapshot_id
 
 
+def restore_backup(snapshot_id, target='.'):
+    """Rebuild a backup snapshot's files under target; returns how many were written"""
+    global _engine
+    count = backup_store().restore(snapshot_id, target)
+    # Cached users and rows may describe the replaced files
+    _engine = None
+    return count
+
+
+if __name__ == '__main__':
+    import sys
+    import storage  # run against the importable module, not __main__
+    
+    if len(sys.argv) == 3 and sys.argv[1] == 'migrate' and sys.argv[2] in STORAGE_ENGINES:
+        sys.exit(0 if storage.migrate_storage(sys.argv[2]) else 1)
+    if len(sys.argv) == 2 and sys.argv[1] == 'compact':
+        print('Compacted.' if storage.compact_transactions() else 'Nothing to compact.')
+        sys.exit(0)
+    if len(sys.argv) == 2 and sys.argv[1] == 'backup':
+        snapshot_id, stats = storage.backup_store().snapshot(storage.get_storage().data_files())
+        print(f"Snapshot {snapshot_id}: {stats['files']} file(s), {stats['bytes']} bytes, "
+              f"{stats['new_chunks']} new chunk(s) stored in {stats['stored_bytes']} bytes"
+              if snapshot_id else 'Nothing changed since the last snapshot.')
+        sys.exit(0)
+    if len(sys.argv) == 2 and sys.argv[1] == 'backups':
+        for snapshot_id in storage.backup_store().snapshots():
+            print(snapshot_id)
+        sys.exit(0)
+    if len(sys.argv) in (3, 4) and sys.argv[1] == 'restore':
+        try:
+            count = storage.restore_backup(*sys.argv[2:])
+        except ValueError as e:
+            print(e)
+            sys.exit(1)
+        print(f'Restored {count} file(s) from snapshot {sys.argv[2]}.')
+        sys.exit(0)
+    print(f"Usage: python storage.py migrate {{{'|'.join(STORAGE_ENGINES)}}}")
+    print("       python storage.py compact")
+    print("       python storage.py backup | backups | restore SNAPSHOT [TARGET_DIR]")
+    sys.exit(2)
@@ -0,0 +1,84 @@
+import os
+import json
+import shutil
+import tempfile
+import unittest
+
+from csv_storage import CSVStorage
+
+
+def _txn(transaction_id, profile_id, date='2025-01-05', amount='10'):
+    return {'transaction_id': transaction_id, 'user': 'alice', 'profile_id': profile_id,
+            'type': 'expense', 'amount': amount, 'category': 'Food', 'date': date,
+            'description': 'coffee', 'payment_method': 'Cash'}
+
+
+class PartitionStatsTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.partitions_dir = os.path.join(self.directory, 'transactions')
+        self.store = CSVStorage(os.path.join(self.directory, 'users.json'), self.partitions_dir)
+        self.store.add_transactions([_txn('T1', 'P1'), _txn('T2', 'P1'), _txn('T3', 'P2')])
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _files(self, *names):
+        """(inode, mtime) of each file; os.replace gives a rewritten file a new inode"""
+        stats = {}
+        for name in names:
+            stat = os.stat(os.path.join(self.partitions_dir, name))
+            stats[name] = (stat.st_ino, stat.st_mtime_ns)
+        return stats
+
+    def test_writes_leave_other_profiles_metadata_alone(self):
+        untouched = self._files('manifest.json', 'P2.meta')
+        p1_meta = self._files('P1.meta')
+
+        self.assertTrue(self.store.update_transaction('P1', 'T1', {'amount': '25', 'date': '2025-03-01'}))
+        self.assertEqual(self.store.update_transactions('P1', ['T1', 'T2'], {'category': 'Drinks'}), 2)
+        self.assertTrue(self.store.delete_transaction('P1', 'T2'))
+        self.store.add_transactions([_txn('T4', 'P1')])
+
+        self.assertEqual(self._files('manifest.json', 'P2.meta'), untouched)
+        self.assertNotEqual(self._files('P1.meta'), p1_meta)
+        totals = self.store.monthly_totals('P1')
+        self.assertEqual(totals['2025-03']['count'], 1)
+        self.assertEqual(totals['2025-01']['count'], 1)
+
+    def test_adding_a_profile_rewrites_only_the_manifest(self):
+        untouched = self._files('P1.meta', 'P2.meta')
+        self.store.add_transactions([_txn('T5', 'P3')])
+        self.assertEqual(self._files('P1.meta', 'P2.meta'), untouched)
+        self.assertEqual(set(CSVStorage(os.path.join(self.directory, 'users.json'),
+                                        self.partitions_dir)._entries()), {'P1', 'P2', 'P3'})
+
+    def test_missing_sidecar_is_recounted(self):
+        os.remove(os.path.join(self.partitions_dir, 'P1.meta'))
+        store = CSVStorage(os.path.join(self.directory, 'users.json'), self.partitions_dir)
+        self.assertEqual(store.monthly_totals('P1')['2025-01']['count'], 2)
+        self.assertTrue(os.path.exists(os.path.join(self.partitions_dir, 'P1.meta')))
+
+    def test_inline_stats_of_older_manifests_move_to_sidecars(self):
+        manifest = os.path.join(self.partitions_dir, 'manifest.json')
+        with open(os.path.join(self.partitions_dir, 'P1.meta'), 'r', encoding='utf-8') as f:
+            p1_stats = json.load(f)
+        with open(manifest, 'w', encoding='utf-8') as f:
+            json.dump({'profiles': {'P1': {'file': 'P1.csv', **p1_stats}, 'P2': {'file': 'P2.csv'}}}, f)
+        os.remove(os.path.join(self.partitions_dir, 'P1.meta'))
+
+        store = CSVStorage(os.path.join(self.directory, 'users.json'), self.partitions_dir)
+        self.assertEqual(store.monthly_totals('P1')['2025-01']['count'], 2)
+        with open(manifest, 'r', encoding='utf-8') as f:
+            self.assertEqual(json.load(f)['profiles']['P1'], {'file': 'P1.csv'})
+        with open(os.path.join(self.partitions_dir, 'P1.meta'), 'r', encoding='utf-8') as f:
+            self.assertEqual(json.load(f), p1_stats)
+
+    def test_delete_profile_removes_its_sidecar(self):
+        self.store.delete_profile_transactions('P2')
+        self.assertFalse(os.path.exists(os.path.join(self.partitions_dir, 'P2.meta')))
+        self.assertEqual(self.store.profile_transactions('P2'), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
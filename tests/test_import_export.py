@@ -0,0 +1,74 @@
+import os
+import csv
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import storage
+import import_export
+from csv_storage import CSVStorage
+from sqlite_storage import SQLiteStorage
+from storage import TRANSACTION_FIELDS
+
+
+def _txn(transaction_id, profile_id='P1', amount='10'):
+    return {'transaction_id': transaction_id, 'user': 'alice', 'profile_id': profile_id,
+            'type': 'expense', 'amount': amount, 'category': 'Food', 'date': '2025-01-05',
+            'description': 'coffee', 'payment_method': 'Cash'}
+
+
+class ImportDuplicatesTest(unittest.TestCase):
+    engines = {
+        'csv': lambda directory: CSVStorage(os.path.join(directory, 'users.json'),
+                                            os.path.join(directory, 'transactions')),
+        'sqlite': lambda directory: SQLiteStorage(os.path.join(directory, 'expense_tracker.db')),
+    }
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.import_file = os.path.join(self.directory, 'import.csv')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _write_file(self, rows):
+        with open(self.import_file, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=TRANSACTION_FIELDS)
+            writer.writeheader()
+            writer.writerows(rows)
+
+    def _import(self, store, skip_duplicates=True):
+        with mock.patch.object(storage, '_engine', store):
+            checked = import_export.check_import_file(store, self.import_file, 'alice', 'P1', skip_duplicates)
+            valid_count, skipped_count, invalid_lines = checked
+            imported = import_export.write_import_file(store, self.import_file, 'alice', 'P1',
+                                                       invalid_lines, skip_duplicates)
+        return valid_count, skipped_count, imported
+
+    def test_only_ids_stored_before_the_import_are_skipped(self):
+        # S1 is stored already (S2 in another profile); A repeats in the file
+        rows = [_txn('S1'), _txn('A', amount='1'), _txn('S2'), _txn('A', amount='2'), _txn('B'),
+                _txn('BAD', amount='abc')]
+        self._write_file(rows)
+        for name, engine in self.engines.items():
+            with self.subTest(engine=name):
+                store = engine(os.path.join(self.directory, name))
+                store.add_transactions([_txn('S1'), _txn('S2', 'P2')])
+                # One row per batch: later batches must not see A as stored
+                with mock.patch.object(import_export, 'IMPORT_BATCH_SIZE', 1):
+                    valid_count, skipped_count, imported = self._import(store)
+                self.assertEqual((valid_count, skipped_count, imported), (3, 2, 3))
+                stored = [txn['transaction_id'] for txn in store.profile_transactions('P1')]
+                self.assertEqual(sorted(stored), ['A', 'A', 'B', 'S1'])
+
+    def test_import_all_keeps_stored_ids(self):
+        self._write_file([_txn('S1'), _txn('C')])
+        store = self.engines['sqlite'](self.directory)
+        store.add_transactions([_txn('S1')])
+        self.assertEqual(self._import(store, skip_duplicates=False), (2, 0, 2))
+        self.assertEqual(len(store.profile_transactions('P1')), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
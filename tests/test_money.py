@@ -0,0 +1,34 @@
+import unittest
+
+from money import Money
+from query import parse_query
+
+
+class MoneyParseTest(unittest.TestCase):
+    def test_parses_amounts_exactly(self):
+        amount = Money.parse('12.50')
+        self.assertEqual((amount.minor, amount.exponent), (1250, 2))
+        self.assertEqual(str(Money.parse('3', 2)), '3.00')
+
+    def test_rejects_huge_exponents_as_invalid_amounts(self):
+        # The scaling to minor units raised InvalidOperation and Overflow
+        for text in ('1e-5000000', '1e5000000', '1E+999999', '1e-999999'):
+            with self.subTest(text=text):
+                with self.assertRaises(ValueError):
+                    Money.parse(text)
+
+    def test_rejects_amounts_outside_the_digit_bound(self):
+        with self.assertRaises(ValueError):
+            Money.parse('1' + '0' * 40)
+        with self.assertRaises(ValueError):
+            Money.parse('0.' + '0' * 40 + '1')
+
+    def test_query_reports_huge_exponents_as_value_errors(self):
+        for text in ('amount>1e-5000000', 'amount<1e5000000'):
+            with self.subTest(text=text):
+                with self.assertRaises(ValueError):
+                    parse_query(text)
+
+
+if __name__ == '__main__':
+    unittest.main()
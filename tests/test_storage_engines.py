@@ -0,0 +1,366 @@
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import csv_storage
+import storage
+from csv_storage import CSVStorage
+from dates import date_key
+from keyword_index import KeywordIndex
+from query import parse_query
+from sqlite_storage import SQLiteStorage
+from storage import add_monthly_totals, decode_monthly_totals
+
+
+def _txn(transaction_id, profile_id='P1', amount='10', date='2025-01-05', category='Food',
+         description='coffee beans'):
+    return {'transaction_id': transaction_id, 'user': 'alice', 'profile_id': profile_id,
+            'type': 'expense', 'amount': amount, 'category': category, 'date': date,
+            'description': description, 'payment_method': 'Cash'}
+
+
+def csv_engine(directory):
+    return CSVStorage(os.path.join(directory, 'users.json'), os.path.join(directory, 'transactions'))
+
+
+def sqlite_engine(directory):
+    return SQLiteStorage(os.path.join(directory, 'expense_tracker.db'))
+
+
+class EngineContract:
+    """Behaviour every StorageEngine shares; subclasses pick the engine"""
+
+    make_engine = None
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.store = self.make_engine(self.directory)
+        self.store.add_transactions([_txn('T1'), _txn('T2'), _txn('T3', 'P2')])
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_edits_cannot_move_a_transaction_to_another_profile(self):
+        with self.assertRaises(ValueError):
+            self.store.update_transaction('P1', 'T1', {'profile_id': 'P2', 'amount': '99'})
+        with self.assertRaises(ValueError):
+            self.store.update_transactions('P1', ['T1', 'T2'], {'profile_id': 'P2'})
+        self.assertEqual(self.store.find_transaction('P1', 'T1'), _txn('T1'))
+        self.assertEqual([txn['transaction_id'] for txn in self.store.profile_transactions('P2')], ['T3'])
+
+    def test_edits_may_repeat_the_same_profile(self):
+        self.assertTrue(self.store.update_transaction('P1', 'T1', {'profile_id': 'P1', 'amount': '5'}))
+        self.assertEqual(self.store.find_transaction('P1', 'T1')['amount'], '5')
+
+
+class CSVEngineTest(EngineContract, unittest.TestCase):
+    make_engine = staticmethod(csv_engine)
+
+
+class SQLiteEngineTest(EngineContract, unittest.TestCase):
+    make_engine = staticmethod(sqlite_engine)
+
+
+WORDS = ['coffee beans', 'green tea', 'team lunch', 'taxi ride', 'rent', 'book store']
+
+QUERIES = ['coffee', 'te*', 'tea', 'lunch', 'ride', 'category:Drinks', 'date:2025-02',
+           'date>=2025-02-01 date<2025-03-15', 'amount>20', 'amount<=7.5 te*',
+           'type:income', 'coffee date:2025-01', '']
+
+
+def _scenario_rows(start, count, profile_id='P1'):
+    """Rows spread over three months, every description word and both types"""
+    return [{**_txn(f'T{n}', profile_id, amount=f'{n % 9 + 1}.{n % 4}5',
+                    date=f'2025-{n % 3 + 1}-{n % 27 + 1}', category=('Food', 'Travel', 'Home')[n % 3],
+                    description=WORDS[n % len(WORDS)]),
+             'type': 'income' if n % 7 == 0 else 'expense'}
+            for n in range(start, start + count)]
+
+
+class Model:
+    """The rows every engine should hold, kept as a plain list"""
+
+    def __init__(self):
+        self.rows = []
+
+    def add_transactions(self, transactions):
+        self.rows.extend(dict(txn) for txn in transactions)
+
+    def _find(self, profile_id, transaction_id):
+        return next((txn for txn in self.rows if txn['profile_id'] == profile_id
+                     and txn['transaction_id'] == transaction_id), None)
+
+    def update_transaction(self, profile_id, transaction_id, changes):
+        txn = self._find(profile_id, transaction_id)
+        if txn is None:
+            return False
+        txn.update(changes)
+        return True
+
+    def delete_transaction(self, profile_id, transaction_id):
+        txn = self._find(profile_id, transaction_id)
+        if txn is None:
+            return False
+        self.rows.remove(txn)
+        return True
+
+    def update_transactions(self, profile_id, transaction_ids, changes):
+        return sum(1 for transaction_id in dict.fromkeys(transaction_ids)
+                   if self.update_transaction(profile_id, transaction_id, changes))
+
+    def delete_transactions(self, profile_id, transaction_ids):
+        return sum(1 for transaction_id in dict.fromkeys(transaction_ids)
+                   if self.delete_transaction(profile_id, transaction_id))
+
+
+def _rows(rows):
+    # SQLite stores dates zero-padded, the CSV files keep them as entered
+    return [{**txn, 'date': date_key(txn['date'])} for txn in rows]
+
+
+def _ids(rows):
+    return [txn['transaction_id'] for txn in rows]
+
+
+def snapshot(store, profiles=('P1', 'P2')):
+    """What a store answers for every profile and query in QUERIES"""
+    result = {}
+    for profile_id in profiles:
+        result[profile_id] = {
+            'rows': _rows(store.profile_transactions(profile_id)),
+            'listed': _rows(store.iter_profile_transactions(profile_id)),
+            'months': store.monthly_totals(profile_id),
+            'matching': {text: _ids(store.matching_transactions(profile_id, parse_query(text)))
+                         for text in QUERIES},
+            'by_date': {text: _ids(store.matching_transactions(profile_id, parse_query(text), 'date'))
+                        for text in QUERIES},
+            'streamed': {text: _ids(store.iter_matching_transactions(profile_id, parse_query(text)))
+                         for text in QUERIES},
+            'found': {transaction_id: _rows(filter(None, [store.find_transaction(profile_id, transaction_id)]))
+                      for transaction_id in ('T1', 'T2', 'T3', 'T12', 'T40', 'T99')},
+        }
+    all_ids = [f'T{n}' for n in range(100)]
+    result['existing'] = sorted(store.existing_transaction_ids(all_ids))
+    result['existing_P2'] = sorted(store.existing_transaction_ids(all_ids, 'P2'))
+    return result
+
+
+def model_snapshot(model, profiles=('P1', 'P2')):
+    """snapshot() of a Model, answered by filtering its plain list"""
+    result = {}
+    for profile_id in profiles:
+        rows = [txn for txn in model.rows if txn['profile_id'] == profile_id]
+        result[profile_id] = {
+            'rows': _rows(rows),
+            'listed': _rows(rows),
+            'months': decode_monthly_totals(add_monthly_totals({}, rows)),
+            'matching': {text: _ids(parse_query(text).filter(rows)) for text in QUERIES},
+            'by_date': {text: _ids(sorted(parse_query(text).filter(rows), key=lambda txn: date_key(txn['date'])))
+                        for text in QUERIES},
+            'streamed': {text: _ids(parse_query(text).filter(rows)) for text in QUERIES},
+            'found': {transaction_id: _rows(txn for txn in rows if txn['transaction_id'] == transaction_id)
+                      for transaction_id in ('T1', 'T2', 'T3', 'T12', 'T40', 'T99')},
+        }
+    ids = {txn['transaction_id'] for txn in model.rows}
+    result['existing'] = sorted(ids & {f'T{n}' for n in range(100)})
+    result['existing_P2'] = sorted(txn['transaction_id'] for txn in model.rows
+                                   if txn['profile_id'] == 'P2' and txn['transaction_id'] in
+                                   {f'T{n}' for n in range(100)})
+    return result
+
+
+STEPS = [
+    ('add', lambda store: store.add_transactions(_scenario_rows(0, 40) + _scenario_rows(40, 8, 'P2'))),
+    ('edit', lambda store: store.update_transaction('P1', 'T1', {'description': 'coffee to go', 'amount': '42'})),
+    ('move date', lambda store: store.update_transaction('P1', 'T2', {'date': '2025-03-09'})),
+    ('rename word', lambda store: store.update_transaction('P1', 'T12', {'description': 'bus ride'})),
+    ('edit missing', lambda store: store.update_transaction('P1', 'T99', {'amount': '1'})),
+    ('delete', lambda store: store.delete_transaction('P1', 'T3')),
+    ('delete missing', lambda store: store.delete_transaction('P1', 'T3')),
+    ('delete other profile', lambda store: store.delete_transaction('P2', 'T4')),
+    ('bulk edit', lambda store: store.update_transactions(
+        'P1', ['T4', 'T5', 'T6', 'T7', 'T5', 'T99', 'T41'], {'category': 'Drinks', 'amount': '7.5'})),
+    ('bulk delete', lambda store: store.delete_transactions('P1', ['T13', 'T14', 'T15', 'T98', 'T40'])),
+    ('add more', lambda store: store.add_transactions(_scenario_rows(60, 6))),
+    ('edit added', lambda store: store.update_transaction('P1', 'T61', {'description': 'green tea', 'type': 'income'})),
+    ('delete added', lambda store: store.delete_transaction('P1', 'T62')),
+]
+
+
+class EngineParityTest(unittest.TestCase):
+    """The same sequence of writes against both engines and a plain list"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        os.mkdir(os.path.join(self.directory, 'csv'))
+        os.mkdir(os.path.join(self.directory, 'sqlite'))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def engines(self):
+        return {'csv': csv_engine(os.path.join(self.directory, 'csv')),
+                'sqlite': sqlite_engine(os.path.join(self.directory, 'sqlite'))}
+
+    def assertAllMatch(self, stores, model, step):
+        expected = model_snapshot(model)
+        for name, store in stores.items():
+            self.assertEqual(snapshot(store), expected, f'{name} after {step}')
+
+    def test_same_results_after_every_step(self):
+        stores, model = self.engines(), Model()
+        for step, apply in STEPS:
+            results = {name: apply(store) for name, store in stores.items()}
+            expected = apply(model)
+            self.assertEqual(results, {name: expected for name in stores}, step)
+            self.assertAllMatch(stores, model, step)
+
+        # A fresh instance replays the CSV change log from disk
+        self.assertTrue(os.path.exists(os.path.join(self.directory, 'csv', 'transactions', 'P1.log')))
+        stores = self.engines()
+        self.assertAllMatch(stores, model, 'reopening')
+
+        for store in stores.values():
+            store.compact()
+        self.assertFalse(os.path.exists(os.path.join(self.directory, 'csv', 'transactions', 'P1.log')))
+        self.assertAllMatch(stores, model, 'compacting')
+        self.assertFalse(stores['csv'].compact())
+        self.assertAllMatch(self.engines(), model, 'reopening after compacting')
+
+        for store in stores.values():
+            store.delete_profile_transactions('P2')
+        model.rows = [txn for txn in model.rows if txn['profile_id'] != 'P2']
+        self.assertAllMatch(stores, model, 'deleting a profile')
+
+    def test_log_compacts_itself_at_the_threshold(self):
+        stores, model = self.engines(), Model()
+        with mock.patch.object(csv_storage, 'LOG_COMPACTION_THRESHOLD', 5):
+            for step, apply in STEPS:
+                for store in stores.values():
+                    apply(store)
+                apply(model)
+            self.assertAllMatch(stores, model, 'the scenario')
+            log = os.path.join(self.directory, 'csv', 'transactions', 'P1.log')
+            records = stores['csv']._partition('P1').log_records
+            self.assertLess(records, 5)
+            self.assertEqual(os.path.exists(log), records > 0)
+        self.assertAllMatch(self.engines(), model, 'reopening')
+
+
+class CSVIndexRecoveryTest(unittest.TestCase):
+    """Side files of a partition that no longer match its CSV are rebuilt"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.partition = os.path.join(self.directory, 'transactions', 'P1')
+        store = csv_engine(self.directory)
+        store.add_transactions(_scenario_rows(0, 20))
+        # Build the offset index, then append once more so it covers a second write
+        self.assertEqual(store.find_transaction('P1', 'T5'), _scenario_rows(5, 1)[0])
+        store.add_transactions(_scenario_rows(20, 2))
+        self.assertIsNotNone(store.find_transaction('P1', 'T21'))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def truncate(self, path, size):
+        with open(path, 'r+b') as f:
+            f.truncate(size)
+
+    def test_index_rebuilt_after_the_csv_loses_its_last_write(self):
+        # The CSV as it was before the last append, as a crash or restore would leave it
+        with open(self.partition + '.csv', 'rb') as f:
+            data = f.read()
+        last_rows = data.rstrip(b'\n').rsplit(b'\n', 2)[0]
+        self.truncate(self.partition + '.csv', len(last_rows) + 1)
+        store = csv_engine(self.directory)
+        self.assertIsNone(store.find_transaction('P1', 'T21'))
+        self.assertIsNone(store.find_transaction('P1', 'T20'))
+        self.assertEqual(store.find_transaction('P1', 'T19'), _scenario_rows(19, 1)[0])
+        self.assertEqual(_ids(store.profile_transactions('P1')), [f'T{n}' for n in range(20)])
+        self.assertEqual(store.existing_transaction_ids(['T1', 'T20', 'T21']), {'T1'})
+        store.add_transactions(_scenario_rows(30, 1))
+        self.assertEqual(csv_engine(self.directory).find_transaction('P1', 'T30'), _scenario_rows(30, 1)[0])
+
+    def test_index_rebuilt_after_a_torn_index_write(self):
+        self.truncate(self.partition + '.idx', os.path.getsize(self.partition + '.idx') - 7)
+        store = csv_engine(self.directory)
+        for n in (0, 5, 20, 21):
+            self.assertEqual(store.find_transaction('P1', f'T{n}'), _scenario_rows(n, 1)[0])
+        self.assertEqual(_ids(store.matching_transactions('P1', parse_query('date:2025-02'))),
+                         _ids(parse_query('date:2025-02').filter(_scenario_rows(0, 22))))
+
+    def test_keyword_index_follows_edits_and_deletes(self):
+        store = csv_engine(self.directory)
+        coffee = _ids(store.matching_transactions('P1', parse_query('coffee')))
+        store.update_transaction('P1', coffee[0], {'description': 'espresso'})
+        store.delete_transaction('P1', coffee[1])
+        store.update_transactions('P1', ['T1', 'T7'], {'description': 'coffee again'})
+        # The edits are applied to the stored index, it is never rebuilt from the rows
+        with mock.patch.object(KeywordIndex, 'rebuild', side_effect=AssertionError('rebuilt')):
+            for reopened in (store, csv_engine(self.directory)):
+                self.assertEqual(_ids(reopened.matching_transactions('P1', parse_query('espresso'))), coffee[:1])
+                self.assertEqual(_ids(reopened.matching_transactions('P1', parse_query('coffee'))),
+                                 sorted(coffee[2:] + ['T1', 'T7'], key=lambda i: int(i[1:])))
+                # Nothing else shares these words' trigrams, so the postings are exact
+                index = reopened._keyword_index('P1', reopened._partition('P1'))
+                self.assertEqual(index.candidates(['espresso']), set(coffee[:1]))
+                self.assertEqual(index.candidates(['coffee']), set(coffee[2:] + ['T1', 'T7']))
+
+
+class MigrationTest(unittest.TestCase):
+    """migrate_storage copies users and rows between the engines both ways"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        previous = os.getcwd()
+        os.chdir(self.directory)
+        self.addCleanup(os.chdir, previous)
+        self.addCleanup(shutil.rmtree, self.directory)
+        environment = mock.patch.dict(os.environ)
+        environment.start()
+        self.addCleanup(environment.stop)
+        os.environ.pop('EXPENSE_TRACKER_STORAGE', None)
+        engine = mock.patch.object(storage, '_engine', None)
+        engine.start()
+        self.addCleanup(engine.stop)
+
+    def fill(self, name):
+        store = storage.create_engine(name)
+        store.save_users([{'user_id': 'U1', 'name': 'alice', 'password': 'x',
+                           'profiles': [{'profile_id': 'P1'}, {'profile_id': 'P2'}]}])
+        model = Model()
+        for step, apply in STEPS:
+            apply(store)
+            apply(model)
+        return store, model
+
+    def migrate(self, target):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return storage.migrate_storage(target)
+
+    def check_migration(self, source_name, target_name):
+        source, model = self.fill(source_name)
+        storage._engine = source
+        users = source.load_users()
+        self.assertTrue(self.migrate(target_name))
+        self.assertEqual(storage.configured_engine(), target_name)
+        target = storage.create_engine(target_name)
+        self.assertEqual(target.load_users(), users)
+        self.assertEqual(snapshot(target), model_snapshot(model))
+        # Moving back is refused while the old engine still holds the data
+        self.assertFalse(self.migrate(source_name))
+
+    def test_csv_to_sqlite(self):
+        self.check_migration('csv', 'sqlite')
+
+    def test_sqlite_to_csv(self):
+        self.check_migration('sqlite', 'csv')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,21 +1,21 @@
-import os
-import csv
-import datetime
-from decimal import Decimal
-import getpass
-from utils import verify_password, clear_screen, PrintMesg, PrintMenu
-from storage import load_users, TRANSACTIONS_FILE, ensure_data_directory
+from utils import clear_screen, PrintMesg, PrintMenu
+from dates import parse_date
+from money import Money
+from query import filters_query, parse_query
+from pager import Pager, browse
+from storage import append_transactions, get_storage, new_transaction_id
+from sessions import confirm_identity
 from recurring_transactions import recurring_transactions_menu
 
 
 def add_transaction(user, profile, type_):
     """Add a new transaction (income or expense)"""
-    transaction_id = f'TXN{int(datetime.datetime.now().timestamp())}'
+    transaction_id = new_transaction_id()
     
     # Amount input
     amount_input = input('Enter amount: ').strip()
     try:
-        amount = Decimal(amount_input)
+        amount = Money.parse(amount_input)
         if amount <= 0:
             print('\nAmount must be greater than 0!')
             input('\nPress Enter to continue...')
@@ -34,9 +34,7 @@ def add_transaction(user, profile, type_):
     
     # Date input
     date = input('Enter date (YYYY-MM-DD): ').strip()
-    try:
-        datetime.datetime.strptime(date, '%Y-%m-%d')
-    except ValueError:
+    if parse_date(date) is None:
         print('\nInvalid date format. Please use YYYY-MM-DD.')
         input('\nPress Enter to continue...')
         return False
@@ -51,31 +49,18 @@ def add_transaction(user, profile, type_):
         input('\nPress Enter to continue...')
         return False
     
-    # Ensure data directory exists
-    ensure_data_directory()
-    
-    file_exists = os.path.exists(TRANSACTIONS_FILE)
-    
     try:
-        with open(TRANSACTIONS_FILE, 'a', newline='', encoding='utf-8') as csvfile:
-            fieldnames = ['transaction_id', 'user', 'profile_id', 'type', 'amount', 
-                         'category', 'date', 'description', 'payment_method']
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-            
-            if not file_exists or os.stat(TRANSACTIONS_FILE).st_size == 0:
-                writer.writeheader()
-            
-            writer.writerow({
-                'transaction_id': transaction_id,
-                'user': user,
-                'profile_id': profile['profile_id'],
-                'type': type_,
-                'amount': str(amount),
-                'category': category.strip(),
-                'date': date,
-                'description': description,
-                'payment_method': payment_method.strip()
-            })
+        append_transactions([{
+            'transaction_id': transaction_id,
+            'user': user,
+            'profile_id': profile['profile_id'],
+            'type': type_,
+            'amount': str(amount),
+            'category': category.strip(),
+            'date': date,
+            'description': description,
+            'payment_method': payment_method.strip()
+        }])
         return True
     except Exception as e:
         print(f'\nError writing to file: {e}')
@@ -84,88 +69,51 @@ def add_transaction(user, profile, type_):
 
 
 def load_all_transactions():
-    """Load all transactions from CSV file"""
-    if not os.path.exists(TRANSACTIONS_FILE):
-        return []
-    
-    transactions = []
+    """Load all transactions from storage"""
     try:
-        with open(TRANSACTIONS_FILE, 'r', encoding='utf-8') as csvfile:
-            reader = csv.DictReader(csvfile)
-            for row in reader:
-                cleaned_row = {key.strip(): value.strip() for key, value in row.items()}
-                transactions.append(cleaned_row)
+        return get_storage().all_transactions()
     except Exception as e:
         print(f'\nError reading transactions: {e}')
-    
-    return transactions
-
-
-def save_all_transactions(transactions):
-    """Save all transactions to CSV file"""
-    ensure_data_directory()
-    
-    try:
-        with open(TRANSACTIONS_FILE, 'w', newline='', encoding='utf-8') as csvfile:
-            fieldnames = ['transaction_id', 'user', 'profile_id', 'type', 'amount', 
-                         'category', 'date', 'description', 'payment_method']
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-            writer.writeheader()
-            for txn in transactions:
-                writer.writerow(txn)
-        return True
-    except Exception as e:
-        print(f'\nError saving transactions: {e}')
-        return False
+        return []
 
 
 def edit_or_delete_transaction(user, profile):
     """Edit or delete a transaction"""
     print('\n--- All Your Transactions ---')
     
-    all_transactions = load_all_transactions()
+    store = get_storage()
     
-    if not all_transactions:
+    if not store.has_transactions():
         print('No transactions found!')
         input('\nPress Enter to continue...')
         return
     
-    # Filter transactions for current profile
-    profile_transactions = [
-        txn for txn in all_transactions 
-        if txn.get('profile_id') == profile['profile_id']
-    ]
+    # Transactions of the current profile, read a page at a time
+    pager = Pager(store.iter_profile_transactions(profile['profile_id']))
     
-    if not profile_transactions:
+    if not pager.page():
         print('You have no transactions in this profile!')
         input('\nPress Enter to continue...')
         return
     
-    # Display transactions
-    for txn in profile_transactions:
-        display_transaction(txn, profile)
-    
-    # Get transaction ID
-    txn_id = input('\nEnter the Transaction ID to edit or delete: ').strip()
+    # Page through the transactions until one is picked
+    txn_id = browse(pager, lambda txn: format_transaction(txn, profile),
+                    action_prompt='Or enter the Transaction ID to edit or delete')
+    if txn_id is None:
+        return
     if not txn_id:
         print('\nTransaction ID cannot be empty!')
         input('\nPress Enter to continue...')
         return
     
     # Find target transaction
-    target_txn = None
-    target_index = -1
-    for i, txn in enumerate(all_transactions):
-        if (txn['transaction_id'] == txn_id and 
-            txn.get('profile_id') == profile['profile_id']):
-            target_txn = txn
-            target_index = i
-            break
+    original_txn = store.find_transaction(profile['profile_id'], txn_id)
     
-    if not target_txn:
+    if not original_txn:
         print('\nTransaction not found in this profile!')
         input('\nPress Enter to continue...')
         return
+    target_txn = dict(original_txn)
     
     # Ask for action
     action = input('\nEnter "e" to edit or "d" to delete: ').lower().strip()
@@ -177,7 +125,7 @@ def edit_or_delete_transaction(user, profile):
         new_amount = input(f'Amount (current: {target_txn["amount"]}): ').strip()
         if new_amount:
             try:
-                validated_amount = Decimal(new_amount)
+                validated_amount = Money.parse(new_amount)
                 if validated_amount <= 0:
                     print('Amount must be greater than 0! Keeping current value.')
                 else:
@@ -193,10 +141,9 @@ def edit_or_delete_transaction(user, profile):
         # Edit date
         new_date = input(f'Date (current: {target_txn["date"]}): ').strip()
         if new_date:
-            try:
-                datetime.datetime.strptime(new_date, '%Y-%m-%d')
+            if parse_date(new_date) is not None:
                 target_txn['date'] = new_date
-            except ValueError:
+            else:
                 print('Invalid date format! Keeping current value.')
         
         # Edit description
@@ -210,32 +157,33 @@ def edit_or_delete_transaction(user, profile):
             target_txn['payment_method'] = new_payment
         
         # Save changes
-        all_transactions[target_index] = target_txn
-        if save_all_transactions(all_transactions):
+        try:
+            changes = {field: value for field, value in target_txn.items()
+                       if original_txn.get(field) != value}
+            updated = store.update_transaction(profile['profile_id'], txn_id, changes)
+        except Exception as e:
+            print(f'\nError saving transactions: {e}')
+            updated = False
+        if updated:
             print('\nTransaction updated successfully!')
         else:
             print('\nFailed to update transaction!')
         
     elif action == 'd':
-        # Verify password before deletion
-        password = getpass.getpass('\nEnter your password to confirm deletion: ')
-        users = load_users()
-        
-        authenticated = False
-        for u in users:
-            if u["name"] == user and verify_password(password, u["password"]):
-                authenticated = True
-                break
-        
-        if not authenticated:
+        # Verify password before deletion; a live login session skips bcrypt
+        if not confirm_identity(user, '\nEnter your password to confirm deletion: '):
             print('\nAuthentication failed! Transaction not deleted.')
             input('\nPress Enter to continue...')
             return
         
         # Remove transaction
-        all_transactions.pop(target_index)
+        try:
+            deleted = store.delete_transaction(profile['profile_id'], txn_id)
+        except Exception as e:
+            print(f'\nError saving transactions: {e}')
+            deleted = False
         
-        if save_all_transactions(all_transactions):
+        if deleted:
             print('\nTransaction deleted successfully!')
         else:
             print('\nFailed to delete transaction!')
@@ -246,21 +194,136 @@ def edit_or_delete_transaction(user, profile):
     input('\nPress Enter to continue...')
 
 
+def bulk_edit_or_delete_transactions(user, profile):
+    """Apply the same edit, or a delete, to many transactions at once"""
+    print('\n--- Bulk Edit or Delete Transactions ---')
+    
+    store = get_storage()
+    
+    if not store.has_transactions():
+        print('No transactions found!')
+        input('\nPress Enter to continue...')
+        return
+    
+    # Pick the transactions by ID or by a search query
+    print('Select transactions by a list of IDs (e.g. TXN1, TXN2 TXN3)')
+    print('or by a query (e.g. category:Food date:2024-05 amount<10 coff*).')
+    mode = input('\nEnter "i" for IDs or "q" for a query: ').lower().strip()
+    
+    if mode == 'i':
+        ids = input('Transaction IDs: ').replace(',', ' ').split()
+        existing = store.existing_transaction_ids(ids, profile['profile_id'])
+        txn_ids = [txn_id for txn_id in ids if txn_id in existing]
+    elif mode == 'q':
+        try:
+            query = parse_query(input('Query: ').strip())
+            txn_ids = [txn['transaction_id']
+                       for txn in store.matching_transactions(profile['profile_id'], query)]
+        except ValueError as e:
+            print(f'\n{e}')
+            input('\nPress Enter to continue...')
+            return
+    else:
+        print('\nInvalid choice!')
+        input('\nPress Enter to continue...')
+        return
+    
+    txn_ids = list(dict.fromkeys(txn_ids))
+    if not txn_ids:
+        print('\nNo matching transactions in this profile!')
+        input('\nPress Enter to continue...')
+        return
+    
+    print(f'\n{len(txn_ids)} transaction(s) selected.')
+    action = input('Enter "e" to edit or "d" to delete them all: ').lower().strip()
+    
+    if action == 'e':
+        print('\n--- Bulk Edit (press Enter to leave a field unchanged) ---')
+        changes = {}
+        
+        new_amount = input('Amount: ').strip()
+        if new_amount:
+            try:
+                validated_amount = Money.parse(new_amount)
+                if validated_amount <= 0:
+                    print('Amount must be greater than 0! Leaving amounts unchanged.')
+                else:
+                    changes['amount'] = str(validated_amount)
+            except ValueError:
+                print('Invalid amount! Leaving amounts unchanged.')
+        
+        new_category = input('Category: ').strip()
+        if new_category:
+            changes['category'] = new_category
+        
+        new_date = input('Date: ').strip()
+        if new_date:
+            if parse_date(new_date) is not None:
+                changes['date'] = new_date
+            else:
+                print('Invalid date format! Leaving dates unchanged.')
+        
+        new_description = input('Description: ').strip()
+        if new_description:
+            changes['description'] = new_description
+        
+        new_payment = input('Payment method: ').strip()
+        if new_payment:
+            changes['payment_method'] = new_payment
+        
+        if not changes:
+            print('\nNothing to change.')
+            input('\nPress Enter to continue...')
+            return
+        
+        # One atomic write for every selected transaction
+        try:
+            count = store.update_transactions(profile['profile_id'], txn_ids, changes)
+        except Exception as e:
+            print(f'\nError saving transactions: {e}')
+        else:
+            print(f'\n{count} transaction(s) updated.')
+        
+    elif action == 'd':
+        if not confirm_identity(user, f'\nEnter your password to confirm deleting {len(txn_ids)} transaction(s): '):
+            print('\nAuthentication failed! Transactions not deleted.')
+            input('\nPress Enter to continue...')
+            return
+        
+        try:
+            count = store.delete_transactions(profile['profile_id'], txn_ids)
+        except Exception as e:
+            print(f'\nError saving transactions: {e}')
+        else:
+            print(f'\n{count} transaction(s) deleted.')
+        
+    else:
+        print('\nInvalid action!')
+    
+    input('\nPress Enter to continue...')
+
+
+def format_transaction(txn, profile):
+    """A transaction in a readable format"""
+    return (f"\nID: {txn['transaction_id']}\n"
+            f"Type: {txn['type'].capitalize()}\n"
+            f"Amount: {txn['amount']} {profile['currency']}\n"
+            f"Category: {txn['category']}\n"
+            f"Date: {txn['date']}\n"
+            f"Description: {txn['description']}\n"
+            f"Payment: {txn['payment_method']}\n" +
+            '-' * 40)
+
+
 def display_transaction(txn, profile):
     """Display a transaction in a readable format"""
-    print(f"\nID: {txn['transaction_id']}")
-    print(f"Type: {txn['type'].capitalize()}")
-    print(f"Amount: {txn['amount']} {profile['currency']}")
-    print(f"Category: {txn['category']}")
-    print(f"Date: {txn['date']}")
-    print(f"Description: {txn['description']}")
-    print(f"Payment: {txn['payment_method']}")
-    print('-' * 40)
+    print(format_transaction(txn, profile))
 
 
 def search_filter_transactions(profile):
     """Search and filter transactions for the given profile"""
-    if not os.path.exists(TRANSACTIONS_FILE):
+    store = get_storage()
+    if not store.has_transactions():
         print("\nNo transactions file found.")
         input('\nPress Enter to continue...')
         return
@@ -279,115 +342,57 @@ def search_filter_transactions(profile):
     sort_by = input("Sort by (date / amount): ").strip().lower()
     sort_order = input("Order (asc / desc): ").strip().lower() or "asc"
 
-    results = []
+    # Validate the filters once and compile them into a single row check
+    query, warnings = filters_query(keyword, date_from, date_to, min_amount, max_amount, txn_type)
+    for warning in warnings:
+        print(warning)
 
     try:
-        with open(TRANSACTIONS_FILE, "r", encoding="utf-8") as csvfile:
-            reader = csv.DictReader(csvfile)
-            for row in reader:
-                row = {k.strip(): v.strip() for k, v in row.items()}
-                if row.get("profile_id") != profile["profile_id"]:
-                    continue
-
-                try:
-                    txn_date = datetime.datetime.strptime(row["date"], "%Y-%m-%d")
-                    txn_amount = Decimal(row["amount"])
-                except:
-                    continue
-
-                # Apply filters
-                if keyword and not (keyword in row["description"].lower() or keyword in row["category"].lower()):
-                    continue
-                    
-                if date_from:
-                    try:
-                        if txn_date < datetime.datetime.strptime(date_from, "%Y-%m-%d"):
-                            continue
-                    except ValueError:
-                        print("Invalid 'from' date format, skipping filter.")
-                        
-                if date_to:
-                    try:
-                        if txn_date > datetime.datetime.strptime(date_to, "%Y-%m-%d"):
-                            continue
-                    except ValueError:
-                        print("Invalid 'to' date format, skipping filter.")
-                        
-                if min_amount:
-                    try:
-                        if txn_amount < Decimal(min_amount):
-                            continue
-                    except:
-                        print("Invalid minimum amount format.")
-                        
-                if max_amount:
-                    try:
-                        if txn_amount > Decimal(max_amount):
-                            continue
-                    except:
-                        print("Invalid maximum amount format.")
-                        
-                if txn_type and row["type"].lower() != txn_type:
-                    continue
-
-                results.append(row)
+        # The storage engine narrows the rows through its keyword, date and
+        # amount indexes and returns them already sorted
+        results = store.matching_transactions(profile["profile_id"], query,
+                                              sort_by if sort_by in ["date", "amount"] else None,
+                                              sort_order == "desc")
     except Exception as e:
         print(f"\nError reading transactions: {e}")
         input('\nPress Enter to continue...')
         return
 
-    # Sort results
-    if sort_by in ["date", "amount"]:
-        reverse = sort_order == "desc"
-        if sort_by == "date":
-            results.sort(key=lambda x: x["date"], reverse=reverse)
-        elif sort_by == "amount":
-            results.sort(key=lambda x: Decimal(x["amount"]), reverse=reverse)
-
     if not results:
         print("\nNo transactions match your filters.")
         input('\nPress Enter to continue...')
         return
 
-    # Display results
-    print('\n' + '='*60)
-    print(f"{'Date':<12} | {'Type':<7} | {'Category':<15} | {'Amount':<12} | {'Description'}")
-    print('-'*60)
-    for txn in results:
-        print(f"{txn['date']:<12} | {txn['type'].capitalize():<7} | {txn['category']:<15} | "
-              f"{txn['amount']:>8} {profile['currency']:<3} | {txn['description']}")
-    print('-'*60)
-    print(f"Total: {len(results)} record(s)")
-    
-    input('\nPress Enter to continue...')
+    # Display results a page at a time
+    header = ('\n' + '='*60 + '\n' +
+              f"{'Date':<12} | {'Type':<7} | {'Category':<15} | {'Amount':<12} | {'Description'}\n" +
+              '-'*60)
+    browse(Pager(results),
+           lambda txn: (f"{txn['date']:<12} | {txn['type'].capitalize():<7} | {txn['category']:<15} | "
+                        f"{txn['amount']:>8} {profile['currency']:<3} | {txn['description']}"),
+           header=header, descending_dates=sort_by == "date" and sort_order == "desc")
 
 
 def view_all_transactions(profile):
     """View all transactions for current profile"""
     print('\n--- All Transactions ---')
     
-    transactions = load_all_transactions()
+    store = get_storage()
     
-    if not transactions:
+    if not store.has_transactions():
         print('No transactions found!')
         input('\nPress Enter to continue...')
         return
     
-    profile_transactions = [
-        txn for txn in transactions 
-        if txn.get('profile_id') == profile['profile_id']
-    ]
+    # Rows are pulled from the store only as pages are shown
+    pager = Pager(store.iter_profile_transactions(profile['profile_id']))
     
-    if not profile_transactions:
+    if not pager.page():
         print('You have no transactions in this profile!')
         input('\nPress Enter to continue...')
         return
     
-    for txn in profile_transactions:
-        display_transaction(txn, profile)
-    
-    print(f'\nTotal: {len(profile_transactions)} transaction(s)')
-    input('\nPress Enter to continue...')
+    browse(pager, lambda txn: format_transaction(txn, profile))
 
 
 def Transactions(user, profile):
@@ -396,7 +401,8 @@ def Transactions(user, profile):
         clear_screen()
         PrintMesg(f'Transactions Page - Profile: {profile["profile_name"]}', length=60)
         PrintMenu('Main transactions menu',[ 'Add Expense', 'Add Income', 'Add Recurring / Scheduled Transaction',
-                                            'View All Transactions', 'Search / Filter Transactions','Edit or Delete Transaction', 'Back to Home Page'])
+                                            'View All Transactions', 'Search / Filter Transactions','Edit or Delete Transaction',
+                                            'Bulk Edit or Delete Transactions', 'Back to Home Page'])
         
         choice = input('Please select an option ✎𓂃  ').strip()
         
@@ -427,6 +433,9 @@ def Transactions(user, profile):
             edit_or_delete_transaction(user, profile)
             
         elif choice == '7':
+            bulk_edit_or_delete_transactions(user, profile)
+            
+        elif choice == '8':
             print('\nReturning to Home Page...')
             break
             
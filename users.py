@@ -1,12 +1,11 @@
 import uuid
 import getpass
-from storage import load_users, save_users, delete_profile_transactions
+from storage import find_user, users_named, save_user, delete_profile_transactions
+from sessions import start_session, confirm_identity
 from utils import PrintMenu, hash_password, verify_password, PrintMesg ,clear_screen
 
 def register():
     """Register a new user with validation"""
-    users = load_users()
-    
     # Username input with validation
     while True:
         username = input('Enter a username (3-20 characters) ✎𓂃: ').strip()
@@ -27,7 +26,7 @@ def register():
             PrintMesg('Username can only contain letters, numbers, hyphens and underscores!')
             continue
         
-        if any(u["name"] == username for u in users):
+        if find_user(username) is not None:
             PrintMesg('Username already exists! Please choose another.')
             continue
         
@@ -70,9 +69,9 @@ def register():
         "password": hash_password(password),
         "profiles": [default_profile]
     }
-    users.append(user)
 
-    if save_users(users):
+    if save_user(user):
+        start_session(username)
         clear_screen()
         PrintMesg('Registration successful!')
         PrintMesg(f'Created default profile "{profile_name}" with currency "{currency}".',length=75)
@@ -95,13 +94,13 @@ def create_profile_data(profile_name, currency):
 
 def login():
     """Login to existing account"""
-    users = load_users()
-    
     username = input('Enter your username ✎𓂃  ').strip()
     password = getpass.getpass('Enter your password ✎𓂃  ')
     
-    for u in users:
-        if u["name"] == username and verify_password(password, u["password"]):
+    for u in users_named(username):
+        if verify_password(password, u["password"]):
+            # Later confirmations check this session instead of bcrypt
+            start_session(username)
             PrintMesg('Login successful!', 50)
             input('\nPress Enter to continue...')
             return username
@@ -112,12 +111,8 @@ def login():
 
 
 def get_user_data(username):
-    """Get user data by username"""
-    users = load_users()
-    for u in users:
-        if u["name"] == username:
-            return u
-    return None
+    """Get user data by username (shared with the user cache, don't modify it)"""
+    return find_user(username)
 
 
 def profile_menu(user):
@@ -183,8 +178,6 @@ def profile_menu(user):
 
 def create_new_profile(user):
     """Create a new profile for the user"""
-    users = load_users()
-    
     # Profile name input
     profile_name = input('Enter profile name ✎𓂃  ').strip()
     if not profile_name:
@@ -208,16 +201,15 @@ def create_new_profile(user):
     
     new_profile = create_profile_data(profile_name, currency)
     
-    # Add profile to user
-    for u in users:
-        if u["name"] == user:
-            u["profiles"].append(new_profile)
-            if save_users(users):
-                 PrintMesg(f'Profile "{profile_name}" created successfully!')
-            else:
-                print('\nFailed to create profile!')
-            input('\nPress Enter to continue...')
-            return
+    # Add profile to user, writing back only this user's record
+    if user_data:
+        updated = dict(user_data, profiles=[*user_data.get("profiles", []), new_profile])
+        if save_user(updated):
+             PrintMesg(f'Profile "{profile_name}" created successfully!')
+        else:
+            print('\nFailed to create profile!')
+        input('\nPress Enter to continue...')
+        return
     
     PrintMesg('Error: User not found!')
     input('\nPress Enter to continue...')
@@ -266,28 +258,25 @@ def delete_profile(user):
                 input('\nPress Enter to continue...')
                 return
             
-            # Verify password
-            password = getpass.getpass('\nEnter your password to confirm: ')
-            users = load_users()
-            
-            for u in users:
-                if u["name"] == user and verify_password(password, u["password"]):
-                    profile_id = profile_to_delete["profile_id"]
-                    
-                    # Delete associated transactions
-                    print('\nDeleting transactions...')
-                    delete_profile_transactions(profile_id)
-                    
-                    # Remove profile
-                    del u["profiles"][choice_num - 1]
-                    
-                    if save_users(users):
-                        PrintMesg(f'Profile "{profile_to_delete["profile_name"]}" deleted successfully!')
-                    else:
-                        print('\nFailed to delete profile!')
-                    
-                    input('\nPress Enter to continue...')
-                    return
+            # Verify password, unless the login session is still live
+            if confirm_identity(user):
+                profile_id = profile_to_delete["profile_id"]
+                
+                # Delete associated transactions
+                print('\nDeleting transactions...')
+                delete_profile_transactions(profile_id)
+                
+                # Remove profile
+                updated = dict(user_data, profiles=[p for p in user_data["profiles"]
+                                                    if p["profile_id"] != profile_id])
+                
+                if save_user(updated):
+                    PrintMesg(f'Profile "{profile_to_delete["profile_name"]}" deleted successfully!')
+                else:
+                    print('\nFailed to delete profile!')
+                
+                input('\nPress Enter to continue...')
+                return
             
             PrintMesg('Authentication failed! Profile not deleted.')
             input('\nPress Enter to continue...')
@@ -1,26 +1,23 @@
-import datetime
 import os
-import bcrypt
+from dates import parse_date
 
 
 def hash_password(password):
     """Hash a password using bcrypt"""
+    import bcrypt  # loaded on first use, off the startup path
     salt = bcrypt.gensalt()
     return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
 
 def verify_password(password, hashed_password):
     """Verify a password against its hash"""
+    import bcrypt
     return bcrypt.checkpw(password.encode('utf-8'), hashed_password.encode('utf-8'))
 
 def format_currency(amount, currency):
     return f"{amount:.2f} {currency}"
 
 def validate_date(date_str):
-    try:
-        datetime.datetime.strptime(date_str, '%Y-%m-%d')
-        return True
-    except ValueError:
-        return False
+    return parse_date(date_str) is not None
 
 
 